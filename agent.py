@@ -1,26 +1,24 @@
-import os
 import json
 from dotenv import load_dotenv
-from langchain_anthropic import ChatAnthropic
 from langchain_core.prompts import ChatPromptTemplate
 
 # NEW IMPORTS for LangChain 1.0+
 from langgraph.prebuilt import create_react_agent
 
-from tools.pdf_tools import search_pdfs, list_available_pdfs, list_available_images, analyze_image, find_shape_in_pdfs
+from utils.llm_gateway import get_chat_model
+from tools.pdf_tools import search_pdfs, search_pdfs_batch, get_context, get_page, list_available_pdfs, list_available_images, analyze_image, find_shape_in_pdfs
 
 load_dotenv()
 
 class PDFQAAgent:
     def __init__(self):
-        self.llm = ChatAnthropic(
-            model="claude-sonnet-4-20250514",
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            temperature=0.3
-        )
+        self.llm = get_chat_model("claude-sonnet-4-20250514", temperature=0.3)
         
         self.tools = [
             search_pdfs, 
+            search_pdfs_batch,
+            get_context,
+            get_page,
             list_available_pdfs, 
             list_available_images,
             analyze_image,
@@ -42,6 +40,8 @@ CRITICAL FORMATTING RULES:
 
 Your job is to:
 - Answer questions based ONLY on the provided text chunks from PDFs
+- When a question needs several searches or phrasings, call search_pdfs_batch once with all of them
+- When a result is cut off or you need the text around it, call get_context with its chunk id (or get_page) instead of searching again
 - Analyze images when provided
 - Find shapes from images in PDF documents
 - Present information in a clear, readable format
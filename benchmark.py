@@ -0,0 +1,584 @@
+"""Local performance benchmarks for the PDF pipeline.
+
+Usage:
+    python benchmark.py chunking [--sample 200] [--k 4]
+    python benchmark.py embedding [--repeat 1] [--workers 0]
+    python benchmark.py pool [--repeat 1] [--workers 1 2 4]
+    python benchmark.py backends [--queries 200] [--k 4] [--repeat 1]
+    python benchmark.py quantization [--queries 200] [--k 4] [--repeat 1]
+    python benchmark.py pagestore
+    python benchmark.py hnsw [--queries 200] [--k 4] [--target-recall 0.95] [--apply]
+    python benchmark.py visual --pairs pairs.csv
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.pdf_processor import PDFProcessor, COLLECTION_NAME
+from utils.hnsw_config import save_hnsw_params
+from utils.flat_index import FlatVectorStore
+from utils.token_chunker import TokenCounter, split_by_tokens
+from utils.embedding_pool import EmbeddingPool
+from utils.embedding_scheduler import plan_batches, encode_token_batch
+
+
+def _print_table(title, rows):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+    width = max(len(name) for name, _ in rows)
+    columns = [max(len(values[i]) for _, values in rows) for i in range(len(rows[0][1]))]
+    for name, values in rows:
+        print(f"{name.ljust(width)}  " + "  ".join(
+            value.rjust(columns[i]) for i, value in enumerate(values)
+        ))
+    print("=" * 60 + "\n")
+
+
+def _percentiles(seconds):
+    millis = np.asarray(seconds) * 1000
+    return f"{np.percentile(millis, 50):.2f}", f"{np.percentile(millis, 99):.2f}"
+
+
+def _sample_sentences(documents, sample, seed=0):
+    """Pick sentences from the page text to use as retrieval probes"""
+    sentences = []
+    for doc in documents:
+        for sentence in doc.page_content.replace("\n", " ").split(". "):
+            sentence = sentence.strip()
+            if len(sentence) >= 40:
+                sentences.append(sentence)
+    random.Random(seed).shuffle(sentences)
+    return sentences[:sample]
+
+
+def _retrieval_recall(embeddings, chunks, probes, k):
+    """Share of probe sentences whose top-k chunks contain the sentence"""
+    if not probes or not chunks:
+        return 0.0
+    texts = [chunk.page_content.replace("\n", " ") for chunk in chunks]
+    chunk_vectors = np.asarray(embeddings.embed_documents([c.page_content for c in chunks]))
+    probe_vectors = np.asarray(embeddings.embed_documents(probes))
+    chunk_vectors /= np.linalg.norm(chunk_vectors, axis=1, keepdims=True) + 1e-12
+    probe_vectors /= np.linalg.norm(probe_vectors, axis=1, keepdims=True) + 1e-12
+
+    scores = probe_vectors @ chunk_vectors.T
+    hits = 0
+    for probe, row in zip(probes, scores):
+        top = np.argsort(-row)[:k]
+        if any(probe in texts[i] for i in top):
+            hits += 1
+    return hits / len(probes)
+
+
+def bench_chunking(args):
+    processor = PDFProcessor()
+    documents = processor.load_pdfs()
+    if not documents:
+        print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
+        return
+
+    counter = TokenCounter.from_embeddings(processor.embeddings)
+    window = counter.max_seq_length - 2
+
+    splitters = {
+        "chars (1000/200)": lambda docs: RecursiveCharacterTextSplitter(
+            chunk_size=1000, chunk_overlap=200, length_function=len
+        ).split_documents(docs),
+        f"tokens ({window})": lambda docs: split_by_tokens(docs, counter),
+    }
+
+    probes = _sample_sentences(documents, args.sample)
+    rows = [("splitter", ["chunks", "chunks/sec", "truncated", "text seen", f"recall@{args.k}"])]
+
+    for name, split in splitters.items():
+        # Fresh counter cache so the token splitter is not timed on warm lookups
+        counter.clear()
+        start = time.perf_counter()
+        chunks = split(documents)
+        elapsed = time.perf_counter() - start
+
+        lengths = [len(ids) for ids in counter.encode_batch([c.page_content for c in chunks])]
+        truncated = sum(1 for n in lengths if n > window)
+        seen = sum(min(n, window) for n in lengths) / max(sum(lengths), 1)
+        recall = _retrieval_recall(processor.embeddings, chunks, probes, args.k)
+
+        rows.append((name, [
+            str(len(chunks)),
+            f"{len(chunks) / max(elapsed, 1e-9):.0f}",
+            str(truncated),
+            f"{seen:.1%}",
+            f"{recall:.1%}",
+        ]))
+
+    _print_table(f"CHUNKING ({len(documents)} pages, {len(probes)} probe sentences)", rows)
+
+
+def bench_embedding(args):
+    processor = PDFProcessor(embedding_workers=args.workers)
+    documents = processor.load_pdfs()
+    if not documents:
+        print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
+        return
+
+    texts = [chunk.page_content for chunk in processor.split_documents(documents)] * args.repeat
+    embeddings = processor.embeddings
+    tokens = sum(len(ids) + 2 for ids in embeddings.token_counter.encode_batch(texts))
+
+    # Warm up both paths so model loading is not timed
+    embeddings.base.embed_documents(texts[:8])
+    embeddings.embed_documents(texts[:8])
+    if embeddings.workers > 1:
+        embeddings.start_pool()
+
+    start = time.perf_counter()
+    baseline = np.asarray(embeddings.base.embed_documents(texts))
+    baseline_time = time.perf_counter() - start
+
+    embeddings.reset_stats()
+    start = time.perf_counter()
+    bucketed = np.asarray(embeddings.embed_documents(texts))
+    bucketed_time = time.perf_counter() - start
+
+    agreement = float(np.mean(np.sum(baseline * bucketed, axis=1) / (
+        np.linalg.norm(baseline, axis=1) * np.linalg.norm(bucketed, axis=1) + 1e-12
+    )))
+
+    bucketed_name = "length-bucketed"
+    if embeddings.workers > 1:
+        bucketed_name += f" x{embeddings.workers} workers"
+
+    _print_table(f"EMBEDDING ({len(texts)} chunks, {tokens} tokens)", [
+        ("path", ["seconds", "tokens/sec"]),
+        ("HuggingFaceEmbeddings", [f"{baseline_time:.2f}", f"{tokens / baseline_time:,.0f}"]),
+        (bucketed_name, [f"{bucketed_time:.2f}", f"{tokens / bucketed_time:,.0f}"]),
+    ])
+    print(embeddings.report())
+    print(f"Mean cosine agreement with baseline: {agreement:.5f}\n")
+
+
+def bench_pool(args):
+    processor = PDFProcessor()
+    documents = processor.load_pdfs()
+    if not documents:
+        print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
+        return
+
+    texts = [chunk.page_content for chunk in processor.split_documents(documents)] * args.repeat
+    embeddings = processor.embeddings
+    model = embeddings.model
+    limit = embeddings.token_counter.max_seq_length - 2
+    sequences = [
+        model.tokenizer.build_inputs_with_special_tokens(ids[:limit])
+        for ids in embeddings.token_counter.encode_batch(texts)
+    ]
+    batches = plan_batches([len(seq) for seq in sequences], embeddings.token_budget,
+                           embeddings.max_batch_size)
+    tokens = sum(len(seq) for seq in sequences)
+
+    encode_token_batch(model, [sequences[i] for i in batches[0]])
+    start = time.perf_counter()
+    for batch in batches:
+        encode_token_batch(model, [sequences[i] for i in batch])
+    single = time.perf_counter() - start
+    rows = [("workers", ["startup s", "seconds", "tokens/sec", "speedup"]),
+            ("in-process", ["-", f"{single:.2f}", f"{tokens / single:,.0f}", "1.00x"])]
+
+    for workers in args.workers:
+        pool = EmbeddingPool(embeddings.model_name,
+                             model.get_sentence_embedding_dimension(), workers=workers)
+        start = time.perf_counter()
+        pool.start()
+        startup = time.perf_counter() - start
+        try:
+            start = time.perf_counter()
+            pool.embed(sequences, batches)
+            seconds = time.perf_counter() - start
+        finally:
+            pool.close()
+        rows.append((str(workers), [f"{startup:.2f}", f"{seconds:.2f}",
+                                    f"{tokens / seconds:,.0f}", f"{single / seconds:.2f}x"]))
+
+    _print_table(f"EMBEDDING POOL ({len(texts)} chunks, {tokens} tokens, "
+                 f"{os.cpu_count()} cores)", rows)
+
+
+def bench_backends(args):
+    import chromadb
+    from langchain_chroma import Chroma
+
+    processor = PDFProcessor()
+    documents = processor.load_pdfs()
+    if not documents:
+        print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
+        return
+
+    chunks = processor.split_documents(documents) * args.repeat
+    ids = [str(i) for i in range(len(chunks))]
+    vectors = processor.embeddings.embed_documents([c.page_content for c in chunks])
+    probes = _sample_sentences(documents, args.queries)
+    query_vectors = processor.embeddings.embed_documents(probes)
+
+    workdir = tempfile.mkdtemp(prefix="msda_bench_")
+    try:
+        rows = [("backend", ["build s", "open ms", "p50 ms", "p99 ms", f"recall@{args.k}"])]
+        results = {}
+
+        # Chroma: persistent client + HNSW collection
+        chroma_dir = os.path.join(workdir, "chroma")
+        start = time.perf_counter()
+        collection = chromadb.PersistentClient(path=chroma_dir).create_collection("bench")
+        for i in range(0, len(chunks), 5000):
+            collection.add(ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000],
+                           documents=[c.page_content for c in chunks[i:i + 5000]])
+        chroma_build = time.perf_counter() - start
+        del collection
+
+        start = time.perf_counter()
+        store = Chroma(client=chromadb.PersistentClient(path=chroma_dir),
+                       collection_name="bench", embedding_function=processor.embeddings)
+        store.similarity_search_by_vector(query_vectors[0], k=args.k)
+        chroma_open = time.perf_counter() - start
+
+        timings = []
+        results["chroma"] = []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            hits = store.similarity_search_by_vector(vector, k=args.k)
+            timings.append(time.perf_counter() - start)
+            results["chroma"].append({doc.page_content for doc in hits})
+        chroma_timings = timings
+
+        # Flat: memory-mapped float16 matrix, exact top-k
+        flat_dir = os.path.join(workdir, "flat")
+        start = time.perf_counter()
+        flat = FlatVectorStore(processor.embeddings, flat_dir)
+        flat.add_texts([c.page_content for c in chunks],
+                       metadatas=[c.metadata for c in chunks], ids=ids, embeddings=vectors)
+        flat_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        flat = FlatVectorStore.load(processor.embeddings, flat_dir)
+        flat.similarity_search_by_vector(query_vectors[0], k=args.k)
+        flat_open = time.perf_counter() - start
+
+        timings = []
+        results["flat"] = []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            hits = flat.similarity_search_by_vector(vector, k=args.k)
+            timings.append(time.perf_counter() - start)
+            results["flat"].append({doc.page_content for doc in hits})
+
+        # The flat index is exact, so it is the ground truth for recall.
+        # Compare by text so duplicated chunks (--repeat) count as the same hit
+        def recall(name):
+            found = sum(len(a & b) for a, b in zip(results[name], results["flat"]))
+            return found / max(sum(len(b) for b in results["flat"]), 1)
+
+        rows.append(("chroma (HNSW)", [f"{chroma_build:.2f}", f"{chroma_open * 1000:.1f}",
+                                       *_percentiles(chroma_timings), f"{recall('chroma'):.1%}"]))
+        rows.append(("flat (mmap fp16)", [f"{flat_build:.2f}", f"{flat_open * 1000:.1f}",
+                                          *_percentiles(timings), f"{recall('flat'):.1%}"]))
+        _print_table(f"VECTOR BACKENDS ({len(chunks)} chunks, {len(probes)} queries)", rows)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_quantization(args):
+    processor = PDFProcessor()
+    documents = processor.load_pdfs()
+    if not documents:
+        print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
+        return
+
+    chunks = processor.split_documents(documents) * args.repeat
+    texts = [c.page_content for c in chunks]
+    ids = [str(i) for i in range(len(chunks))]
+    vectors = np.asarray(processor.embeddings.embed_documents(texts), dtype=np.float32)
+    probes = _sample_sentences(documents, args.queries)
+    query_vectors = np.asarray(processor.embeddings.embed_documents(probes), dtype=np.float32)
+
+    # Ground truth: exact float32 cosine similarity, compared by text so
+    # duplicated chunks (--repeat) count as the same hit
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    truth = [{texts[i] for i in np.argsort(-(unit @ q))[:args.k]} for q in queries]
+
+    workdir = tempfile.mkdtemp(prefix="msda_bench_")
+    try:
+        rows = [("vectors", ["resident MB", "vs float32", "p50 ms", "p99 ms", f"recall@{args.k}"])]
+        for method in ("none", "int8", "binary"):
+            directory = os.path.join(workdir, method)
+            store = FlatVectorStore(processor.embeddings, directory, quantization=method)
+            store.add_texts(texts, metadatas=[c.metadata for c in chunks], ids=ids,
+                            embeddings=vectors)
+            store = FlatVectorStore.load(processor.embeddings, directory)
+            # Unquantized baseline: the float32 matrix fully in RAM
+            memory = store.memory_usage()
+            resident = memory['resident_bytes'] if method != "none" else memory['float32_bytes']
+
+            timings = []
+            found = 0
+            for vector, expected in zip(query_vectors, truth):
+                start = time.perf_counter()
+                hits = store.similarity_search_by_vector(vector, k=args.k)
+                timings.append(time.perf_counter() - start)
+                found += len({doc.page_content for doc in hits} & expected)
+
+            name = "float32" if method == "none" else f"{method} + rescore"
+            rows.append((name, [
+                f"{resident / 1e6:.2f}",
+                f"{resident / max(memory['float32_bytes'], 1):.1%}",
+                *_percentiles(timings),
+                f"{found / max(sum(len(t) for t in truth), 1):.1%}",
+            ]))
+
+        _print_table(f"QUANTIZATION ({len(chunks)} chunks, {len(probes)} queries)", rows)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_pagestore(args):
+    from utils.page_store import PageStore
+
+    processor = PDFProcessor()
+    paths = sorted(str(p) for p in Path(processor.pdf_directory).rglob("*.pdf"))
+    if not paths:
+        print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
+        return
+
+    workdir = tempfile.mkdtemp(prefix="msda_bench_")
+    try:
+        store = PageStore(workdir)
+        start = time.perf_counter()
+        pages = []
+        for path in paths:
+            documents = processor.load_pdf(path)
+            store.write_pages(path, path, documents)
+            pages.extend(documents)
+        parse_time = time.perf_counter() - start
+        store.write_chunks(processor.split_documents(pages))
+
+        start = time.perf_counter()
+        stored_pages = PageStore(workdir).load_pages()
+        pages_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stored_chunks = PageStore(workdir).load_chunks()
+        chunks_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fresh = PageStore(workdir)
+        for doc in pages:
+            fresh.get_page(doc.metadata['source'], doc.metadata.get('page', 0))
+        random_time = time.perf_counter() - start
+
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(workdir) for name in names)
+        pdf_size = sum(os.path.getsize(path) for path in paths)
+        _print_table(f"PAGE STORE ({len(paths)} PDFs, {len(pages)} pages, "
+                     f"{pdf_size / 1e6:.1f} MB -> {size / 1e6:.2f} MB parquet)", [
+            ("path", ["seconds", "pages/sec"]),
+            ("PyPDFLoader parse", [f"{parse_time:.3f}", f"{len(pages) / parse_time:,.0f}"]),
+            ("page store read", [f"{pages_time:.3f}", f"{len(stored_pages) / pages_time:,.0f}"]),
+            (f"chunks rebuilt ({len(stored_chunks)})",
+             [f"{chunks_time:.3f}", f"{len(pages) / chunks_time:,.0f}"]),
+            ("get_page (random)", [f"{random_time:.3f}", f"{len(pages) / random_time:,.0f}"]),
+        ])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_hnsw(args):
+    import chromadb
+
+    processor = PDFProcessor()
+    documents = processor.load_pdfs()
+    if not documents:
+        print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
+        return
+
+    chunks = processor.split_documents(documents) * args.repeat
+    texts = [c.page_content for c in chunks]
+    ids = [str(i) for i in range(len(chunks))]
+    vectors = np.asarray(processor.embeddings.embed_documents(texts), dtype=np.float32)
+    # Held-out probes: a different sample from the one the other benchmarks use
+    probes = _sample_sentences(documents, args.queries, seed=args.seed)
+    query_vectors = np.asarray(processor.embeddings.embed_documents(probes), dtype=np.float32)
+
+    # Ground truth: exact L2 ranking (Chroma's default space), compared by text
+    truth = [
+        {texts[i] for i in np.argsort(((vectors - q) ** 2).sum(axis=1))[:args.k]}
+        for q in query_vectors
+    ]
+
+    client = chromadb.EphemeralClient()
+    rows = [("M / ef_construction / ef_search", ["build s", "p50 ms", "p99 ms", f"recall@{args.k}"])]
+    results = []
+    for m in args.m:
+        for ef_construction in args.ef_construction:
+            name = f"hnsw_sweep_{m}_{ef_construction}"
+            start = time.perf_counter()
+            collection = client.create_collection(name, configuration={'hnsw': {
+                'max_neighbors': m, 'ef_construction': ef_construction,
+            }})
+            for i in range(0, len(chunks), 5000):
+                collection.add(ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000],
+                               documents=texts[i:i + 5000])
+            build = time.perf_counter() - start
+
+            for ef_search in args.ef_search:
+                collection.modify(configuration={'hnsw': {'ef_search': ef_search}})
+                collection.query(query_embeddings=[query_vectors[0]], n_results=args.k)
+                timings = []
+                found = 0
+                for vector, expected in zip(query_vectors, truth):
+                    start = time.perf_counter()
+                    hits = collection.query(query_embeddings=[vector], n_results=args.k)
+                    timings.append(time.perf_counter() - start)
+                    found += len(set(hits['documents'][0]) & expected)
+
+                recall = found / max(sum(len(t) for t in truth), 1)
+                p50, p99 = _percentiles(timings)
+                results.append(({'max_neighbors': m, 'ef_construction': ef_construction,
+                                 'ef_search': ef_search}, recall, float(p99)))
+                rows.append((f"{m} / {ef_construction} / {ef_search}",
+                             [f"{build:.2f}", p50, p99, f"{recall:.1%}"]))
+            client.delete_collection(name)
+
+    _print_table(f"HNSW SWEEP ({len(chunks)} chunks, {len(probes)} held-out queries)", rows)
+
+    # Fastest setting that meets the recall target, else the most accurate one
+    eligible = [r for r in results if r[1] >= args.target_recall]
+    if eligible:
+        params, recall, p99 = min(eligible, key=lambda r: (r[2], -r[1]))
+    else:
+        params, recall, p99 = max(results, key=lambda r: (r[1], -r[2]))
+        print(f"⚠️ No setting reached {args.target_recall:.0%} recall@{args.k}")
+    print(f"Chosen: M={params['max_neighbors']}, ef_construction={params['ef_construction']}, "
+          f"ef_search={params['ef_search']} (recall {recall:.1%}, p99 {p99:.2f} ms)")
+
+    if args.apply:
+        save_hnsw_params(processor.persist_directory, COLLECTION_NAME, params)
+        print(f"✓ Saved to {processor.persist_directory}. ef_search applies on the next load; "
+              f"run 'reprocess' to rebuild the index with the new M and ef_construction.\n")
+
+
+def bench_visual(args):
+    """Calibrate VISUAL_MIN_SCORE on query images whose matching PDF page is known"""
+    from utils.pdf_images import load_image
+
+    processor = PDFProcessor()
+    visual_index = processor.visual_index
+    if visual_index is None or not visual_index.load() or not len(visual_index):
+        print("Visual index is empty! Run 'index images' in the CLI first.")
+        return
+
+    # pairs.csv rows: query image path, PDF file name, 0-based page
+    with open(args.pairs, newline='', encoding='utf-8') as f:
+        pairs = [row for row in csv.reader(f) if row and not row[0].startswith('#')]
+    data = visual_index.store.get(include=["metadatas", "embeddings"])
+    matrix = np.asarray(data["embeddings"], dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    positives, negatives = [], []
+    for image_path, pdf_name, page in pairs:
+        query = visual_index.embeddings.embed_images([load_image(image_path)])[0]
+        scores = matrix @ query
+        matching = np.array([
+            os.path.basename(m['source']) == os.path.basename(pdf_name) and m['page'] == int(page)
+            for m in data["metadatas"]
+        ])
+        if matching.any():
+            positives.append(float(scores[matching].max()))
+        if (~matching).any():
+            negatives.append(float(scores[~matching].max()))
+
+    if not positives:
+        print("None of the pairs names an indexed PDF page.")
+        return
+
+    # Best threshold: most true matches kept minus wrong figures let through
+    candidates = sorted(set(positives + negatives))
+    threshold = max(candidates, key=lambda t: (
+        sum(p >= t for p in positives) - sum(n >= t for n in negatives), t
+    ))
+    rows = [("best score", ["p10", "p50", "p90", f">= {threshold:.2f}"])]
+    for name, scores in (("matching figure", positives), ("best other figure", negatives)):
+        rows.append((name, [f"{np.percentile(scores, q):.3f}" for q in (10, 50, 90)]
+                     + [f"{np.mean(np.asarray(scores) >= threshold):.0%}"]))
+    _print_table(f"VISUAL SCORES ({len(pairs)} query images, {len(matrix)} indexed images)", rows)
+    print(f"Suggested threshold: VISUAL_MIN_SCORE={threshold:.2f}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local PDF pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    chunking = subparsers.add_parser("chunking", help="Character vs token-aware splitter")
+    chunking.add_argument("--sample", type=int, default=200, help="Probe sentences for recall")
+    chunking.add_argument("--k", type=int, default=4, help="Top-k used for recall")
+    chunking.set_defaults(func=bench_chunking)
+
+    embedding = subparsers.add_parser("embedding", help="Default vs length-bucketed embedding")
+    embedding.add_argument("--repeat", type=int, default=1, help="Repeat the corpus N times")
+    embedding.add_argument("--workers", type=int, default=0, help="Embedding worker processes")
+    embedding.set_defaults(func=bench_embedding)
+
+    pool = subparsers.add_parser("pool", help="Embedding throughput per worker process count")
+    pool.add_argument("--repeat", type=int, default=1, help="Repeat the corpus N times")
+    pool.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                      help="Worker process counts to compare")
+    pool.set_defaults(func=bench_pool)
+
+    backends = subparsers.add_parser("backends", help="Chroma vs flat memory-mapped index")
+    backends.add_argument("--queries", type=int, default=200, help="Number of probe queries")
+    backends.add_argument("--k", type=int, default=4, help="Top-k per query")
+    backends.add_argument("--repeat", type=int, default=1, help="Repeat the corpus N times")
+    backends.set_defaults(func=bench_backends)
+
+    quantization = subparsers.add_parser("quantization", help="Quantized vs float32 vectors")
+    quantization.add_argument("--queries", type=int, default=200, help="Number of probe queries")
+    quantization.add_argument("--k", type=int, default=4, help="Top-k per query")
+    quantization.add_argument("--repeat", type=int, default=1, help="Repeat the corpus N times")
+    quantization.set_defaults(func=bench_quantization)
+
+    pagestore = subparsers.add_parser("pagestore", help="PDF parsing vs Parquet page store")
+    pagestore.set_defaults(func=bench_pagestore)
+
+    hnsw = subparsers.add_parser("hnsw", help="Sweep Chroma HNSW settings, recall vs latency")
+    hnsw.add_argument("--queries", type=int, default=200, help="Number of held-out queries")
+    hnsw.add_argument("--k", type=int, default=4, help="Top-k per query")
+    hnsw.add_argument("--repeat", type=int, default=1, help="Repeat the corpus N times")
+    hnsw.add_argument("--seed", type=int, default=1, help="Seed for the held-out query sample")
+    hnsw.add_argument("--m", type=int, nargs="+", default=[8, 16, 32], help="M values")
+    hnsw.add_argument("--ef-construction", type=int, nargs="+", default=[100, 200],
+                      help="Construction ef values")
+    hnsw.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160],
+                      help="Search ef values")
+    hnsw.add_argument("--target-recall", type=float, default=0.95,
+                      help="Pick the fastest setting at or above this recall@k")
+    hnsw.add_argument("--apply", action="store_true",
+                      help="Save the chosen setting for the PDF index")
+    hnsw.set_defaults(func=bench_hnsw)
+
+    visual = subparsers.add_parser("visual", help="Calibrate the visual match threshold")
+    visual.add_argument("--pairs", required=True,
+                        help="CSV of query image, PDF file name, 0-based page")
+    visual.set_defaults(func=bench_visual)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,30 @@
 import os
 import shutil
 from agent import PDFQAAgent
+from tools import pdf_tools
 from utils.pdf_processor import PDFProcessor
+from utils.folder_watcher import watch_pdf_processor
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+def show_progress(stats):
+    """Single-line progress bar with throughput and ETA"""
+    done = stats['pages'] / max(stats['total_pages'], 1)
+    filled = int(done * 30)
+    print(
+        f"\r   [{'█' * filled}{'░' * (30 - filled)}] {done:6.1%}  "
+        f"{stats['pages']}/{stats['total_pages']} pages | "
+        f"{stats['pages_per_sec']:.1f} pages/s | {stats['chunks_per_sec']:.0f} chunks/s | "
+        f"ETA {format_duration(stats['eta'])}   ",
+        end="", flush=True
+    )
+    if stats['pages'] >= stats['total_pages']:
+        print()
 
 def setup_pdfs():
     print("\n" + "="*60)
@@ -12,15 +35,19 @@ def setup_pdfs():
     print("="*60 + "\n")
     
     processor = PDFProcessor()
+    resume = False
     
-    if os.path.exists("data/chroma_db"):
+    if processor.has_interrupted_job():
+        response = input("\nThe last PDF processing run was interrupted. Resume it? (yes/no = start over): ")
+        resume = response.lower() == 'yes'
+    elif os.path.exists("data/chroma_db"):
         response = input("\nVector database exists. Reprocess? (yes/no): ")
         if response.lower() != 'yes':
             print("Using existing local database...")
             return
     
     print("\n📄 Processing PDFs locally...")
-    success = processor.process_all_pdfs()
+    success = processor.process_all_pdfs(on_progress=show_progress, resume=resume)
     
     if success:
         print("\n✅ PDFs processed successfully!")
@@ -29,6 +56,43 @@ def setup_pdfs():
     else:
         print("\n❌ Failed. Add PDFs to 'pdfs' folder.")
 
+def show_watch_status(watcher):
+    if watcher is None:
+        print("👀 Folder watcher is not running. Type 'watch' to start it.\n")
+        return
+    stats = watcher.stats()
+    lag = stats['last_lag_seconds']
+    print(f"👀 Watcher {'running' if stats['running'] else 'stopped'}")
+    print(f"   Queue depth: {stats['queue_depth']}"
+          f" (oldest waiting {stats['oldest_pending_seconds']:.1f}s)")
+    print(f"   Indexed: {stats['processed']} | Failed: {stats['failed']}"
+          f" | Last lag: {f'{lag:.1f}s' if lag is not None else '--'}")
+    if stats['current']:
+        print(f"   Now indexing: {stats['current']}")
+    if stats['last_error']:
+        print(f"   Last error: {stats['last_error']}")
+    print()
+
+def analyze_folder(directory):
+    """Describe every image in a folder concurrently, results to data/image_analyses.jsonl"""
+    processor = pdf_tools.image_processor
+    
+    def show(record, summary):
+        done = summary['analyzed'] + summary['cached'] + summary['failed']
+        print(
+            f"\r   {done}/{summary['images']} images | {summary['cached']} cached | "
+            f"{summary['failed']} failed   ", end="", flush=True
+        )
+    
+    print(f"\n🔍 Analyzing images in {directory}/ (🔒 images are sent to Claude API)...")
+    summary = processor.analyze_images(directory, on_result=show)
+    if not summary['images']:
+        print(f"No images found in {directory}/\n")
+        return
+    print(f"\n✅ {summary['analyzed']} analyzed, {summary['cached']} from cache, "
+          f"{summary['failed']} failed in {format_duration(summary['seconds'])}")
+    print(f"📄 Results: {summary['output']}\n")
+
 def upload_image():
     """Upload an image file to the images directory"""
     print("\n" + "="*60)
@@ -99,11 +163,17 @@ def main():
     print("  - 'list images' - Show all uploaded images")
     print("  - 'upload image' - Upload a new image")
     print("  - 'analyze <filename>' - Analyze an image")
+    print("  - 'analyze folder [path]' - Describe every image in a folder (default: images/)")
     print("  - 'find shape <filename>' - Find shape from image in PDFs")
     print("  - 'reprocess' - Reprocess PDFs (local)")
+    print("  - 'rechunk' - Re-split and re-embed from the page store (no PDF parsing)")
+    print("  - 'index images' - Build the local visual index of PDF images and figures")
+    print("  - 'watch' / 'watch status' / 'watch stop' - Index changes to pdfs/ automatically")
     print("  - 'reset' - Clear conversation")
     print("  - 'quit' - Exit\n")
     
+    watcher = None
+    
     while True:
         user_input = input("You: ").strip()
         
@@ -111,6 +181,8 @@ def main():
             continue
         
         if user_input.lower() == 'quit':
+            if watcher:
+                watcher.stop()
             print("Goodbye! 👋")
             break
         
@@ -121,10 +193,44 @@ def main():
         
         if user_input.lower() == 'reprocess':
             setup_pdfs()
+            # The rebuild replaced the collection, so reopen the one searches use
+            pdf_tools.processor.load_vectorstore()
             agent = PDFQAAgent()
             print("✅ Agent reloaded\n")
             continue
         
+        if user_input.lower() == 'rechunk':
+            if PDFProcessor().rebuild_from_store(rechunk=True):
+                pdf_tools.processor.load_vectorstore()
+                agent = PDFQAAgent()
+                print("✅ Index rebuilt and agent reloaded\n")
+            continue
+        
+        if user_input.lower() == 'index images':
+            pdf_tools.processor.index_visuals()
+            print()
+            continue
+        
+        if user_input.lower() == 'watch':
+            if watcher and watcher.running:
+                print("👀 Already watching pdfs/\n")
+            else:
+                # Updates go straight into the index the agent is searching
+                watcher = watch_pdf_processor(pdf_tools.processor)
+                print("👀 Watching pdfs/ - new, changed and deleted files are indexed in the background\n")
+            continue
+        
+        if user_input.lower() == 'watch status':
+            show_watch_status(watcher)
+            continue
+        
+        if user_input.lower() == 'watch stop':
+            if watcher:
+                watcher.stop()
+                watcher = None
+            print("✅ Folder watcher stopped\n")
+            continue
+        
         if user_input.lower() == 'list':
             user_input = "List all available PDF files"
         
@@ -135,6 +241,10 @@ def main():
             upload_image()
             continue
         
+        if user_input.lower() == 'analyze folder' or user_input.lower().startswith('analyze folder '):
+            analyze_folder(user_input[len('analyze folder'):].strip() or "images")
+            continue
+        
         if user_input.lower().startswith('analyze '):
             filename = user_input[8:].strip()
             user_input = f"Analyze the image file: {filename}"
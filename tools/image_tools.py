@@ -1,15 +1,35 @@
 from langchain_core.tools import tool
-from anthropic import Anthropic
 import os
 from dotenv import load_dotenv
 import base64
 from PIL import Image
-from io import BytesIO
+from utils.vision_cache import get_vision_cache
+from utils.llm_gateway import get_client
+from utils.image_preprocess import ImagePreprocessor, image_blocks, TILE_NOTE, TILE_LARGE_IMAGES
+from utils.image_store import ImageStore, ByteLRU
 
 load_dotenv()
 
-# Store uploaded images temporarily
+VISION_MODEL = "claude-sonnet-4-5-20250929"
+
+# Uploaded image names -> {'path', 'digest'}; the bytes live in the image store
 uploaded_images = {}
+image_store = ImageStore()
+preprocessor = ImagePreprocessor(tile=TILE_LARGE_IMAGES)
+# Encoded message blocks by content digest, bounded by IMAGE_CACHE_MB
+encoded_images = ByteLRU(
+    size_of=lambda encoded: sum(len(block['source']['data']) for block in encoded['blocks'])
+)
+
+def encoded_image(digest):
+    """Preprocessed, base64-encoded blocks for a stored image, built on first use"""
+    encoded = encoded_images.get(digest)
+    if encoded is None:
+        prepared = preprocessor.prepare(image_store.get(digest))
+        print(prepared.summary())
+        encoded = {'tiled': prepared.tiled, 'blocks': image_blocks(prepared)}
+        encoded_images.put(digest, encoded)
+    return encoded
 
 def image_to_base64(image_path):
     """Convert image file to base64"""
@@ -38,10 +58,10 @@ def upload_image(image_path: str, image_name: str = "uploaded_image") -> str:
         except Exception:
             return "Error: File is not a valid image"
         
-        # Store image info
+        # Only the content digest is kept in memory; encoding waits until analysis
         uploaded_images[image_name] = {
             'path': image_path,
-            'base64': image_to_base64(image_path)
+            'digest': image_store.put_file(image_path)
         }
         
         return f"✓ Image '{image_name}' uploaded successfully! You can now ask questions about it."
@@ -63,46 +83,37 @@ def analyze_image(question: str, image_name: str = "uploaded_image") -> str:
         return f"Error: No image named '{image_name}' found. Please upload an image first."
     
     try:
-        client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        
         image_data = uploaded_images[image_name]
         
-        # Detect media type
-        image_path = image_data['path']
-        if image_path.lower().endswith('.png'):
-            media_type = "image/png"
-        elif image_path.lower().endswith(('.jpg', '.jpeg')):
-            media_type = "image/jpeg"
-        elif image_path.lower().endswith('.gif'):
-            media_type = "image/gif"
-        elif image_path.lower().endswith('.webp'):
-            media_type = "image/webp"
-        else:
-            media_type = "image/png"
+        # Repeat questions about the same image content are answered from the cache
+        cache = get_vision_cache()
+        digest = image_data['digest']
+        cache_prompt = f"{question}\n\n{TILE_NOTE}" if preprocessor.tile else question
+        cached = cache.get(digest, cache_prompt, VISION_MODEL)
+        if cached is not None:
+            return cached
+        
+        encoded = encoded_image(digest)
+        prompt = f"{question}\n\n{TILE_NOTE}" if encoded['tiled'] else question
+        client = get_client()
         
         message = client.messages.create(
-            model="claude-sonnet-4-5-20250929",
+            model=VISION_MODEL,
             max_tokens=2000,
             messages=[{
                 "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": image_data['base64']
-                        }
-                    },
+                "content": encoded['blocks'] + [
                     {
                         "type": "text",
-                        "text": question
+                        "text": prompt
                     }
                 ]
             }]
         )
         
-        return message.content[0].text
+        answer = message.content[0].text
+        cache.put(digest, cache_prompt, VISION_MODEL, answer)
+        return answer
     
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
@@ -125,4 +136,5 @@ def clear_images(dummy: str = "") -> str:
     global uploaded_images
     count = len(uploaded_images)
     uploaded_images = {}
+    encoded_images.clear()
     return f"✓ Cleared {count} uploaded image(s)"
\ No newline at end of file
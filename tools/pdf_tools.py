@@ -1,68 +1,174 @@
+import os
+from pathlib import Path
 from langchain_core.tools import tool
 from utils.pdf_processor import PDFProcessor
 from utils.image_processor import ImageProcessor
+from utils.context_packer import pack_context, estimate_tokens
+from utils.page_store import source_key
 
 processor = PDFProcessor()
 image_processor = ImageProcessor()
 
+MAX_BATCH_QUERIES = 6
+
 try:
     processor.load_vectorstore()
 except:
     pass
 
+def format_search_results(title, results, token_budget=None):
+    """Merge overlapping hits, trim them to the token budget and format as markdown"""
+    passages = pack_context(results, token_budget=token_budget)
+    
+    # Format results as readable markdown text (NOT JSON)
+    response_lines = [f"## Search Results: '{title}'\n"]
+    
+    for i, passage in enumerate(passages, 1):
+        response_lines.append(f"### Result {i}")
+        response_lines.append(f"📄 **Source:** {passage['source']} | **Page:** {passage['page']}")
+        if passage['chunk_ids']:
+            response_lines.append(f"🔖 **Chunks:** {', '.join(passage['chunk_ids'])}")
+        response_lines.append(f"\n{passage['text']}\n")
+        response_lines.append("---\n")
+    
+    # Join all lines into a single string
+    return "\n".join(response_lines)
+
 @tool
-def search_pdfs(query: str) -> str:
+def search_pdfs(query: str, document: str = None, page_from: int = None,
+                page_to: int = None, content_type: str = None) -> str:
     """
     Searches through all uploaded PDFs to find relevant information.
     This search happens LOCALLY on your computer.
     Only the search results (small text chunks) are sent to Claude.
+    
+    Args:
+        query: What to search for
+        document: Optional PDF file name or part of it (e.g. "bylaws") to search only that document
+        page_from: Optional first page to search, numbered as shown in search results
+        page_to: Optional last page to search, numbered as shown in search results
+        content_type: Optional "text" (extracted text) or "ocr" (text read from scanned images)
     """
     if not processor.vectorstore:
         return "❌ PDFs have not been processed yet. Please run the setup first."
     
     try:
-        results = processor.search(query, k=4)
+        results = processor.search(
+            query, k=4, source=document, page_from=page_from,
+            page_to=page_to, content_type=content_type
+        )
         
         if not results:
+            if document and not processor.metadata_index.resolve_sources(document):
+                return f"ℹ️ No processed PDF matches '{document}'. Use list_available_pdfs to see the documents."
             return f"ℹ️ No relevant information found for '{query}' in the PDFs."
         
-        # Format results as readable markdown text (NOT JSON)
-        response_lines = [f"## Search Results: '{query}'\n"]
+        return format_search_results(query, results)
+    
+    except Exception as e:
+        return f"❌ Error searching PDFs: {str(e)}"
+
+@tool
+def search_pdfs_batch(queries: list[str], document: str = None, page_from: int = None,
+                      page_to: int = None, content_type: str = None) -> str:
+    """
+    Searches the PDFs for several queries (e.g. rephrasings or sub-questions) in one call.
+    Prefer this over calling search_pdfs repeatedly with similar queries.
+    Results from all queries are merged, de-duplicated and returned together.
+    Accepts the same optional document, page and content_type filters as search_pdfs.
+    """
+    if not processor.vectorstore:
+        return "❌ PDFs have not been processed yet. Please run the setup first."
+    
+    if not queries:
+        return "❌ Please provide at least one query."
+    
+    try:
+        results = processor.search_batch(
+            queries[:MAX_BATCH_QUERIES], k=4, source=document, page_from=page_from,
+            page_to=page_to, content_type=content_type
+        )
+        title = " | ".join(queries[:MAX_BATCH_QUERIES])
         
-        for i, doc in enumerate(results, 1):
-            source = doc.metadata.get('source', 'Unknown')
-            page = doc.metadata.get('page', 'Unknown')
-            content = doc.page_content.strip()
-            
-            response_lines.append(f"### Result {i}")
-            response_lines.append(f"📄 **Source:** {source} | **Page:** {page}")
-            response_lines.append(f"\n{content}\n")
-            response_lines.append("---\n")
+        if not results:
+            return f"ℹ️ No relevant information found for '{title}' in the PDFs."
         
-        # Join all lines into a single string
-        final_response = "\n".join(response_lines)
-        return final_response
+        return format_search_results(title, results)
     
     except Exception as e:
         return f"❌ Error searching PDFs: {str(e)}"
 
+@tool
+def get_context(chunk_id: str, window: int = 1) -> str:
+    """
+    Returns the text around a search result, looked up directly by its chunk id.
+    Use this instead of searching again when a result is cut off or you need
+    the surrounding sentences.
+    
+    Args:
+        chunk_id: A chunk id shown in search results (e.g. "bylaws.pdf#p3-c1")
+        window: How many neighbouring chunks to include on each side (default 1)
+    """
+    try:
+        chunks = processor.get_context(chunk_id, window=max(0, min(int(window), 5)))
+        if not chunks:
+            return f"ℹ️ Chunk '{chunk_id}' not found. Use the chunk ids shown in search results."
+        
+        # Everything here is wanted, so keep the budget to what was asked for
+        budget = sum(estimate_tokens(chunk.page_content) for chunk in chunks)
+        return format_search_results(f"Context of {chunk_id}", chunks, token_budget=budget)
+    except Exception as e:
+        return f"❌ Error reading context: {str(e)}"
+
+@tool
+def get_page(document: str, page: int) -> str:
+    """
+    Returns the full text of one PDF page, read locally from the page store.
+    
+    Args:
+        document: PDF file name or part of it (e.g. "bylaws")
+        page: Page number, as shown in search results
+    """
+    try:
+        page_doc = processor.get_page(document, page)
+        if page_doc is None:
+            return f"ℹ️ Page {page} of '{document}' not found. Use list_available_pdfs to see the documents."
+        
+        return (f"## {page_doc.metadata.get('source', document)} | Page {page}\n\n"
+                f"{page_doc.page_content.strip()}")
+    except Exception as e:
+        return f"❌ Error reading page: {str(e)}"
+
 @tool
 def list_available_pdfs(dummy: str = "") -> str:
     """Lists all PDF files that have been uploaded and processed."""
     import os
     
-    pdf_dir = "pdfs"
+    pdf_dir = processor.pdf_directory
     if not os.path.exists(pdf_dir):
         return "❌ PDF directory not found."
     
-    pdf_files = [f for f in os.listdir(pdf_dir) if f.endswith('.pdf')]
+    # Paths inside the PDF folder, so same-named files in subfolders stay apart
+    pdf_files = sorted(source_key(str(path), pdf_dir) for path in Path(pdf_dir).rglob("*.pdf"))
     
     if not pdf_files:
         return "📁 No PDF files found in the pdfs folder."
     
+    # Per-document summaries built at ingestion, keyed the same way
+    catalogue = {
+        source_key(source, pdf_dir): entry
+        for source, entry in processor.summary_index.catalogue().items()
+    }
+    
     response_lines = [f"## 📚 Available PDFs ({len(pdf_files)})\n"]
-    for pdf in sorted(pdf_files):
-        response_lines.append(f"- {pdf}")
+    for pdf in pdf_files:
+        entry = catalogue.get(pdf)
+        if entry is None:
+            response_lines.append(f"- {pdf} (not processed yet)")
+            continue
+        response_lines.append(f"- **{pdf}** — {entry['pages']} pages, {entry['chunks']} chunks")
+        if entry['snippet']:
+            response_lines.append(f"  > {entry['snippet']}…")
     
     return "\n".join(response_lines)
 
@@ -102,14 +208,52 @@ def analyze_image(image_filename: str) -> str:
     except Exception as e:
         return f"❌ Error analyzing image: {str(e)}"
 
+def format_exact_matches(image_filename, matches):
+    response_lines = [f"## '{image_filename}' appears in the PDFs (perceptual hash match)\n"]
+    for i, (metadata, distance) in enumerate(matches, 1):
+        kind = "Embedded image" if metadata.get('kind') == 'embedded' else "Page figure"
+        match = "identical" if distance == 0 else f"near-identical ({distance}/64 bits differ)"
+        response_lines.append(
+            f"{i}. 📄 **Source:** {metadata.get('source')} | **Page:** {metadata.get('page', 0)} "
+            f"| {kind} | {match}"
+        )
+    response_lines.append("\nUse get_page to read the text around a match.")
+    return "\n".join(response_lines)
+
+def format_visual_matches(image_filename, matches):
+    response_lines = [f"## Similar figures for '{image_filename}' (local visual search)\n"]
+    for i, (metadata, score) in enumerate(matches, 1):
+        kind = "Embedded image" if metadata.get('kind') == 'embedded' else "Page figure"
+        response_lines.append(
+            f"{i}. 📄 **Source:** {metadata.get('source')} | **Page:** {metadata.get('page', 0)} "
+            f"| {kind} | similarity {score:.2f}"
+        )
+    response_lines.append("\nUse get_page to read the text around a match.")
+    return "\n".join(response_lines)
+
 @tool
 def find_shape_in_pdfs(image_filename: str) -> str:
     """
     Finds shapes from an uploaded image within PDF documents.
-    First analyzes the image locally, then searches PDFs for similar shapes.
+    First compares the image with the figures in the PDFs locally; if none
+    is similar, it describes the image and searches the PDF text for it.
     """
     try:
-        # Analyze the image first
+        # Local lookups first: the same picture by perceptual hash (sub-millisecond),
+        # then image-to-image CLIP search (milliseconds); neither calls an API
+        visual_index = processor.visual_index
+        if visual_index is not None and (len(visual_index) or len(visual_index.hashes)):
+            image_path = os.path.join(image_processor.image_dir, image_filename)
+            if not os.path.exists(image_path):
+                return f"Error: Image '{image_filename}' not found in {image_processor.image_dir}/"
+            exact = visual_index.find_exact(image_path)
+            if exact:
+                return format_exact_matches(image_filename, exact)
+            matches = visual_index.search(image_path, k=5)
+            if matches:
+                return format_visual_matches(image_filename, matches)
+        
+        # No similar figure indexed: describe the image and search the text
         shape_description = image_processor.analyze_image(image_filename)
         
         # Make sure it's a string
@@ -122,6 +266,6 @@ def find_shape_in_pdfs(image_filename: str) -> str:
         # Search PDFs for this shape
         search_query = f"shape similar to: {shape_description}"
         
-        return search_pdfs(search_query)
+        return search_pdfs.invoke({"query": search_query})
     except Exception as e:
         return f"❌ Error finding shape in PDFs: {str(e)}"
\ No newline at end of file
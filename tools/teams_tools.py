@@ -21,22 +21,23 @@ def receive_meeting_summary(summary_text: str, meeting_date: str = None) -> str:
         return f"Error storing meeting summary: {str(e)}"
 
 @tool
-def list_meeting_summaries(start_date: str = None, end_date: str = None) -> str:
+def list_meeting_summaries(start_date: str = None, end_date: str = None, source: str = None) -> str:
     """
     List all stored meeting summaries within a date range.
     
     Args:
         start_date: Start date (YYYY-MM-DD). Defaults to 30 days ago.
         end_date: End date (YYYY-MM-DD). Defaults to today.
+        source: Optional origin of the summaries: "otter", "email" or "manual"
     """
     try:
-        summaries = teams_processor.list_summaries(start_date, end_date)
+        summaries = teams_processor.list_summaries(start_date, end_date, source)
         return summaries
     except Exception as e:
         return f"Error listing summaries: {str(e)}"
 
 @tool
-def generate_monthly_report(month: str = None, year: str = None) -> str:
+def generate_monthly_report(month: str = None, year: str = None, mode: str = "auto") -> str:
     """
     Generate a comprehensive monthly report from all meeting summaries.
     Analyzes decisions made, tasks completed, and customer pulse.
@@ -44,13 +45,65 @@ def generate_monthly_report(month: str = None, year: str = None) -> str:
     Args:
         month: Month number (1-12). Defaults to current month.
         year: Year (YYYY). Defaults to current year.
+        mode: "auto" (default), "single" (one prompt), "map_reduce" (weekly digests first, for busy months)
+              or "structured" (decisions, action items and metrics from the extracted data, fastest)
     """
     try:
-        report = teams_processor.generate_monthly_report(month, year)
+        report = teams_processor.generate_monthly_report(month, year, mode)
         return report
     except Exception as e:
         return f"Error generating monthly report: {str(e)}"
 
+@tool
+def list_action_items(start_date: str = None, end_date: str = None, owner: str = None,
+                      status: str = "open") -> str:
+    """
+    List action items extracted from meeting summaries, with owners and due dates.
+    Use this for questions like "open action items for Q3" or "what is Alice working on".
+    
+    Args:
+        start_date: Start date of the meetings (YYYY-MM-DD), e.g. 2025-07-01 for Q3 2025
+        end_date: End date of the meetings (YYYY-MM-DD), e.g. 2025-09-30 for Q3 2025
+        owner: Optional name (or part of one) of the person responsible
+        status: "open" (default), "done", or empty for both
+    """
+    try:
+        return teams_processor.list_action_items(start_date, end_date, owner, status or None)
+    except Exception as e:
+        return f"Error listing action items: {str(e)}"
+
+@tool
+def update_action_item(item_id: int, status: str) -> str:
+    """
+    Mark an action item as done or reopen it. The item number is the #id shown by list_action_items.
+    
+    Args:
+        item_id: Number of the action item
+        status: "done" or "open"
+    """
+    try:
+        return teams_processor.update_action_item(item_id, status)
+    except Exception as e:
+        return f"Error updating action item: {str(e)}"
+
+@tool
+def extract_meeting_data(start_date: str = None, end_date: str = None,
+                         retry_failed: bool = False) -> str:
+    """
+    Extract decisions, action items and metrics from stored meeting summaries that have
+    not been extracted yet. One LLM call per meeting; without dates it covers every stored meeting.
+    
+    Args:
+        start_date: Optional start date of the meetings (YYYY-MM-DD)
+        end_date: Optional end date of the meetings (YYYY-MM-DD)
+        retry_failed: Also retry meetings whose extraction failed before
+    """
+    try:
+        extracted, failed = teams_processor.backfill_extractions(start_date, end_date, retry_failed)
+        return f"✅ Extracted {extracted} meetings ({failed} failed)"
+    except Exception as e:
+        return f"Error extracting meeting data: {str(e)}"
+
 @tool
 def search_meeting_summaries(query: str) -> str:
     """
@@ -154,7 +154,8 @@ Date: {meeting_date}
             if 'error' not in parsed:
                 result = self.teams_processor.store_meeting_summary(
                     parsed['summary'],
-                    parsed['date']
+                    parsed['date'],
+                    source="email"
                 )
                 
                 if "successfully" in result:
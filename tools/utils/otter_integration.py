@@ -122,7 +122,8 @@ Key Points:
                 meeting_date = created_at.split("T")[0] if created_at else None
                 result = self.teams_processor.store_meeting_summary(
                     meeting_summary, 
-                    meeting_date
+                    meeting_date,
+                    source="otter"
                 )
                 
                 if "successfully" in result:
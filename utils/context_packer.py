@@ -0,0 +1,127 @@
+import os
+
+# Rough Claude tokenizer ratio for English prose; good enough for budgeting
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+MIN_TEXT_OVERLAP = 20
+
+
+def estimate_tokens(text):
+    """Estimate how many LLM tokens a piece of text will cost"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _text_overlap(left, right, max_overlap=400):
+    """Length of the longest suffix of `left` that is a prefix of `right`"""
+    limit = min(len(left), len(right), max_overlap)
+    for size in range(limit, MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_pair(current, nxt):
+    """Merge `nxt` into `current` if they overlap or touch, else return None"""
+    cur_start = current.get('start')
+    nxt_start = nxt.get('start')
+
+    if cur_start is not None and nxt_start is not None:
+        cur_end = cur_start + len(current['text'])
+        if nxt_start > cur_end:
+            return None
+        skip = cur_end - nxt_start
+        text = current['text'] + nxt['text'][skip:]
+        return {**current, 'text': text, 'rank': min(current['rank'], nxt['rank']),
+                'chunk_ids': current['chunk_ids'] + nxt['chunk_ids']}
+
+    # No offsets stored (older indexes): fall back to detecting the overlap
+    overlap = _text_overlap(current['text'], nxt['text'])
+    if overlap:
+        text = current['text'] + nxt['text'][overlap:]
+        return {**current, 'text': text, 'rank': min(current['rank'], nxt['rank']),
+                'chunk_ids': current['chunk_ids'] + nxt['chunk_ids']}
+    overlap = _text_overlap(nxt['text'], current['text'])
+    if overlap:
+        text = nxt['text'] + current['text'][overlap:]
+        return {**current, 'text': text, 'start': nxt_start,
+                'rank': min(current['rank'], nxt['rank']),
+                'chunk_ids': nxt['chunk_ids'] + current['chunk_ids']}
+    return None
+
+
+def merge_chunks(documents):
+    """Coalesce overlapping or adjacent chunks from the same source and page.
+
+    Returns passages (dicts with source, page, text, rank and chunk_ids)
+    ordered by the best search rank of the chunks they contain.
+    """
+    groups = {}
+    for rank, doc in enumerate(documents):
+        metadata = doc.metadata or {}
+        key = (metadata.get('source', 'Unknown'), metadata.get('page', 'Unknown'))
+        groups.setdefault(key, []).append({
+            'source': key[0],
+            'page': key[1],
+            'text': doc.page_content.strip() if metadata.get('start_index') is None
+                    else doc.page_content,
+            'start': metadata.get('start_index'),
+            'rank': rank,
+            'chunk_ids': [metadata['chunk_id']] if metadata.get('chunk_id') else [],
+        })
+
+    passages = []
+    for items in groups.values():
+        items.sort(key=lambda item: (item['start'] is None, item['start'] or 0))
+        merged = [items[0]]
+        for item in items[1:]:
+            combined = _merge_pair(merged[-1], item)
+            if combined is None:
+                merged.append(item)
+            else:
+                merged[-1] = combined
+        passages.extend(merged)
+
+    for passage in passages:
+        passage['text'] = passage['text'].strip()
+    passages.sort(key=lambda passage: passage['rank'])
+    return passages
+
+
+def _trim_to_tokens(text, max_tokens):
+    """Cut text to roughly `max_tokens`, preferring a sentence or word boundary"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+
+    cut = text[:max_chars]
+    boundary = max(cut.rfind('. '), cut.rfind('\n'))
+    if boundary < max_chars // 2:
+        boundary = cut.rfind(' ')
+    if boundary > 0:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " …"
+
+
+def pack_context(documents, token_budget=None):
+    """Merge search hits and trim them to fit within a token budget"""
+    if token_budget is None:
+        token_budget = DEFAULT_TOKEN_BUDGET
+
+    packed = []
+    remaining = token_budget
+    for passage in merge_chunks(documents):
+        if remaining <= 0:
+            break
+
+        cost = estimate_tokens(passage['text'])
+        if cost > remaining:
+            # Only bother with a partial passage if a useful amount fits
+            if remaining < 50:
+                break
+            passage = {**passage, 'text': _trim_to_tokens(passage['text'], remaining)}
+            cost = estimate_tokens(passage['text'])
+
+        packed.append(passage)
+        remaining -= cost
+
+    return packed
@@ -0,0 +1,167 @@
+import os
+import sys
+import queue
+import atexit
+import itertools
+import contextlib
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+
+def _cpu_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+@contextlib.contextmanager
+def _spawn_from_this_module():
+    """Make spawned workers start from this module instead of the app's `__main__`.
+
+    A spawned child re-runs the parent's main script before the worker
+    function. For main.py that imports the agent, its tools and torch, and
+    builds processors that load the embedding model and open the vector
+    store, once per worker. This module only imports NumPy.
+    """
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+def _worker_main(model_name, cores, tasks, results):
+    """Embedding worker: loads the model once and serves batches until told to stop"""
+    threads = max(1, len(cores))
+    # Must be set before torch is imported in this process
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from utils.embedding_scheduler import encode_token_batch
+
+    torch.set_num_threads(threads)
+    model = SentenceTransformer(model_name, device="cpu")
+    results.put(("ready", None, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        task_id, shm_name, shape, rows, sequences = task
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+                output[rows] = encode_token_batch(model, sequences)
+                del output
+            finally:
+                shm.close()
+            results.put(("done", task_id, None))
+        except Exception as e:
+            results.put(("error", task_id, repr(e)))
+
+
+class EmbeddingPool:
+    """Pool of embedding worker processes, one model copy per process.
+
+    Each worker is pinned to its own slice of CPU cores and writes its
+    vectors straight into a shared-memory output buffer, so only token ids
+    travel through the queues and no float arrays are pickled.
+    """
+
+    def __init__(self, model_name, dimension, workers=None, threads_per_worker=None):
+        cores = _cpu_cores()
+        self.model_name = model_name
+        self.dimension = dimension
+        self.workers = workers or len(cores)
+        self.threads_per_worker = threads_per_worker or max(1, len(cores) // self.workers)
+        self._cores = cores
+        self._processes = []
+        self._tasks = None
+        self._results = None
+        self._task_ids = itertools.count()
+
+    def start(self):
+        if self._processes:
+            return
+        print(f"Starting {self.workers} embedding workers "
+              f"({self.threads_per_worker} threads each)...")
+
+        context = mp.get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        with _spawn_from_this_module():
+            for index in range(self.workers):
+                first = index * self.threads_per_worker
+                cores = self._cores[first:first + self.threads_per_worker]
+                process = context.Process(
+                    target=_worker_main,
+                    args=(self.model_name, cores, self._tasks, self._results),
+                    daemon=True
+                )
+                process.start()
+                self._processes.append(process)
+
+        ready = 0
+        while ready < len(self._processes):
+            try:
+                self._results.get(timeout=5)
+                ready += 1
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    self.close()
+                    raise RuntimeError("An embedding worker failed to start")
+        atexit.register(self.close)
+
+    def embed(self, sequences, batches):
+        """Embed tokenized sequences; `batches` are lists of row indices"""
+        self.start()
+
+        shape = (len(sequences), self.dimension)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 4))
+        try:
+            pending = set()
+            for rows in batches:
+                task_id = next(self._task_ids)
+                pending.add(task_id)
+                self._tasks.put((task_id, shm.name, shape, rows,
+                                 [sequences[i] for i in rows]))
+
+            errors = []
+            while pending:
+                try:
+                    status, task_id, error = self._results.get(timeout=5)
+                except queue.Empty:
+                    if not all(process.is_alive() for process in self._processes):
+                        self.close()
+                        raise RuntimeError("An embedding worker died; pool stopped")
+                    continue
+                pending.discard(task_id)
+                if status == "error":
+                    errors.append(error)
+            if errors:
+                raise RuntimeError(f"Embedding worker error: {errors[0]}")
+
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        """Stop all workers"""
+        if not self._processes:
+            return
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
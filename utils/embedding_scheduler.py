@@ -0,0 +1,153 @@
+import os
+import time
+import torch
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+from utils.token_chunker import TokenCounter, get_sentence_transformer
+from utils.embedding_pool import EmbeddingPool
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Padded tokens per forward pass; bounds activation memory regardless of text length
+DEFAULT_TOKEN_BUDGET = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "16384"))
+MAX_BATCH_SIZE = 256
+# Worker processes for large embedding jobs; 0 or 1 embeds in this process
+DEFAULT_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+# Smaller jobs (e.g. search queries) are not worth shipping to the pool
+POOL_MIN_TEXTS = 64
+
+
+def plan_batches(lengths, token_budget, max_batch_size=MAX_BATCH_SIZE):
+    """Group text indices into length-sorted batches within a padded-token budget.
+
+    Texts are sorted longest first so each batch pads to roughly the same
+    length; a batch grows until batch_size * longest_length would exceed
+    the budget, so short texts get large batches and long texts small ones.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+    batches = []
+    current = []
+    current_max = 0
+    for i in order:
+        longest = max(current_max, lengths[i])
+        if current and (longest * (len(current) + 1) > token_budget
+                        or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            longest = lengths[i]
+        current.append(i)
+        current_max = longest
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def encode_token_batch(model, sequences):
+    """Run one sentence-transformers forward pass over already tokenized sequences"""
+    width = max(len(seq) for seq in sequences)
+    pad_id = model.tokenizer.pad_token_id or 0
+    input_ids = torch.full((len(sequences), width), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+    for row, seq in enumerate(sequences):
+        input_ids[row, :len(seq)] = torch.tensor(seq, dtype=torch.long)
+        attention_mask[row, :len(seq)] = 1
+
+    features = {
+        'input_ids': input_ids.to(model.device),
+        'attention_mask': attention_mask.to(model.device),
+    }
+    with torch.inference_mode():
+        output = model(features)['sentence_embedding']
+    return output.float().cpu().numpy()
+
+
+class BucketedEmbeddings(Embeddings):
+    """Sentence-transformers embeddings with length-bucketed adaptive batching.
+
+    Drop-in replacement for HuggingFaceEmbeddings. Token ids already produced
+    by the token-aware chunker are reused, and results are returned in the
+    original order. Throughput is tracked and available via `report()`.
+    With `workers` > 1, large jobs are spread over an EmbeddingPool.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, token_budget=None,
+                 max_batch_size=MAX_BATCH_SIZE, workers=None):
+        self.model_name = model_name
+        self.workers = DEFAULT_WORKERS if workers is None else workers
+        self.pool = None
+        self.base = HuggingFaceEmbeddings(model_name=model_name)
+        self.model = get_sentence_transformer(self.base)
+        self.token_counter = TokenCounter.from_embeddings(self.base)
+        self.token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+        self.max_batch_size = max_batch_size
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            'texts': 0,
+            'batches': 0,
+            'tokens': 0,
+            'padded_tokens': 0,
+            'seconds': 0.0,
+        }
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        if self.token_counter is None:
+            return self.base.embed_documents(texts)
+
+        start = time.perf_counter()
+        tokenizer = self.model.tokenizer
+        limit = self.token_counter.max_seq_length - 2
+        sequences = [
+            tokenizer.build_inputs_with_special_tokens(ids[:limit])
+            for ids in self.token_counter.encode_batch(texts)
+        ]
+        lengths = [len(seq) for seq in sequences]
+
+        batches = plan_batches(lengths, self.token_budget, self.max_batch_size)
+        if self.workers > 1 and len(texts) >= POOL_MIN_TEXTS:
+            vectors = self.start_pool().embed(sequences, batches).tolist()
+        else:
+            vectors = [None] * len(texts)
+            for batch in batches:
+                output = encode_token_batch(self.model, [sequences[i] for i in batch])
+                for i, vector in zip(batch, output):
+                    vectors[i] = vector.tolist()
+
+        self.stats['batches'] += len(batches)
+        self.stats['padded_tokens'] += sum(
+            max(lengths[i] for i in batch) * len(batch) for batch in batches
+        )
+
+        self.stats['texts'] += len(texts)
+        self.stats['tokens'] += sum(lengths)
+        self.stats['seconds'] += time.perf_counter() - start
+        return vectors
+
+    def start_pool(self):
+        """Start the worker pool (normally done lazily on the first large job)"""
+        if self.pool is None:
+            self.pool = EmbeddingPool(
+                self.model_name,
+                self.model.get_sentence_embedding_dimension(),
+                workers=self.workers
+            )
+        self.pool.start()
+        return self.pool
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def report(self):
+        """One-line throughput summary for everything embedded so far"""
+        stats = self.stats
+        if not stats['texts']:
+            return "No texts embedded yet"
+        tokens_per_sec = stats['tokens'] / max(stats['seconds'], 1e-9)
+        padding = 1 - stats['tokens'] / max(stats['padded_tokens'], 1)
+        return (f"Embedded {stats['texts']} texts ({stats['tokens']} tokens) in "
+                f"{stats['batches']} batches, {tokens_per_sec:,.0f} tokens/sec, "
+                f"{padding:.1%} padding")
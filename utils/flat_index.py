@@ -0,0 +1,539 @@
+import os
+import json
+import uuid
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from utils.metadata_index import matches_filter
+from utils.quantization import make_quantizer, quantizer_from_dict
+
+# "chroma" (HNSW collection) or "flat" (this memory-mapped exact index)
+DEFAULT_VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+# "int8" or "binary" codes with full-precision rescoring (flat backend only)
+DEFAULT_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+
+# Files of stores written before the append-only layout; read once, then compacted
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.jsonl"
+CODES_FILE = "codes.npy"
+QUANTIZATION_FILE = "quantization.json"
+# Current layout: append-only segment files named by generation, plus a manifest
+MANIFEST_FILE = "manifest.json"
+SEGMENT_FILES = ("vectors.{}.bin", "chunks.{}.jsonl", "codes.{}.bin")
+# Rows converted to float32 at a time while scoring the float16 matrix
+SCORE_BLOCK_ROWS = 8192
+# Rewrite the files once this share of rows are deleted or replaced ...
+COMPACT_DELETED_RATIO = 0.3
+# ... or once the store has grown this much since the quantizer was fitted
+REFIT_GROWTH = 2.0
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class _GrowableArray:
+    """Row buffer with spare capacity; appends copy only when it is full.
+
+    `view()` returns the filled rows. Appends write past the end of every
+    earlier view, so views handed to readers never change under them.
+    """
+
+    def __init__(self, rows):
+        self._buffer = np.asarray(rows)
+        self.rows = len(self._buffer)
+
+    def append(self, rows):
+        needed = self.rows + len(rows)
+        if needed > len(self._buffer):
+            grown = np.empty((max(needed, 2 * len(self._buffer)),) + rows.shape[1:],
+                             dtype=rows.dtype)
+            grown[:self.rows] = self._buffer[:self.rows]
+            self._buffer = grown
+        self._buffer[self.rows:needed] = rows
+        self.rows = needed
+        return self.view()
+
+    def view(self):
+        return self._buffer[:self.rows]
+
+
+def _write_at(path, offset, data):
+    """Write `data` at `offset`, dropping anything an interrupted write left after it"""
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(offset)
+        f.write(data)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class FlatVectorStore:
+    """Exact nearest-neighbour vector store on a memory-mapped NumPy matrix.
+
+    Vectors are L2-normalised and kept as float16 in a raw row file opened
+    with mmap, so startup is instant and pages load on demand. Chunk text,
+    ids and metadata live in a JSON-lines side file. Top-k is a blocked
+    matrix product plus `argpartition`, so results are exact. Implements
+    the subset of the LangChain/Chroma API that PDFProcessor uses.
+
+    Writes are append-only: new rows are appended to the files, and deleted
+    or replaced rows are only marked as such in `manifest.json`, which is
+    rewritten last and so is the commit point. Once enough rows are dead
+    (or the store has outgrown its quantizer fit) everything is compacted
+    into a fresh generation of files.
+
+    With `quantization` ("int8" or "binary") only compact codes are held in
+    RAM. A first pass scores the codes, then the top candidates are
+    rescored against full-precision float32 vectors that stay memory-mapped
+    on disk, so only those rows are ever paged in.
+    """
+
+    def __init__(self, embedding_function, persist_directory=None, quantization=None):
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.quantizer = make_quantizer(quantization)
+        self._lock = threading.Lock()
+        # (vectors, ids, texts, metadatas, codes, live) swapped as one object so
+        # readers never see a half-applied update while a writer is ingesting.
+        # `live` is a boolean row mask, or None when no row has been deleted
+        self._data = (np.zeros((0, 0), dtype=np.float16), [], [], [], None, None)
+        self._position_cache = None
+        self._manifest = None
+        self._vectors = None
+        self._codes = None
+        self._fitted_rows = 0
+
+    @property
+    def vector_dtype(self):
+        # Quantized stores only touch full vectors for rescoring, so keep them exact
+        return np.float32 if self.quantizer else np.float16
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def _path(self, name):
+        return os.path.join(self.persist_directory, name)
+
+    def _segment_paths(self, generation):
+        return [self._path(name.format(generation)) for name in SEGMENT_FILES]
+
+    @classmethod
+    def load(cls, embedding_function, persist_directory):
+        """Open an existing store; raises FileNotFoundError if there is none"""
+        store = cls(embedding_function, persist_directory)
+        if os.path.exists(store._path(MANIFEST_FILE)):
+            store._load_segments()
+        elif os.path.exists(store._path(VECTORS_FILE)) and os.path.exists(store._path(CHUNKS_FILE)):
+            store._load_legacy()
+        else:
+            raise FileNotFoundError(f"No flat index in {persist_directory}")
+        return store
+
+    def _load_segments(self):
+        with open(self._path(MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        vectors_path, chunks_path, codes_path = self._segment_paths(manifest['generation'])
+        rows, dimension = manifest['rows'], manifest['dimension']
+
+        ids, texts, metadatas = [], [], []
+        with open(chunks_path, 'rb') as f:
+            # Lines past the committed length belong to an interrupted append
+            for line in f.read(manifest['chunks_bytes']).splitlines():
+                row = json.loads(line)
+                ids.append(row['id'])
+                texts.append(row['text'])
+                metadatas.append(row['metadata'])
+
+        codes = None
+        if manifest.get('quantization'):
+            self.quantizer = quantizer_from_dict(manifest['quantization'])
+            # Codes are the only vector data kept resident
+            width = manifest['code_width']
+            codes = np.fromfile(codes_path, dtype=manifest['code_dtype'], count=rows * width)
+            self._codes = _GrowableArray(codes.reshape(rows, width))
+            codes = self._codes.view()
+
+        live = None
+        if manifest['deleted']:
+            live = np.ones(rows, dtype=bool)
+            live[manifest['deleted']] = False
+
+        self._manifest = manifest
+        self._fitted_rows = manifest['fitted_rows']
+        self._data = (self._map_vectors(), ids, texts, metadatas, codes, live)
+
+    def _load_legacy(self):
+        ids, texts, metadatas = [], [], []
+        with open(self._path(CHUNKS_FILE), 'r', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                ids.append(row['id'])
+                texts.append(row['text'])
+                metadatas.append(row['metadata'])
+
+        codes = None
+        if os.path.exists(self._path(QUANTIZATION_FILE)):
+            with open(self._path(QUANTIZATION_FILE), 'r', encoding='utf-8') as f:
+                self.quantizer = quantizer_from_dict(json.load(f))
+            codes = np.load(self._path(CODES_FILE))
+
+        # No manifest yet, so the first write compacts into the current layout
+        vectors = np.load(self._path(VECTORS_FILE), mmap_mode='r')
+        self._data = (vectors, ids, texts, metadatas, codes, None)
+
+    def _map_vectors(self):
+        manifest = self._manifest
+        if not manifest['rows']:
+            return np.zeros((0, manifest['dimension']), dtype=manifest['dtype'])
+        return np.memmap(self._segment_paths(manifest['generation'])[0], mode='r',
+                         dtype=manifest['dtype'], shape=(manifest['rows'], manifest['dimension']))
+
+    @classmethod
+    def from_documents(cls, documents, embedding, persist_directory=None, ids=None,
+                       quantization=None):
+        """Build a new store, replacing anything already saved in persist_directory"""
+        store = cls(embedding, persist_directory, quantization=quantization)
+        store.add_documents(documents, ids=ids)
+        return store
+
+    def __len__(self):
+        live = self._data[5]
+        return len(self._data[1]) if live is None else int(live.sum())
+
+    def memory_usage(self):
+        """Bytes of vector data held in RAM vs. a plain float32 matrix"""
+        vectors, _, _, _, codes, live = self._data
+        rows = len(vectors) if live is None else int(live.sum())
+        full = rows * vectors.shape[1] * 4 if vectors.ndim == 2 else 0
+        if codes is not None:
+            resident = codes.nbytes
+        elif isinstance(vectors, np.memmap):
+            resident = 0
+        else:
+            resident = vectors.nbytes
+        return {'resident_bytes': resident, 'float32_bytes': full}
+
+    def _write_manifest(self, manifest):
+        path = self._path(MANIFEST_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._manifest = manifest
+
+    def _remove_stale_files(self, generation):
+        keep = {os.path.basename(path) for path in self._segment_paths(generation)}
+        prefixes = tuple(name.split("{}")[0] for name in SEGMENT_FILES)
+        for name in os.listdir(self.persist_directory):
+            stale_segment = name.startswith(prefixes) and name not in keep
+            legacy = name in (VECTORS_FILE, CHUNKS_FILE, CODES_FILE, QUANTIZATION_FILE)
+            if stale_segment or legacy:
+                os.remove(self._path(name))
+
+    def _compact(self, vectors, ids, texts, metadatas):
+        """Write the given rows as a fresh generation and refit the quantizer"""
+        vectors = np.asarray(vectors, dtype=self.vector_dtype)
+        self._fitted_rows = len(ids)
+        codes = None
+        if self.quantizer is not None:
+            self.quantizer.fit(vectors.astype(np.float32))
+            codes = self.quantizer.encode(vectors)
+            self._codes = _GrowableArray(codes)
+            codes = self._codes.view()
+
+        if not self.persist_directory:
+            self._vectors = _GrowableArray(vectors)
+            self._data = (self._vectors.view(), ids, texts, metadatas, codes, None)
+            return
+        os.makedirs(self.persist_directory, exist_ok=True)
+
+        generation = uuid.uuid4().hex[:12]
+        vectors_path, chunks_path, codes_path = self._segment_paths(generation)
+        _write_at(vectors_path, 0, vectors.tobytes())
+        lines = self._chunk_lines(ids, texts, metadatas)
+        _write_at(chunks_path, 0, lines)
+        if codes is not None:
+            _write_at(codes_path, 0, codes.tobytes())
+
+        self._write_manifest({
+            'generation': generation,
+            'rows': len(ids),
+            'dimension': vectors.shape[1],
+            'dtype': np.dtype(self.vector_dtype).name,
+            'chunks_bytes': len(lines),
+            'deleted': [],
+            'fitted_rows': len(ids),
+            'quantization': self.quantizer.to_dict() if codes is not None else None,
+            'code_dtype': codes.dtype.name if codes is not None else None,
+            'code_width': codes.shape[1] if codes is not None else None,
+        })
+        self._remove_stale_files(generation)
+        self._data = (self._map_vectors(), ids, texts, metadatas, codes, None)
+
+    @staticmethod
+    def _chunk_lines(ids, texts, metadatas):
+        return "".join(
+            json.dumps({'id': row_id, 'text': text, 'metadata': metadata},
+                       ensure_ascii=False) + "\n"
+            for row_id, text, metadata in zip(ids, texts, metadatas)
+        ).encode('utf-8')
+
+    def _needs_compaction(self, rows, live):
+        if self.persist_directory and self._manifest is None:
+            # Empty, fresh or legacy layout
+            return True
+        dead = 0 if live is None else rows - int(live.sum())
+        if dead > COMPACT_DELETED_RATIO * rows:
+            return True
+        return self.quantizer is not None and \
+            rows - dead > REFIT_GROWTH * max(self._fitted_rows, 1)
+
+    def _commit(self, new_vectors, new_ids, new_texts, new_metadatas, live):
+        """Append rows and record deletions, or compact when the files have drifted"""
+        vectors, ids, texts, metadatas, codes, _ = self._data
+        ids, texts, metadatas = ids + new_ids, texts + new_texts, metadatas + new_metadatas
+        rows = len(ids)
+        if live is not None and new_ids:
+            live = np.concatenate([live, np.ones(len(new_ids), dtype=bool)])
+        if live is not None and live.all():
+            live = None
+
+        if (not len(vectors) and new_ids) or self._needs_compaction(rows, live):
+            keep = np.arange(rows) if live is None else np.flatnonzero(live)
+            kept = np.asarray(vectors[keep[keep < len(vectors)]], dtype=self.vector_dtype)
+            if new_ids:
+                kept = np.concatenate([kept, new_vectors]) if len(kept) else new_vectors
+            self._compact(kept, [ids[i] for i in keep], [texts[i] for i in keep],
+                          [metadatas[i] for i in keep])
+            return
+
+        if new_ids and self.quantizer is not None:
+            # Encoded with the quantizer as fitted; compaction refits it
+            codes = self._codes.append(self.quantizer.encode(new_vectors))
+
+        if not self.persist_directory:
+            if new_ids:
+                vectors = self._vectors.append(new_vectors)
+            self._data = (vectors, ids, texts, metadatas, codes, live)
+            return
+
+        manifest = dict(self._manifest)
+        if new_ids:
+            vectors_path, chunks_path, codes_path = self._segment_paths(manifest['generation'])
+            row_bytes = manifest['dimension'] * np.dtype(manifest['dtype']).itemsize
+            _write_at(vectors_path, manifest['rows'] * row_bytes, new_vectors.tobytes())
+            lines = self._chunk_lines(new_ids, new_texts, new_metadatas)
+            _write_at(chunks_path, manifest['chunks_bytes'], lines)
+            manifest['chunks_bytes'] += len(lines)
+            if codes is not None:
+                new_codes = codes[manifest['rows']:]
+                _write_at(codes_path, manifest['rows'] * new_codes.shape[1] * new_codes.itemsize,
+                          np.ascontiguousarray(new_codes).tobytes())
+            manifest['rows'] = rows
+        manifest['deleted'] = [] if live is None else np.flatnonzero(~live).tolist()
+        self._write_manifest(manifest)
+
+        self._data = (self._map_vectors() if new_ids else vectors,
+                      ids, texts, metadatas, codes, live)
+
+    def compact(self):
+        """Rewrite the store without its deleted rows and refit the quantizer"""
+        with self._lock:
+            vectors, ids, texts, metadatas, _, live = self._data
+            if not ids:
+                return
+            keep = np.arange(len(ids)) if live is None else np.flatnonzero(live)
+            self._compact(vectors[keep], [ids[i] for i in keep], [texts[i] for i in keep],
+                          [metadatas[i] for i in keep])
+
+    def add_texts(self, texts, metadatas=None, ids=None, embeddings=None):
+        """Embed and upsert texts; rows with an existing id are replaced"""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        if embeddings is None:
+            embeddings = self.embedding_function.embed_documents(texts)
+        new_vectors = _normalize(embeddings).astype(self.vector_dtype)
+
+        with self._lock:
+            _, old_ids, _, _, _, live = self._data
+            positions = self._positions(self._data)
+            replaced = [positions[row_id] for row_id in ids if row_id in positions]
+            if replaced:
+                live = np.ones(len(old_ids), dtype=bool) if live is None else live.copy()
+                live[replaced] = False
+            self._commit(new_vectors, ids, texts, metadatas, live)
+        return ids
+
+    def add_documents(self, documents, ids=None):
+        return self.add_texts(
+            [doc.page_content for doc in documents],
+            metadatas=[dict(doc.metadata) for doc in documents],
+            ids=ids
+        )
+
+    def _positions(self, data):
+        """id -> live row lookup, rebuilt only when a new snapshot is committed"""
+        _, row_ids, _, _, _, live = data
+        cached = self._position_cache
+        if cached is None or cached[0] is not row_ids or cached[1] is not live:
+            positions = {
+                row_id: i for i, row_id in enumerate(row_ids) if live is None or live[i]
+            }
+            cached = (row_ids, live, positions)
+            self._position_cache = cached
+        return cached[2]
+
+    def _matching_rows(self, data, ids=None, where=None):
+        _, row_ids, _, metadatas, _, live = data
+        if ids is not None:
+            positions = self._positions(data)
+            rows = sorted({positions[i] for i in ids if i in positions})
+        elif live is not None:
+            rows = np.flatnonzero(live).tolist()
+        else:
+            rows = range(len(row_ids))
+        if where:
+            rows = [i for i in rows if matches_filter(metadatas[i], where)]
+        return np.asarray(list(rows), dtype=np.int64)
+
+    def delete(self, ids=None, where=None):
+        """Delete rows by id and/or metadata filter"""
+        with self._lock:
+            data = self._data
+            doomed = self._matching_rows(data, ids, where)
+            if not len(doomed):
+                return
+            live = data[5]
+            live = np.ones(len(data[1]), dtype=bool) if live is None else live.copy()
+            live[doomed] = False
+            self._commit(np.zeros((0, 0), dtype=self.vector_dtype), [], [], [], live)
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        """Chroma-compatible dump of stored rows"""
+        include = include or ["documents", "metadatas"]
+        data = self._data
+        vectors, row_ids, texts, metadatas, _, _ = data
+        rows = self._matching_rows(data, ids, where)
+        if limit is not None:
+            rows = rows[:limit]
+
+        result = {'ids': [row_ids[i] for i in rows]}
+        if "documents" in include:
+            result['documents'] = [texts[i] for i in rows]
+        if "metadatas" in include:
+            result['metadatas'] = [metadatas[i] for i in rows]
+        if "embeddings" in include:
+            result['embeddings'] = np.asarray(vectors[rows], dtype=np.float32)
+        return result
+
+    @staticmethod
+    def _scores(vectors, queries, rows=None):
+        """Cosine similarity of each query against all (or the selected) rows"""
+        if rows is not None:
+            vectors = vectors[rows]
+
+        scores = np.empty((len(queries), len(vectors)), dtype=np.float32)
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    @staticmethod
+    def _top(scores, k):
+        """Indices of the k highest scores, best first"""
+        top = min(k, len(scores))
+        best = np.argpartition(-scores, top - 1)[:top]
+        return best[np.argsort(-scores[best])]
+
+    def _rescored_top(self, vectors, codes, queries, rows, k, dead=None):
+        """First pass on compact codes, exact rescoring of the top candidates"""
+        if rows is not None:
+            codes = codes[rows]
+        approximate = self.quantizer.score(codes, queries)
+        if dead is not None:
+            approximate[:, dead] = -np.inf
+
+        results = []
+        for query, row_scores in zip(queries, approximate):
+            candidates = self._top(row_scores, k * self.quantizer.rescore_factor)
+            candidates = candidates[np.isfinite(row_scores[candidates])]
+            if rows is not None:
+                candidates = rows[candidates]
+            candidates = np.sort(candidates)
+            exact = np.asarray(vectors[candidates], dtype=np.float32) @ query
+            best = self._top(exact, k)
+            results.append([(int(candidates[i]), float(exact[i])) for i in best])
+        return results
+
+    def _exact_top(self, vectors, queries, rows, k, dead=None):
+        scores = self._scores(vectors, queries, rows)
+        if dead is not None:
+            scores[:, dead] = -np.inf
+        results = []
+        for row_scores in scores:
+            best = self._top(row_scores, k)
+            best = best[np.isfinite(row_scores[best])]
+            results.append([
+                (int(rows[i]) if rows is not None else int(i), float(row_scores[i]))
+                for i in best
+            ])
+        return results
+
+    def similarity_search_by_vectors_with_scores(self, embeddings, k=4, filter=None, ids=None):
+        """Top-k (exact, or quantized + rescored) for several query vectors at once.
+
+        `ids` restricts scoring to those rows (e.g. candidates from a first stage).
+        """
+        queries = _normalize(embeddings)
+        data = self._data
+        vectors, row_ids, texts, metadatas, codes, live = data
+        if not row_ids or (live is not None and not live.any()):
+            return [[] for _ in queries]
+
+        restricted = filter or ids is not None
+        rows = self._matching_rows(data, ids=ids, where=filter) if restricted else None
+        if rows is not None and not len(rows):
+            return [[] for _ in queries]
+        # Unfiltered searches score every row and mask out the deleted ones
+        dead = ~live if rows is None and live is not None else None
+
+        if codes is not None:
+            ranked = self._rescored_top(vectors, codes, queries, rows, k, dead)
+        else:
+            ranked = self._exact_top(vectors, queries, rows, k, dead)
+
+        return [
+            [
+                (Document(page_content=texts[index], metadata=dict(metadatas[index]),
+                          id=row_ids[index]), score)
+                for index, score in hits
+            ]
+            for hits in ranked
+        ]
+
+    def similarity_search_by_vectors(self, embeddings, k=4, filter=None, ids=None):
+        return [
+            [doc for doc, _ in hits]
+            for hits in self.similarity_search_by_vectors_with_scores(embeddings, k, filter, ids)
+        ]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None, **kwargs):
+        vector = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vectors_with_scores([vector], k, filter)[0]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        vector = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector(vector, k, filter)
@@ -0,0 +1,196 @@
+import os
+import time
+import queue
+import threading
+from pathlib import Path
+from watchfiles import watch, Change
+
+# Milliseconds of quiet before a burst of file events is handed over
+DEFAULT_DEBOUNCE_MS = int(os.getenv("WATCH_DEBOUNCE_MS", "1600"))
+# A file is only ingested once its size stops changing (copies in progress)
+STABLE_CHECK_SECONDS = 0.5
+
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+
+class _Folder:
+    def __init__(self, directory, extensions, upsert, delete):
+        self.directory = directory
+        self.extensions = extensions
+        self.upsert = upsert
+        self.delete = delete
+
+
+class FolderWatcher:
+    """Background ingestion of files added to, changed in or removed from folders.
+
+    A watcher thread turns debounced `watchfiles` events into upsert/delete
+    jobs; a single worker thread applies them to the live index one file at
+    a time, so searches keep running against the current index meanwhile.
+    Several events for the same file collapse into one pending job.
+    """
+
+    def __init__(self, debounce_ms=None):
+        self.debounce_ms = debounce_ms or DEFAULT_DEBOUNCE_MS
+        self.folders = []
+        self._queue = queue.Queue()
+        # {path: (action, folder, first_seen)}; the queue only carries paths
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.processed = 0
+        self.failed = 0
+        self.last_error = ""
+        self.last_lag = None
+        self.current = None
+
+    def add_folder(self, directory, extensions, upsert=None, delete=None):
+        """Watch `directory` for files with these extensions"""
+        os.makedirs(directory, exist_ok=True)
+        self.folders.append(_Folder(directory, extensions, upsert, delete))
+
+    def _folder_for(self, path):
+        for folder in self.folders:
+            try:
+                Path(path).resolve().relative_to(Path(folder.directory).resolve())
+            except ValueError:
+                continue
+            if path.lower().endswith(folder.extensions):
+                return folder
+        return None
+
+    def enqueue(self, action, path):
+        """Queue an "upsert" or "delete" for a file; later events replace earlier ones"""
+        folder = self._folder_for(path)
+        if folder is None:
+            return
+        with self._lock:
+            queued = path in self._pending
+            first_seen = self._pending[path][2] if queued else time.time()
+            self._pending[path] = (action, folder, first_seen)
+        if not queued:
+            self._queue.put(path)
+
+    def _as_folder_path(self, path):
+        """Express an absolute event path the way the folder was configured,
+        so it matches the `source` values stored in the index"""
+        for folder in self.folders:
+            relative = os.path.relpath(path, os.path.abspath(folder.directory))
+            if not relative.startswith(os.pardir):
+                return os.path.join(folder.directory, relative)
+        return path
+
+    def _watch(self):
+        directories = [folder.directory for folder in self.folders]
+        for changes in watch(*directories, debounce=self.debounce_ms, stop_event=self._stop,
+                             recursive=True):
+            for change, path in changes:
+                self.enqueue("delete" if change == Change.deleted else "upsert",
+                             self._as_folder_path(path))
+
+    def _wait_until_stable(self, path):
+        size = -1
+        while os.path.exists(path) and not self._stop.is_set():
+            current = os.path.getsize(path)
+            if current == size:
+                return True
+            size = current
+            time.sleep(STABLE_CHECK_SECONDS)
+        return os.path.exists(path)
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                path = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._lock:
+                action, folder, first_seen = self._pending.pop(path)
+            self.current = path
+            try:
+                if action == "upsert" and not self._wait_until_stable(path):
+                    action = "delete"
+                handler = folder.upsert if action == "upsert" else folder.delete
+                if handler:
+                    handler(path)
+                self.processed += 1
+                self.last_lag = time.time() - first_seen
+            except Exception as e:
+                self.failed += 1
+                self.last_error = f"{path}: {e}"
+                print(f"⚠️ Could not index {path}: {e}")
+            finally:
+                self.current = None
+                self._queue.task_done()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._watch, name="folder-watch", daemon=True),
+            threading.Thread(target=self._work, name="folder-ingest", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued job has been applied (mainly for scripts)"""
+        deadline = time.time() + timeout if timeout else None
+        while self._queue.unfinished_tasks:
+            if deadline and time.time() > deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def stats(self):
+        """Queue depth and indexing lag (seconds from first event to indexed)"""
+        with self._lock:
+            oldest = min((item[2] for item in self._pending.values()), default=None)
+            depth = len(self._pending)
+        return {
+            'running': self.running,
+            'queue_depth': depth + (1 if self.current else 0),
+            'oldest_pending_seconds': time.time() - oldest if oldest else 0.0,
+            'last_lag_seconds': self.last_lag,
+            'processed': self.processed,
+            'failed': self.failed,
+            'current': self.current,
+            'last_error': self.last_error,
+        }
+
+
+def watch_pdf_processor(processor, image_directory="images", image_handlers=None,
+                        debounce_ms=None):
+    """Start a watcher that keeps `processor`'s live index in sync with its PDF folder.
+
+    `image_handlers` is an optional (upsert, delete) pair for image indexes;
+    `image_directory` is only watched when handlers are given. PDFs changed while
+    nothing was watching are queued straight away.
+    """
+    watcher = FolderWatcher(debounce_ms)
+    watcher.add_folder(processor.pdf_directory, PDF_EXTENSIONS,
+                       upsert=processor.ingest_pdf, delete=processor.remove_pdf)
+    if image_handlers:
+        upsert, delete = image_handlers
+        watcher.add_folder(image_directory, IMAGE_EXTENSIONS, upsert=upsert, delete=delete)
+
+    for path in processor.stale_pdfs():
+        watcher.enqueue("upsert", path)
+    for source in processor.missing_pdfs():
+        watcher.enqueue("delete", source)
+
+    watcher.start()
+    return watcher
@@ -0,0 +1,66 @@
+import os
+import json
+
+# Tuned HNSW settings, one entry per Chroma collection name
+HNSW_PARAMS_FILE = "hnsw_params.json"
+
+# Environment overrides applied when no tuned setting is saved
+_ENV_PARAMS = {
+    'max_neighbors': "HNSW_M",
+    'ef_construction': "HNSW_EF_CONSTRUCTION",
+    'ef_search': "HNSW_EF_SEARCH",
+}
+
+
+def load_hnsw_params(directory, collection_name):
+    """HNSW settings for a collection: saved tuning result, else env, else Chroma defaults"""
+    path = os.path.join(directory, HNSW_PARAMS_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f).get(collection_name)
+            if saved:
+                return {key: int(saved[key]) for key in _ENV_PARAMS if key in saved}
+        except (OSError, json.JSONDecodeError, ValueError):
+            pass
+
+    return {
+        key: int(os.environ[name])
+        for key, name in _ENV_PARAMS.items()
+        if os.getenv(name)
+    }
+
+
+def save_hnsw_params(directory, collection_name, params):
+    """Record the chosen settings so the next (re)build of the collection uses them"""
+    path = os.path.join(directory, HNSW_PARAMS_FILE)
+    data = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            data = {}
+
+    data[collection_name] = {key: int(params[key]) for key in _ENV_PARAMS if key in params}
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def collection_configuration(params):
+    """Chroma `collection_configuration` for the given settings, or None for defaults"""
+    if not params:
+        return None
+    return {'hnsw': dict(params)}
+
+
+def current_hnsw_params(vectorstore):
+    """Settings the collection was actually built with"""
+    hnsw = (vectorstore._collection.configuration or {}).get('hnsw') or {}
+    return {key: hnsw[key] for key in _ENV_PARAMS if key in hnsw}
+
+
+def set_search_ef(vectorstore, ef_search):
+    """Change query-time ef on a live collection (M and construction ef need a rebuild)"""
+    vectorstore._collection.modify(configuration={'hnsw': {'ef_search': int(ef_search)}})
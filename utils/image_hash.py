@@ -0,0 +1,141 @@
+import os
+import json
+import numpy as np
+from PIL import Image
+
+HASH_FILE = "image_hashes.json"
+# Hamming distances (out of 64 bits) still treated as the same picture
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "10"))
+DHASH_MAX_DISTANCE = int(os.getenv("DHASH_MAX_DISTANCE", "12"))
+
+_DCT_SIZE = 32
+_DCT_KEEP = 8
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis, so pHash needs nothing beyond NumPy"""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.ravel():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def phash(image):
+    """64-bit DCT perceptual hash: robust to scaling, compression and small edits"""
+    grey = image.resize((_DCT_SIZE, _DCT_SIZE), Image.BOX).convert('L')
+    pixels = np.asarray(grey, dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:_DCT_KEEP, :_DCT_KEEP]
+    # The DC term only says how bright the image is
+    median = np.median(low.ravel()[1:])
+    return _bits_to_int(low > median)
+
+
+def dhash(image):
+    """64-bit gradient hash, used to confirm pHash candidates"""
+    grey = image.resize((9, 8), Image.BOX).convert('L')
+    pixels = np.asarray(grey, dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ImageHashIndex:
+    """pHash/dHash of every PDF image for exact and near-exact lookups.
+
+    Entries are persisted as JSON. For lookups the pHashes sit in one
+    uint64 array, so a query is a single vectorised XOR + popcount over all
+    of them (microseconds for thousands of images, and faster than walking
+    a BK-tree in Python). pHash candidates are confirmed by dHash, so only
+    the same picture up to resizing, re-encoding or light edits matches.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        # {image_id: {'phash', 'dhash', 'metadata'}}
+        self.entries = {}
+        self._ids = []
+        self._phashes = np.zeros(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _rebuild_lookup(self):
+        self._ids = list(self.entries)
+        self._phashes = np.array([self.entries[i]['phash'] for i in self._ids], dtype=np.uint64)
+
+    def load(self):
+        if not self.directory:
+            return False
+        path = os.path.join(self.directory, HASH_FILE)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        # Hashes are kept as hex strings; JSON numbers would lose bits in other readers
+        self.entries = {
+            image_id: dict(entry, phash=int(entry['phash'], 16), dhash=int(entry['dhash'], 16))
+            for image_id, entry in stored.items()
+        }
+        self._rebuild_lookup()
+        return True
+
+    def save(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        stored = {
+            image_id: dict(entry, phash=f"{entry['phash']:016x}", dhash=f"{entry['dhash']:016x}")
+            for image_id, entry in self.entries.items()
+        }
+        path = os.path.join(self.directory, HASH_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(stored, f)
+        os.replace(path + ".tmp", path)
+
+    def replace_source(self, source, images):
+        """Swap in the hashes of one PDF's images: [(image_id, PIL image, metadata)]"""
+        self.entries = {
+            image_id: entry for image_id, entry in self.entries.items()
+            if entry['metadata'].get('source') != source
+        }
+        for image_id, image, metadata in images:
+            self.entries[image_id] = {
+                'phash': phash(image),
+                'dhash': dhash(image),
+                'metadata': metadata,
+            }
+        self._rebuild_lookup()
+
+    def remove_source(self, source):
+        self.replace_source(source, [])
+
+    def lookup(self, image, max_distance=PHASH_MAX_DISTANCE):
+        """Indexed images that are the same picture: [(metadata, phash distance)], closest first"""
+        if not self._ids:
+            return []
+        query_phash = phash(image)
+        query_dhash = dhash(image)
+        distances = np.bitwise_count(self._phashes ^ np.uint64(query_phash))
+        matches = []
+        for position in np.flatnonzero(distances <= max_distance):
+            entry = self.entries[self._ids[position]]
+            if hamming(query_dhash, entry['dhash']) <= DHASH_MAX_DISTANCE:
+                matches.append((entry['metadata'], int(distances[position])))
+        matches.sort(key=lambda match: match[1])
+        return matches
@@ -0,0 +1,245 @@
+import os
+import json
+import base64
+import time
+import hashlib
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# Longest edge the vision model uses; larger images are downscaled server-side anyway
+MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", "1568"))
+JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+# Drawings with more than TILE_FACTOR * MAX_EDGE on a side can be sent as tiles
+TILE_FACTOR = 2
+TILE_OVERLAP = 64
+# At most this many tiles per image (plus the overview); larger drawings are
+# downscaled until their tiles fit, keeping requests within the API's limits
+MAX_TILES = int(os.getenv("VISION_MAX_TILES", "9"))
+# Send such drawings as overview + tiles instead of one downscaled image
+TILE_LARGE_IMAGES = os.getenv("VISION_TILE_LARGE_IMAGES", "false").lower() == "true"
+# Only used to estimate the upload time saved
+UPLOAD_MBPS = float(os.getenv("VISION_UPLOAD_MBPS", "10"))
+DEFAULT_CACHE_DIR = os.path.join("data", "image_cache")
+
+# Formats the vision API accepts as they are
+SENDABLE_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'GIF': 'image/gif', 'WEBP': 'image/webp'}
+# Images with at most this many colours (drawings, diagrams) stay lossless
+PALETTE_COLOURS = 256
+
+
+class PreparedImage:
+    """An image ready to send: one or more (media_type, bytes) parts plus savings"""
+
+    def __init__(self, digest, parts, original_bytes, seconds, cached):
+        self.digest = digest
+        # [(media_type, bytes)]; with tiling the first part is the overview
+        self.parts = parts
+        self.original_bytes = original_bytes
+        self.seconds = seconds
+        self.cached = cached
+
+    @property
+    def sent_bytes(self):
+        return sum(len(data) for _, data in self.parts)
+
+    @property
+    def tiled(self):
+        return len(self.parts) > 1
+
+    def report(self):
+        """Bytes and estimated upload time saved compared to sending the original"""
+        saved = self.original_bytes - self.sent_bytes
+        upload_saved = saved * 8 / (UPLOAD_MBPS * 1_000_000)
+        return {
+            'original_bytes': self.original_bytes,
+            'sent_bytes': self.sent_bytes,
+            'bytes_saved': saved,
+            'upload_seconds_saved': upload_saved,
+            'preprocess_seconds': self.seconds,
+            'parts': len(self.parts),
+            'cached': self.cached,
+        }
+
+    def summary(self):
+        r = self.report()
+        percent = 100 * r['bytes_saved'] / r['original_bytes'] if r['original_bytes'] else 0
+        return (
+            f"📉 Sending {_size(r['sent_bytes'])} instead of {_size(r['original_bytes'])} "
+            f"({percent:.0f}% smaller, ~{r['upload_seconds_saved']:.1f}s less upload"
+            f"{', ' + str(r['parts']) + ' parts' if r['parts'] > 1 else ''}); "
+            f"prepared in {r['preprocess_seconds'] * 1000:.0f} ms"
+            f"{' from cache' if r['cached'] else ''}"
+        )
+
+
+def _size(num_bytes):
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.1f} MB"
+    return f"{num_bytes / 1024:.0f} KB"
+
+
+def _encode(image):
+    """Lossless PNG for drawings and transparency, JPEG for photographs"""
+    buffer = BytesIO()
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    if has_alpha or image.getcolors(PALETTE_COLOURS) is not None:
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.save(buffer, format='PNG', optimize=True)
+        return 'image/png', buffer.getvalue()
+    image.convert('RGB').save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return 'image/jpeg', buffer.getvalue()
+
+
+def _fit(image, max_edge):
+    if max(image.size) <= max_edge:
+        return image
+    fitted = image.copy()
+    fitted.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    return fitted
+
+
+def _tile_count(size, max_edge):
+    step = max_edge - TILE_OVERLAP
+    columns, rows = (len(range(0, max(n - TILE_OVERLAP, 1), step)) for n in size)
+    return columns * rows
+
+
+def _fit_tiles(image, max_edge, max_tiles):
+    """The image downscaled just enough to cover it with `max_tiles` tiles, or
+    None if that leaves nothing worth tiling"""
+    width, height = image.size
+    scale = 1.0
+    while _tile_count((int(width * scale), int(height * scale)), max_edge) > max_tiles:
+        scale *= 0.9
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    if max(size) <= TILE_FACTOR * max_edge:
+        return None
+    return image if scale == 1.0 else image.resize(size, Image.LANCZOS)
+
+
+def _tiles(image, max_edge):
+    """Overlapping max_edge-sized crops, left to right, top to bottom"""
+    width, height = image.size
+    step = max_edge - TILE_OVERLAP
+    tiles = []
+    for top in range(0, max(height - TILE_OVERLAP, 1), step):
+        for left in range(0, max(width - TILE_OVERLAP, 1), step):
+            box = (left, top, min(left + max_edge, width), min(top + max_edge, height))
+            tiles.append(image.crop(box))
+    return tiles
+
+
+def preprocess_image(image_bytes, max_edge=None, tile=False):
+    """Downscale and re-encode an image for a vision call.
+
+    Returns a list of (media_type, bytes) parts. Images that are already
+    small and in a sendable format are passed through untouched unless
+    re-encoding makes them smaller. With `tile`, drawings far larger than
+    `max_edge` become an overview plus at most MAX_TILES tiles so small
+    details survive the downscale; drawings that would need more are
+    downscaled first, or sent as the overview alone if that leaves
+    nothing to gain from tiling.
+    """
+    max_edge = max_edge or MAX_EDGE
+    image = Image.open(BytesIO(image_bytes))
+    source_format = image.format
+    image = ImageOps.exif_transpose(image)
+
+    if tile and max(image.size) > TILE_FACTOR * max_edge:
+        tiled = _fit_tiles(image, max_edge, MAX_TILES)
+        if tiled is not None:
+            overview = _encode(_fit(image, max_edge))
+            return [overview] + [_encode(part) for part in _tiles(tiled, max_edge)]
+
+    if source_format in SENDABLE_FORMATS and max(image.size) <= max_edge:
+        if source_format == 'GIF':
+            # Animated GIFs would lose frames when re-encoded
+            return [(SENDABLE_FORMATS[source_format], image_bytes)]
+        encoded = _encode(image)
+        if len(encoded[1]) >= len(image_bytes):
+            return [(SENDABLE_FORMATS[source_format], image_bytes)]
+        return [encoded]
+
+    return [_encode(_fit(image, max_edge))]
+
+
+class ImagePreprocessor:
+    """`preprocess_image` with an on-disk cache of the prepared variants.
+
+    Variants are keyed by the content hash of the original plus the
+    settings, so a changed file or a new MAX_EDGE produces a new variant.
+    A preprocessor without a cache directory prepares every call afresh.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_edge=None, tile=False):
+        self.cache_dir = cache_dir
+        self.max_edge = max_edge or MAX_EDGE
+        self.tile = tile
+
+    def _variant_dir(self, digest):
+        layout = f"tiled{MAX_TILES}" if self.tile else "single"
+        settings = f"{self.max_edge}-{layout}-q{JPEG_QUALITY}"
+        return os.path.join(self.cache_dir, f"{digest}-{settings}")
+
+    def _load_variant(self, directory):
+        manifest_path = os.path.join(directory, "parts.json")
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            parts = []
+            for part in manifest:
+                with open(os.path.join(directory, part['file']), 'rb') as f:
+                    parts.append((part['media_type'], f.read()))
+            return parts
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_variant(self, directory, parts):
+        os.makedirs(directory, exist_ok=True)
+        manifest = []
+        for i, (media_type, data) in enumerate(parts):
+            name = f"part{i}.{media_type.split('/')[1]}"
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(data)
+            manifest.append({'file': name, 'media_type': media_type})
+        with open(os.path.join(directory, "parts.json.tmp"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(os.path.join(directory, "parts.json.tmp"),
+                   os.path.join(directory, "parts.json"))
+
+    def prepare(self, image_bytes):
+        """PreparedImage for these bytes, from the disk cache when possible"""
+        started = time.perf_counter()
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        directory = self._variant_dir(digest) if self.cache_dir else None
+
+        parts = self._load_variant(directory) if directory else None
+        cached = parts is not None
+        if parts is None:
+            parts = preprocess_image(image_bytes, self.max_edge, self.tile)
+            if directory:
+                self._save_variant(directory, parts)
+        return PreparedImage(digest, parts, len(image_bytes),
+                             time.perf_counter() - started, cached)
+
+
+TILE_NOTE = ("The first image is an overview of a large drawing; the following images "
+             "are full-resolution tiles of it, left to right, top to bottom.")
+
+
+def image_blocks(prepared):
+    """Anthropic message content blocks for a PreparedImage"""
+    return [
+        {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": base64.standard_b64encode(data).decode("utf-8"),
+            },
+        }
+        for media_type, data in prepared.parts
+    ]
@@ -1,13 +1,29 @@
 import os
-import base64
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.vision_cache import get_vision_cache
+from utils.llm_gateway import get_client, MAX_CONCURRENT_CALLS
+from utils.image_preprocess import ImagePreprocessor, image_blocks, TILE_NOTE, TILE_LARGE_IMAGES
 
 # Load environment variables
 load_dotenv()
 
+VISION_MODEL = "claude-sonnet-4-5-20250929"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+# Extra attempts per image in batch runs, on top of the client's HTTP retries
+BATCH_RETRIES = 2
+BATCH_RETRY_BASE_SECONDS = 2.0
+SHAPE_PROMPT = "Describe all shapes in this image in detail. Focus on geometric shapes, their orientation, size relationships, and any distinguishing features. If there are doors, windows, or architectural elements, describe their shapes and configurations."
+
 class ImageProcessor:
-    def __init__(self, image_dir="images"):
+    def __init__(self, image_dir="images", cache=None, tile=TILE_LARGE_IMAGES):
         self.image_dir = image_dir
+        self.cache = cache or get_vision_cache()
+        self.preprocessor = ImagePreprocessor(tile=tile)
         if not os.path.exists(image_dir):
             os.makedirs(image_dir)
         
@@ -17,11 +33,57 @@ class ImageProcessor:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
         
         try:
-            from anthropic import Anthropic
-            self.client = Anthropic(api_key=api_key)
+            # Shared pool, retry policy and rate limit with the rest of the app
+            self.client = get_client()
         except ImportError:
             raise ImportError("anthropic package not installed. Run: pip install anthropic")
     
+    def _describe(self, image_path, verbose=True):
+        """Shape description of one image file as (description, from_cache); raises on failure"""
+        image_filename = os.path.basename(image_path)
+        with open(image_path, "rb") as image_file:
+            image_bytes = image_file.read()
+        
+        # Tiled and single-image answers are cached separately
+        cache_prompt = f"{SHAPE_PROMPT}\n\n{TILE_NOTE}" if self.preprocessor.tile else SHAPE_PROMPT
+        
+        # Same bytes, prompt and model as an earlier call: no API round trip
+        cached = self.cache.get(image_bytes, cache_prompt, VISION_MODEL)
+        if cached is not None:
+            if verbose:
+                print(f"\n⚡ Using cached analysis for {image_filename}\n")
+            return cached, True
+        
+        # Downscale / re-encode (BMPs and oversized scans) before uploading
+        prepared = self.preprocessor.prepare(image_bytes)
+        prompt = f"{SHAPE_PROMPT}\n\n{TILE_NOTE}" if prepared.tiled else SHAPE_PROMPT
+        
+        # Call Claude API to analyze image
+        if verbose:
+            print(f"\n🔍 Analyzing image: {image_filename}...")
+            print(prepared.summary())
+            print(f"🔒 Image will be sent to Claude API for analysis...")
+        
+        message = self.client.messages.create(
+            model=VISION_MODEL,
+            max_tokens=1024,
+            messages=[
+                {
+                    "role": "user",
+                    "content": image_blocks(prepared) + [
+                        {
+                            "type": "text",
+                            "text": prompt
+                        }
+                    ],
+                }
+            ],
+        )
+        
+        description = message.content[0].text
+        self.cache.put(prepared.digest, cache_prompt, VISION_MODEL, description)
+        return description, False
+    
     def analyze_image(self, image_filename: str) -> str:
         """Analyze an image and describe shapes in it"""
         image_path = os.path.join(self.image_dir, image_filename)
@@ -29,52 +91,10 @@ class ImageProcessor:
         if not os.path.exists(image_path):
             return f"Error: Image '{image_filename}' not found in {self.image_dir}/"
         
-        # Read and encode image
         try:
-            with open(image_path, "rb") as image_file:
-                image_data = base64.standard_b64encode(image_file.read()).decode("utf-8")
-            
-            # Determine media type
-            ext = os.path.splitext(image_filename)[1].lower()
-            media_type_map = {
-                '.jpg': 'image/jpeg',
-                '.jpeg': 'image/jpeg',
-                '.png': 'image/png',
-                '.gif': 'image/gif',
-                '.bmp': 'image/bmp'
-            }
-            media_type = media_type_map.get(ext, 'image/jpeg')
-            
-            # Call Claude API to analyze image
-            print(f"\n🔍 Analyzing image: {image_filename}...")
-            print(f"🔒 Image will be sent to Claude API for analysis...")
-            
-            message = self.client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=1024,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": media_type,
-                                    "data": image_data,
-                                },
-                            },
-                            {
-                                "type": "text",
-                                "text": "Describe all shapes in this image in detail. Focus on geometric shapes, their orientation, size relationships, and any distinguishing features. If there are doors, windows, or architectural elements, describe their shapes and configurations."
-                            }
-                        ],
-                    }
-                ],
-            )
-            
-            description = message.content[0].text
-            print(f"✅ Image analyzed successfully!\n")
+            description, cached = self._describe(image_path)
+            if not cached:
+                print(f"✅ Image analyzed successfully!\n")
             return description
             
         except Exception as e:
@@ -82,10 +102,74 @@ class ImageProcessor:
             print(f"❌ Error analyzing image: {error_msg}\n")
             return f"Error analyzing image: {error_msg}"
     
+    def _describe_with_retries(self, image_path, retries):
+        """(description, from_cache, attempts) with jittered exponential backoff between attempts"""
+        for attempt in range(retries + 1):
+            try:
+                description, cached = self._describe(image_path, verbose=False)
+                return description, cached, attempt + 1
+            except Exception:
+                if attempt == retries:
+                    raise
+                time.sleep(min(BATCH_RETRY_BASE_SECONDS * 2 ** attempt, 30) * random.uniform(0.5, 1.5))
+    
+    def analyze_images(self, directory=None, output_path=None, workers=None,
+                       retries=BATCH_RETRIES, on_result=None):
+        """Describe every image in a folder concurrently, streaming results to JSONL.
+
+        Images already in the vision cache are answered without an API call.
+        At most `workers` images are in progress at once (the LLM gateway
+        also caps concurrent calls process-wide). Each finished image is
+        appended to `output_path` as one JSON line straight away, so a
+        long run can be followed (or salvaged) while it is going.
+        """
+        directory = directory or self.image_dir
+        output_path = output_path or os.path.join("data", "image_analyses.jsonl")
+        workers = workers or MAX_CONCURRENT_CALLS
+        names = sorted(
+            f for f in os.listdir(directory)
+            if f.lower().endswith(IMAGE_EXTENSIONS)
+        ) if os.path.isdir(directory) else []
+        
+        summary = {'images': len(names), 'analyzed': 0, 'cached': 0, 'failed': 0,
+                   'seconds': 0.0, 'output': output_path}
+        if not names:
+            return summary
+        
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        write_lock = threading.Lock()
+        started = time.perf_counter()
+        
+        def run(name):
+            image_path = os.path.join(directory, name)
+            image_started = time.perf_counter()
+            record = {'image': image_path}
+            try:
+                description, cached, attempts = self._describe_with_retries(image_path, retries)
+                record.update(status="cached" if cached else "analyzed",
+                              description=description, attempts=attempts)
+            except Exception as e:
+                record.update(status="failed", error=str(e), attempts=retries + 1)
+            record['seconds'] = round(time.perf_counter() - image_started, 3)
+            
+            with write_lock:
+                with open(output_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                summary[record['status']] += 1
+            if on_result:
+                on_result(record, summary)
+            return record
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, names))
+        
+        summary['seconds'] = time.perf_counter() - started
+        return summary
+    
     def list_images(self):
         """List all images in the image directory"""
         if not os.path.exists(self.image_dir):
             return []
         
         return [f for f in os.listdir(self.image_dir) 
-                if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))]
\ No newline at end of file
+                if f.lower().endswith(IMAGE_EXTENSIONS)]
\ No newline at end of file
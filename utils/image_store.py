@@ -0,0 +1,104 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_STORE_DIR = os.path.join("data", "uploaded_images")
+# Encoded (base64) payloads kept in memory across analyses
+ENCODED_CACHE_MB = int(os.getenv("IMAGE_CACHE_MB", "64"))
+
+
+class ImageStore:
+    """Content-addressed image files on disk: `<dir>/<sha[:2]>/<sha><ext>`.
+
+    Storing the same picture twice, under any name, keeps one file.
+    """
+
+    def __init__(self, directory=DEFAULT_STORE_DIR):
+        self.directory = directory
+
+    def _path(self, digest, extension=""):
+        return os.path.join(self.directory, digest[:2], digest + extension)
+
+    def put(self, image_bytes, extension=""):
+        """Store bytes (if new) and return their sha256 digest"""
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        if self.path(digest) is None:
+            path = self._path(digest, extension.lower())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", 'wb') as f:
+                f.write(image_bytes)
+            os.replace(path + ".tmp", path)
+        return digest
+
+    def put_file(self, image_path):
+        with open(image_path, 'rb') as f:
+            return self.put(f.read(), os.path.splitext(image_path)[1])
+
+    def path(self, digest):
+        """Path of a stored image, or None"""
+        folder = os.path.join(self.directory, digest[:2])
+        if not os.path.isdir(folder):
+            return None
+        for name in os.listdir(folder):
+            if name.startswith(digest) and not name.endswith(".tmp"):
+                return os.path.join(folder, name)
+        return None
+
+    def get(self, digest):
+        path = self.path(digest)
+        if path is None:
+            raise FileNotFoundError(f"Image {digest[:12]} is not in the store")
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+class ByteLRU:
+    """Least-recently-used cache bounded by the total size of its values.
+
+    `size_of` measures a value in bytes; an entry larger than the whole
+    budget is simply not kept.
+    """
+
+    def __init__(self, max_bytes=ENCODED_CACHE_MB * 1024 * 1024, size_of=len):
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key][0]
+
+    def put(self, key, value):
+        size = self.size_of(value)
+        with self._lock:
+            if key in self._items:
+                self.bytes -= self._items.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {'entries': len(self._items), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+
+# Pages embedded and stored between two journal checkpoints
+CHECKPOINT_PAGES = int(os.getenv("INGEST_CHECKPOINT_PAGES", "50"))
+
+
+def page_batches(pages, size=None):
+    """Group sorted page numbers into (first, last, pages) checkpoint batches"""
+    size = size or CHECKPOINT_PAGES
+    pages = sorted(set(pages))
+    return [
+        (batch[0], batch[-1], batch)
+        for batch in (pages[i:i + size] for i in range(0, len(pages), size))
+    ]
+
+
+class JobState:
+    """What an interrupted ingestion job had finished before it stopped"""
+
+    def __init__(self):
+        # {source: fingerprint} of files whose chunks were (partly) stored
+        self.fingerprints = {}
+        self.completed_files = set()
+        # {source: {(first_page, last_page)}}
+        self.completed_batches = {}
+        # {source: {(first_page, last_page): id of the batch's last chunk}}
+        self.last_chunk_ids = {}
+
+    def file_complete(self, source, fingerprint):
+        return source in self.completed_files and self.fingerprints.get(source) == fingerprint
+
+    def file_changed(self, source, fingerprint):
+        """True if chunks of an older version of this file may be in the store"""
+        return source in self.fingerprints and self.fingerprints[source] != fingerprint
+
+    def batch_complete(self, source, first_page, last_page):
+        return (first_page, last_page) in self.completed_batches.get(source, set())
+
+    def last_chunk_id(self, source, first_page, last_page):
+        """Id of the last chunk a completed batch stored, or "" if unknown"""
+        return self.last_chunk_ids.get(source, {}).get((first_page, last_page), "")
+
+    def forget(self, source):
+        self.fingerprints.pop(source, None)
+        self.completed_files.discard(source)
+        self.completed_batches.pop(source, None)
+        self.last_chunk_ids.pop(source, None)
+
+
+class IngestJournal:
+    """Append-only JSON-lines checkpoint log for long ingestion runs.
+
+    A job writes a record when it starts, when it begins a file, after each
+    batch of pages is stored and when it finishes. If the process dies,
+    replaying the journal tells the next run which files and page batches
+    are already in the vector store. Chunk ids are stable, so a batch that
+    was stored but not yet journaled is simply upserted again. A journal
+    without a path (e.g. on Streamlit Cloud) records nothing.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def _records(self):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Torn final line from a crash mid-write
+                    break
+        return records
+
+    def _append(self, record):
+        if not self.path:
+            return
+        record['time'] = time.time()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def interrupted_job(self):
+        """Settings of an unfinished job, or None"""
+        records = self._records()
+        if not records or records[0].get('event') != 'start':
+            return None
+        if records[-1].get('event') == 'finish':
+            return None
+        return records[0].get('settings')
+
+    def resume_state(self, settings):
+        """State of an unfinished job started with the same settings, else None"""
+        if self.interrupted_job() != settings:
+            return None
+
+        state = JobState()
+        for record in self._records():
+            event = record.get('event')
+            source = record.get('source')
+            if event == 'file_start':
+                # A restarted file keeps its batches unless the file itself changed
+                if state.file_changed(source, record['fingerprint']):
+                    state.forget(source)
+                state.fingerprints[source] = record['fingerprint']
+            elif event == 'batch':
+                batch = (record['first_page'], record['last_page'])
+                state.completed_batches.setdefault(source, set()).add(batch)
+                if record.get('last_chunk_id'):
+                    state.last_chunk_ids.setdefault(source, {})[batch] = record['last_chunk_id']
+            elif event == 'file_done':
+                state.completed_files.add(source)
+        return state
+
+    def start(self, settings):
+        """Begin a new job, discarding the previous journal"""
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8'):
+                pass
+        self._append({'event': 'start', 'settings': settings})
+        return JobState()
+
+    def file_started(self, source, fingerprint):
+        self._append({'event': 'file_start', 'source': source, 'fingerprint': fingerprint})
+
+    def batch_done(self, source, first_page, last_page, chunks, last_chunk_id=None):
+        """`last_chunk_id` lets a resumed run link the next batch to this one"""
+        record = {'event': 'batch', 'source': source, 'first_page': first_page,
+                  'last_page': last_page, 'chunks': chunks}
+        if last_chunk_id:
+            record['last_chunk_id'] = last_chunk_id
+        self._append(record)
+
+    def file_done(self, source):
+        self._append({'event': 'file_done', 'source': source})
+
+    def finish(self):
+        self._append({'event': 'finish'})
+
+
+class IngestProgress:
+    """Pages/chunks counters with throughput and ETA for a running job.
+
+    Pages skipped because a resumed job had already stored them count
+    towards completion but not towards throughput.
+    """
+
+    def __init__(self, total_pages, callback=None):
+        self.total_pages = total_pages
+        self.callback = callback
+        self.pages_done = 0
+        self.pages_skipped = 0
+        self.chunks_done = 0
+        self.current = ""
+        self.started = time.perf_counter()
+
+    def skip(self, pages):
+        self.pages_skipped += pages
+        self._report()
+
+    def advance(self, pages, chunks, current=None):
+        self.pages_done += pages
+        self.chunks_done += chunks
+        if current is not None:
+            self.current = current
+        self._report()
+
+    def snapshot(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        finished = self.pages_done + self.pages_skipped
+        pages_per_sec = self.pages_done / elapsed
+        remaining = max(self.total_pages - finished, 0)
+        return {
+            'pages': finished,
+            'total_pages': self.total_pages,
+            'chunks': self.chunks_done,
+            'pages_per_sec': pages_per_sec,
+            'chunks_per_sec': self.chunks_done / elapsed,
+            'elapsed': elapsed,
+            'eta': remaining / pages_per_sec if pages_per_sec else None,
+            'current': self.current,
+        }
+
+    def _report(self):
+        if self.callback:
+            self.callback(self.snapshot())
@@ -0,0 +1,216 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import httpx
+from dotenv import load_dotenv
+from langchain_core.rate_limiters import BaseRateLimiter
+
+load_dotenv()
+
+# Calls in flight at once across the whole process
+MAX_CONCURRENT_CALLS = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Sustained request rate and burst size of the shared token bucket
+REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "2"))
+REQUEST_BURST = int(os.getenv("LLM_REQUEST_BURST", "4"))
+# Retries per call (exponential backoff with jitter, Retry-After honoured)
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+# Kept-alive connections in the shared pool (TLS handshakes are reused)
+POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "10"))
+KEEPALIVE_SECONDS = 60
+# Cool-down after a 429/529 grows as 2^n (capped) with jitter
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+THROTTLE_STATUSES = (429, 529)
+
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """Thread-safe token bucket that every outgoing LLM request draws from.
+
+    Besides the steady refill, `pause` stops all callers until a moment in
+    the future, which is how one throttled response slows the whole
+    process down instead of each thread retrying into the same limit.
+    """
+
+    def __init__(self, requests_per_second=REQUESTS_PER_SECOND, burst=REQUEST_BURST):
+        self.requests_per_second = requests_per_second
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _try_take(self):
+        """0 if a token was taken, else seconds to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated) * self.requests_per_second)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.requests_per_second
+
+    def acquire(self, *, blocking=True):
+        while True:
+            wait = self._try_take()
+            if not wait:
+                return True
+            if not blocking:
+                return False
+            time.sleep(wait)
+
+    async def aacquire(self, *, blocking=True):
+        while True:
+            wait = self._try_take()
+            if not wait:
+                return True
+            if not blocking:
+                return False
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class CallGovernor:
+    """Process-wide limit on LLM calls: a token bucket for the rate and a
+    semaphore for the number in flight, plus a shared cool-down on 429s"""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_CALLS, rate_limiter=None):
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter()
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.consecutive_throttles = 0
+        self.wait_seconds = 0.0
+
+    def __enter__(self):
+        started = time.perf_counter()
+        self._slots.acquire()
+        self.rate_limiter.acquire()
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.wait_seconds += time.perf_counter() - started
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+        return False
+
+    def record(self, status_code, retry_after=None):
+        """Feed back a response status; throttling pauses every caller"""
+        if status_code not in THROTTLE_STATUSES:
+            with self._lock:
+                self.consecutive_throttles = 0
+            return
+        with self._lock:
+            self.throttled += 1
+            self.consecutive_throttles += 1
+            attempt = self.consecutive_throttles
+        delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), BACKOFF_MAX_SECONDS)
+        delay = max(delay, retry_after or 0) * random.uniform(1.0, 1.5)
+        self.rate_limiter.pause(delay)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_concurrent': self.max_concurrent,
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'wait_seconds': self.wait_seconds,
+            }
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+class GovernedTransport(httpx.BaseTransport):
+    """httpx transport that sends every request (including SDK retries)
+    through the governor"""
+
+    def __init__(self, governor, transport=None):
+        self.governor = governor
+        self.transport = transport or httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=POOL_CONNECTIONS,
+                                max_keepalive_connections=POOL_CONNECTIONS,
+                                keepalive_expiry=KEEPALIVE_SECONDS)
+        )
+
+    def handle_request(self, request):
+        with self.governor:
+            response = self.transport.handle_request(request)
+        self.governor.record(response.status_code, _retry_after(response))
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+_lock = threading.Lock()
+_governor = None
+_client = None
+
+
+def get_governor():
+    global _governor
+    with _lock:
+        if _governor is None:
+            _governor = CallGovernor()
+        return _governor
+
+
+def get_client():
+    """The shared Anthropic client: one connection pool, retry policy and rate limit"""
+    global _client
+    governor = get_governor()
+    with _lock:
+        if _client is None:
+            from anthropic import Anthropic
+            http_client = httpx.Client(
+                transport=GovernedTransport(governor),
+                timeout=REQUEST_TIMEOUT,
+                base_url=os.getenv("ANTHROPIC_BASE_URL") or "https://api.anthropic.com",
+            )
+            _client = Anthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                http_client=http_client,
+                max_retries=MAX_RETRIES,
+                timeout=REQUEST_TIMEOUT,
+            )
+        return _client
+
+
+def get_chat_model(model, temperature=0.3, **kwargs):
+    """ChatAnthropic that sends its requests through the shared client"""
+    from langchain_anthropic import ChatAnthropic
+
+    llm = ChatAnthropic(
+        model=model,
+        anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
+        temperature=temperature,
+        max_retries=MAX_RETRIES,
+        **kwargs
+    )
+    # ChatAnthropic builds its client lazily in a cached property; seeding the
+    # cache makes it use the shared pool and governor instead of its own
+    llm.__dict__['_client'] = get_client()
+    return llm
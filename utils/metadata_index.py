@@ -0,0 +1,202 @@
+import os
+import json
+import copy
+import threading
+
+# Chunks indexed before content types were recorded have no `type` and are text
+DEFAULT_CONTENT_TYPE = 'text'
+CONTENT_TYPES = ('text', 'ocr')
+
+
+class MetadataIndex:
+    """Small side index of chunk counts per source, page and content type.
+
+    It lets filtered searches resolve loose document names ("bylaws") to the
+    exact `source` values stored in the vector store and estimate how many
+    chunks a filter selects before touching the vectors.
+
+    Updates are copy-on-write: a new `sources` dict is built and swapped in,
+    so lookups running meanwhile never see a source missing mid-update.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        # {source: {page (str): {type: chunk_count}}}; never mutated once published
+        self.sources = {}
+
+    @staticmethod
+    def _count(documents, sources):
+        """Add the chunk counts of `documents` to `sources` in place"""
+        for doc in documents:
+            metadata = doc.metadata or {}
+            source = metadata.get('source', 'Unknown')
+            page = str(metadata.get('page', 0))
+            content_type = metadata.get('type', DEFAULT_CONTENT_TYPE)
+            pages = sources.setdefault(source, {})
+            types = pages.setdefault(page, {})
+            types[content_type] = types.get(content_type, 0) + 1
+        return sources
+
+    def add_documents(self, documents):
+        """Record the metadata of newly indexed chunks"""
+        with self._lock:
+            touched = {doc.metadata.get('source', 'Unknown') for doc in documents}
+            added = {source: copy.deepcopy(self.sources.get(source, {})) for source in touched}
+            self.sources = {**self.sources, **self._count(documents, added)}
+
+    def replace_source(self, source, documents):
+        """Swap in the chunks of a re-indexed source in one step"""
+        counted = self._count(documents, {})
+        with self._lock:
+            sources = {key: value for key, value in self.sources.items() if key != source}
+            if source in counted:
+                sources[source] = counted[source]
+            self.sources = sources
+
+    def remove_source(self, source):
+        """Forget everything recorded for a source"""
+        self.replace_source(source, [])
+
+    def build_from_metadatas(self, metadatas):
+        """Rebuild the index from raw metadata dicts (e.g. a vector store dump)"""
+        sources = self._count([_MetadataOnly(m) for m in metadatas], {})
+        with self._lock:
+            self.sources = sources
+
+    def load(self):
+        """Load the index from disk, returns False if there is none"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.sources = json.load(f).get('sources', {})
+            return True
+        except (OSError, json.JSONDecodeError):
+            return False
+
+    def save(self):
+        """Persist the index next to the vector store"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'sources': self.sources}, f)
+
+    def resolve_sources(self, name):
+        """Match a full path, file name or partial name to indexed sources"""
+        index = self.sources
+        if not name:
+            return list(index)
+        if name in index:
+            return [name]
+
+        needle = name.lower().strip()
+        if needle.endswith('.pdf'):
+            needle = needle[:-4]
+        return [
+            source for source in index
+            if needle in os.path.basename(source).lower()
+        ]
+
+    def content_types(self):
+        """Every content type recorded in the index"""
+        return sorted({
+            content_type
+            for pages in self.sources.values()
+            for types in pages.values()
+            for content_type in types
+        })
+
+    def count(self, sources=None, page_from=None, page_to=None, content_type=None):
+        """Number of chunks a filter would select"""
+        index = self.sources
+        total = 0
+        for source in (sources if sources is not None else index):
+            for page, types in index.get(source, {}).items():
+                page = int(page)
+                if page_from is not None and page < page_from:
+                    continue
+                if page_to is not None and page > page_to:
+                    continue
+                if content_type:
+                    total += types.get(content_type, 0)
+                else:
+                    total += sum(types.values())
+        return total
+
+
+class _MetadataOnly:
+    """Adapter so raw metadata dicts can be fed to add_documents"""
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+
+def build_metadata_filter(sources=None, page_from=None, page_to=None, content_type=None,
+                          content_types=CONTENT_TYPES):
+    """Build a Chroma `where` filter, or None when nothing is filtered.
+
+    Text is selected by excluding the other `content_types`, because older
+    chunks carry no `type` at all and an equality test would skip them.
+    """
+    conditions = []
+
+    if sources is not None:
+        if len(sources) == 1:
+            conditions.append({'source': sources[0]})
+        else:
+            conditions.append({'source': {'$in': list(sources)}})
+    if page_from is not None:
+        conditions.append({'page': {'$gte': int(page_from)}})
+    if page_to is not None:
+        conditions.append({'page': {'$lte': int(page_to)}})
+    if content_type == DEFAULT_CONTENT_TYPE:
+        others = [t for t in content_types if t != DEFAULT_CONTENT_TYPE]
+        if len(others) == 1:
+            conditions.append({'type': {'$ne': others[0]}})
+        elif others:
+            conditions.append({'type': {'$nin': others}})
+    elif content_type:
+        conditions.append({'type': content_type})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {'$and': conditions}
+
+
+_COMPARATORS = {
+    '$eq': lambda value, target: value == target,
+    '$ne': lambda value, target: value != target,
+    '$gt': lambda value, target: value is not None and value > target,
+    '$gte': lambda value, target: value is not None and value >= target,
+    '$lt': lambda value, target: value is not None and value < target,
+    '$lte': lambda value, target: value is not None and value <= target,
+    '$in': lambda value, target: value in target,
+    '$nin': lambda value, target: value not in target,
+}
+
+
+def matches_filter(metadata, where):
+    """Evaluate a Chroma-style `where` filter against one metadata dict"""
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_filter(metadata, part) for part in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_filter(metadata, part) for part in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, target in condition.items():
+                if not _COMPARATORS[operator](value, target):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+
+    return True
@@ -0,0 +1,313 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+
+MANIFEST_FILE = "manifest.json"
+PAGES_DIR = "pages"
+CHUNKS_DIR = "chunks"
+COMPRESSION = "zstd"
+
+PAGE_SCHEMA = pa.schema([
+    ('source', pa.string()),
+    ('page', pa.int32()),
+    ('text', pa.large_string()),
+    ('metadata', pa.string()),
+])
+
+# Chunks are stored as boundaries into the page text, not as copies of it.
+# `text` is only filled for the rare chunk that is not a verbatim slice.
+CHUNK_SCHEMA = pa.schema([
+    ('chunk_id', pa.string()),
+    ('prev_id', pa.string()),
+    ('next_id', pa.string()),
+    ('source', pa.string()),
+    ('page', pa.int32()),
+    ('start_index', pa.int32()),
+    ('length', pa.int32()),
+    ('token_count', pa.int32()),
+    ('text', pa.large_string()),
+])
+
+
+def assign_chunk_ids(chunks, key_for_source):
+    """Give every chunk a stable `<key>#p<page>-c<n>` id plus prev/next links.
+
+    `n` counts chunks within a page, so ids only change when that page's
+    text does. Links run across pages in document order and are "" at the
+    ends (Chroma metadata cannot hold None).
+    """
+    by_source = {}
+    for chunk in chunks:
+        by_source.setdefault(chunk.metadata.get('source', 'Unknown'), []).append(chunk)
+
+    for source, source_chunks in by_source.items():
+        key = key_for_source(source)
+        counters = {}
+        for chunk in source_chunks:
+            page = int(chunk.metadata.get('page', 0))
+            n = counters.get(page, 0)
+            counters[page] = n + 1
+            chunk.metadata['chunk_id'] = f"{key}#p{page}-c{n}"
+        for i, chunk in enumerate(source_chunks):
+            chunk.metadata['prev_id'] = source_chunks[i - 1].metadata['chunk_id'] if i else ""
+            chunk.metadata['next_id'] = (source_chunks[i + 1].metadata['chunk_id']
+                                         if i + 1 < len(source_chunks) else "")
+    return chunks
+
+
+def source_key(source, pdf_directory):
+    """Document part of chunk ids: the path inside the PDF folder"""
+    path = Path(source)
+    try:
+        path = path.relative_to(pdf_directory)
+    except ValueError:
+        path = Path(path.name)
+    return path.as_posix()
+
+
+def chunk_key(chunk_id):
+    """Document part of a chunk id"""
+    return chunk_id.rsplit('#', 1)[0]
+
+
+def file_fingerprint(path):
+    """Cheap change detector for a source file: size and modification time"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class PageStore:
+    """Columnar (Parquet, zstd) store of extracted PDF pages and chunk boundaries.
+
+    Each source gets one pages file and one chunks file, so re-ingesting a
+    PDF rewrites only its own files. Re-chunking and re-embedding read page
+    text from here instead of parsing the PDFs again, and single pages can
+    be fetched by (source, page) without touching the other documents.
+    A store without a directory (e.g. on Streamlit Cloud) stores nothing.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        # {source: {'size', 'mtime_ns', 'pages', 'chunks', 'key'}}
+        self.manifest = {}
+        # {key: source} for finding the document of a chunk id
+        self._sources_by_key = {}
+        # Decoded page tables for random access, keyed by source
+        self._page_cache = {}
+        # Rebuilt chunks per source with an id -> position lookup
+        self._chunk_cache = {}
+        if directory:
+            self._load_manifest()
+
+    def _load_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.manifest = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.manifest = {}
+        self._sources_by_key = {
+            entry['key']: source for source, entry in self.manifest.items() if entry.get('key')
+        }
+
+    def _forget_key(self, source):
+        key = self.manifest.get(source, {}).get('key')
+        if key and self._sources_by_key.get(key) == source:
+            del self._sources_by_key[key]
+
+    def _save_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _path(self, kind, source):
+        name = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16] + ".parquet"
+        return os.path.join(self.directory, kind, name)
+
+    def _write(self, table, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, path + ".tmp", compression=COMPRESSION)
+        os.replace(path + ".tmp", path)
+
+    def sources(self):
+        return list(self.manifest)
+
+    def is_current(self, source, path):
+        """True if the stored pages were extracted from this exact file version"""
+        entry = self.manifest.get(source)
+        if not self.directory or entry is None:
+            return False
+        try:
+            fingerprint = file_fingerprint(path)
+        except OSError:
+            return False
+        return (entry['size'], entry['mtime_ns']) == (fingerprint['size'], fingerprint['mtime_ns'])
+
+    def write_pages(self, source, path, documents):
+        """Store the extracted pages of one PDF, replacing any older version"""
+        if not self.directory:
+            return
+        table = pa.Table.from_pylist([
+            {
+                'source': source,
+                'page': int(doc.metadata.get('page', 0)),
+                'text': doc.page_content,
+                'metadata': json.dumps(doc.metadata, ensure_ascii=False, default=str),
+            }
+            for doc in documents
+        ], schema=PAGE_SCHEMA)
+        self._write(table, self._path(PAGES_DIR, source))
+
+        chunks_path = self._path(CHUNKS_DIR, source)
+        if os.path.exists(chunks_path):
+            # Boundaries of the old version no longer line up with the new text
+            os.remove(chunks_path)
+
+        self._forget_key(source)
+        self.manifest[source] = dict(file_fingerprint(path), pages=len(documents), chunks=0)
+        self._page_cache.pop(source, None)
+        self._chunk_cache.pop(source, None)
+        self._save_manifest()
+
+    def write_chunks(self, chunks):
+        """Store chunk boundaries, one file per source"""
+        if not self.directory:
+            return
+        pages = {}
+        by_source = {}
+        for chunk in chunks:
+            by_source.setdefault(chunk.metadata.get('source'), []).append(chunk)
+
+        for source, source_chunks in by_source.items():
+            if source not in self.manifest:
+                continue
+            if source not in pages:
+                pages[source] = {doc.metadata.get('page', 0): doc.page_content
+                                 for doc in self.load_pages([source])}
+            rows = []
+            for chunk in source_chunks:
+                page = int(chunk.metadata.get('page', 0))
+                start = chunk.metadata.get('start_index')
+                text = pages[source].get(page, "")
+                exact = start is not None and start >= 0 and \
+                    text[start:start + len(chunk.page_content)] == chunk.page_content
+                rows.append({
+                    'chunk_id': chunk.metadata.get('chunk_id'),
+                    'prev_id': chunk.metadata.get('prev_id'),
+                    'next_id': chunk.metadata.get('next_id'),
+                    'source': source,
+                    'page': page,
+                    'start_index': start if start is not None else -1,
+                    'length': len(chunk.page_content),
+                    'token_count': chunk.metadata.get('token_count'),
+                    'text': None if exact else chunk.page_content,
+                })
+            self._write(pa.Table.from_pylist(rows, schema=CHUNK_SCHEMA),
+                        self._path(CHUNKS_DIR, source))
+            self.manifest[source]['chunks'] = len(rows)
+            if source_chunks[0].metadata.get('chunk_id'):
+                self._forget_key(source)
+                key = chunk_key(source_chunks[0].metadata['chunk_id'])
+                self.manifest[source]['key'] = key
+                self._sources_by_key[key] = source
+            self._chunk_cache.pop(source, None)
+        self._save_manifest()
+
+    def remove_source(self, source):
+        if not self.directory or source not in self.manifest:
+            return
+        for kind in (PAGES_DIR, CHUNKS_DIR):
+            path = self._path(kind, source)
+            if os.path.exists(path):
+                os.remove(path)
+        self._forget_key(source)
+        del self.manifest[source]
+        self._page_cache.pop(source, None)
+        self._chunk_cache.pop(source, None)
+        self._save_manifest()
+
+    def _read(self, kind, sources):
+        paths = [self._path(kind, source) for source in sources]
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            return []
+        return pq.ParquetDataset(paths).read().to_pylist()
+
+    def load_pages(self, sources=None):
+        """Stored pages as Documents, in source and page order"""
+        if not self.directory:
+            return []
+        rows = self._read(PAGES_DIR, sorted(sources if sources is not None else self.manifest))
+        return [Document(page_content=row['text'], metadata=json.loads(row['metadata']))
+                for row in rows]
+
+    def load_chunks(self, sources=None):
+        """Rebuild the stored chunks from page text and boundaries, without re-splitting"""
+        if not self.directory:
+            return []
+        sources = sorted(sources if sources is not None else self.manifest)
+        pages = {
+            (doc.metadata.get('source'), doc.metadata.get('page', 0)): doc
+            for doc in self.load_pages(sources)
+        }
+        chunks = []
+        for row in self._read(CHUNKS_DIR, sources):
+            page = pages.get((row['source'], row['page']))
+            if page is None:
+                continue
+            text = row['text']
+            if text is None:
+                text = page.page_content[row['start_index']:row['start_index'] + row['length']]
+            metadata = dict(page.metadata)
+            if row['start_index'] >= 0:
+                metadata['start_index'] = row['start_index']
+            if row['token_count'] is not None:
+                metadata['token_count'] = row['token_count']
+            if row['chunk_id']:
+                metadata.update(chunk_id=row['chunk_id'], prev_id=row['prev_id'],
+                                next_id=row['next_id'])
+            chunks.append(Document(page_content=text, metadata=metadata))
+        return chunks
+
+    def get_page(self, source, page):
+        """Random access to one stored page, or None"""
+        if not self.directory or source not in self.manifest:
+            return None
+        if source not in self._page_cache:
+            path = self._path(PAGES_DIR, source)
+            if not os.path.exists(path):
+                return None
+            table = pq.read_table(path, columns=['page', 'text', 'metadata'])
+            self._page_cache[source] = {
+                row['page']: row for row in table.to_pylist()
+            }
+        row = self._page_cache[source].get(int(page))
+        if row is None:
+            return None
+        return Document(page_content=row['text'], metadata=json.loads(row['metadata']))
+
+    def source_for_chunk(self, chunk_id):
+        """Source a chunk id belongs to, or None"""
+        return self._sources_by_key.get(chunk_key(chunk_id))
+
+    def get_chunks_around(self, chunk_id, window=1):
+        """A chunk and up to `window` neighbours on each side, in document order"""
+        source = self.source_for_chunk(chunk_id) if self.directory else None
+        if source is None:
+            return []
+        if source not in self._chunk_cache:
+            chunks = self.load_chunks([source])
+            positions = {chunk.metadata.get('chunk_id'): i for i, chunk in enumerate(chunks)}
+            self._chunk_cache[source] = (chunks, positions)
+
+        chunks, positions = self._chunk_cache[source]
+        position = positions.get(chunk_id)
+        if position is None:
+            return []
+        return chunks[max(position - window, 0):position + window + 1]
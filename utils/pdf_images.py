@@ -0,0 +1,170 @@
+import os
+from PIL import Image, ImageChops
+from pypdf import PdfReader
+from pypdf.generic import ContentStream
+
+# Embedded images smaller than this on either side are logos, bullets and rules
+MIN_IMAGE_EDGE = int(os.getenv("PDF_IMAGE_MIN_EDGE", "64"))
+# Resolution for page renders that feed the visual index (CLIP sees 224 px anyway)
+FIGURE_RENDER_DPI = int(os.getenv("PDF_FIGURE_DPI", "72"))
+# Near-white pixels are treated as page background when cropping figures
+BACKGROUND_THRESHOLD = 245
+# Rendering pages for vector drawings is opt-in: it needs poppler and is slow
+RENDER_FIGURES = os.getenv("PDF_RENDER_FIGURES", "false").lower() == "true"
+# A page is only rendered as a figure when its content stream draws at least
+# this many path segments and they make up this share of the drawing operators
+FIGURE_MIN_PATH_OPS = int(os.getenv("PDF_FIGURE_MIN_PATH_OPS", "40"))
+FIGURE_MIN_GRAPHICS_SHARE = float(os.getenv("PDF_FIGURE_MIN_GRAPHICS_SHARE", "0.6"))
+
+# Content stream operators that build paths and ones that show text
+PATH_OPERATORS = {b"m", b"l", b"c", b"v", b"y", b"re", b"h"}
+TEXT_OPERATORS = {b"Tj", b"TJ", b"'", b'"'}
+
+_render_warning_shown = False
+
+
+def render_pages(pdf_path, first_page=None, last_page=None, dpi=200):
+    """Rasterise pages with pdf2image (poppler); page numbers are 0-based like the loaders"""
+    from pdf2image import convert_from_path
+
+    if first_page is None and last_page is None:
+        return convert_from_path(pdf_path, dpi=dpi)
+    # pdf2image numbers pages from 1
+    return convert_from_path(
+        pdf_path, dpi=dpi, first_page=(first_page or 0) + 1,
+        last_page=last_page + 1 if last_page is not None else None
+    )
+
+
+def crop_to_content(image):
+    """Trim the blank page margins around a rendered figure, or None if the page is empty"""
+    grey = image.convert('L').point(lambda value: 255 if value >= BACKGROUND_THRESHOLD else 0)
+    box = ImageChops.invert(grey).getbbox()
+    if box is None:
+        return None
+    return image.crop(box)
+
+
+def _count_operators(stream, resources, reader, depth=0):
+    """(path operators, text operators) of a content stream and the forms it draws"""
+    paths = texts = 0
+    try:
+        operations = ContentStream(stream, reader).operations
+    except Exception:
+        return 0, 0
+    xobjects = resources.get("/XObject") if resources else None
+    xobjects = xobjects.get_object() if xobjects is not None else {}
+    for operands, operator in operations:
+        if operator in PATH_OPERATORS:
+            paths += 1
+        elif operator in TEXT_OPERATORS:
+            texts += 1
+        elif operator == b"Do" and depth < 3 and operands and operands[0] in xobjects:
+            form = xobjects[operands[0]].get_object()
+            if form.get("/Subtype") == "/Form":
+                inner = _count_operators(form, form.get("/Resources") or resources,
+                                         reader, depth + 1)
+                paths, texts = paths + inner[0], texts + inner[1]
+    return paths, texts
+
+
+def is_figure_page(page, reader):
+    """True if a page is mostly vector drawing rather than text"""
+    contents = page.get_contents()
+    if contents is None:
+        return False
+    resources = page.get("/Resources")
+    paths, texts = _count_operators(contents, resources.get_object() if resources else None,
+                                    reader)
+    return paths >= FIGURE_MIN_PATH_OPS and paths / (paths + texts) >= FIGURE_MIN_GRAPHICS_SHARE
+
+
+def figure_pages(pdf_path):
+    """0-based numbers of the pages worth rendering as figures"""
+    reader = PdfReader(pdf_path)
+    pages = []
+    for page_number, page in enumerate(reader.pages):
+        try:
+            if is_figure_page(page, reader):
+                pages.append(page_number)
+        except Exception as e:
+            print(f"⚠️ Could not inspect page {page_number + 1} of {pdf_path}: {e}")
+    return pages
+
+
+def _embedded_images(pdf_path, min_edge):
+    reader = PdfReader(pdf_path)
+    for page_number, page in enumerate(reader.pages):
+        try:
+            page_images = list(page.images)
+        except Exception as e:
+            print(f"⚠️ Could not read images on page {page_number + 1} of {pdf_path}: {e}")
+            continue
+        for index, page_image in enumerate(page_images):
+            try:
+                image = page_image.image
+            except Exception:
+                # Unsupported filters (e.g. JBIG2) - the page render still covers it
+                continue
+            if image is None or min(image.size) < min_edge:
+                continue
+            yield image.convert('RGB'), page_number, index
+
+
+def extract_pdf_images(pdf_path, render_figures=None, min_edge=None, dpi=None):
+    """Images of one PDF for visual search: [(PIL image, metadata)].
+
+    Embedded raster images are extracted as they are. With `render_figures`
+    (default PDF_RENDER_FIGURES) the pages that are mostly vector drawing
+    (floor plans, diagrams) are also rendered and cropped to their content;
+    text pages are never rendered, since CLIP scores any two document-like
+    images as similar. Rendering needs pdf2image/poppler and is skipped if
+    they are missing. Metadata uses the same `source` and 0-based `page` as
+    the text chunks.
+    """
+    global _render_warning_shown
+    min_edge = min_edge or MIN_IMAGE_EDGE
+    results = []
+    for image, page, index in _embedded_images(pdf_path, min_edge):
+        results.append((image, {
+            'source': pdf_path,
+            'page': page,
+            'kind': 'embedded',
+            'index': index,
+            'width': image.width,
+            'height': image.height,
+        }))
+
+    if render_figures is None:
+        render_figures = RENDER_FIGURES
+    if not render_figures:
+        return results
+
+    for page in figure_pages(pdf_path):
+        try:
+            rendered = render_pages(pdf_path, page, page, dpi=dpi or FIGURE_RENDER_DPI)[0]
+        except Exception as e:
+            if not _render_warning_shown:
+                print(f"⚠️ Page rendering unavailable ({e}); indexing embedded images only")
+                _render_warning_shown = True
+            return results
+        figure = crop_to_content(rendered.convert('RGB'))
+        if figure is None or min(figure.size) < min_edge:
+            continue
+        results.append((figure, {
+            'source': pdf_path,
+            'page': page,
+            'kind': 'page',
+            'index': 0,
+            'width': figure.width,
+            'height': figure.height,
+        }))
+    return results
+
+
+def load_image(image):
+    """Accept a path or a PIL image"""
+    if isinstance(image, Image.Image):
+        return image.convert('RGB')
+    with Image.open(image) as opened:
+        return opened.convert('RGB')
@@ -1,19 +1,73 @@
 import os
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
+import shutil
+import threading
+from pathlib import Path
+import numpy as np
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 import chromadb
+from utils.metadata_index import MetadataIndex, build_metadata_filter, CONTENT_TYPES
+from utils.token_chunker import TokenCounter, split_by_tokens
+from utils.embedding_scheduler import BucketedEmbeddings, EMBEDDING_MODEL
+from utils.flat_index import FlatVectorStore, DEFAULT_VECTOR_BACKEND, DEFAULT_QUANTIZATION
+from utils.sharded_index import ShardedVectorStore, DEFAULT_SHARDS
+from utils.summary_index import SummaryIndex
+from utils.page_store import PageStore, assign_chunk_ids, file_fingerprint, source_key
+from utils.ingest_journal import IngestJournal, IngestProgress, page_batches
+from utils.visual_index import VisualIndex
+from utils.hnsw_config import (
+    load_hnsw_params, collection_configuration, current_hnsw_params, set_search_ef
+)
+
+COLLECTION_NAME = "pdf_collection"
+
+# Filters selecting at most this many chunks are scored exactly with NumPy
+EXACT_SEARCH_LIMIT = 5000
+# Chunks per vector store write (Chroma rejects very large single batches)
+INGEST_BATCH_SIZE = 1000
+# Searches over more chunks than this first narrow down to documents and sections
+TWO_STAGE_MIN_CHUNKS = int(os.getenv("TWO_STAGE_MIN_CHUNKS", "2000"))
+TWO_STAGE_DOCUMENTS = 3
+TWO_STAGE_SECTIONS = 6
+# Build the local CLIP index of PDF images and figures during ingestion; when
+# off it is only built on request (index_visuals / the 'index images' command)
+VISUAL_INDEX = os.getenv("VISUAL_INDEX", "false").lower() == "true"
 
 class PDFProcessor:
-    def __init__(self, pdf_directory="pdfs", persist_directory="data/chroma_db"):
+    def __init__(self, pdf_directory="pdfs", persist_directory="data/chroma_db",
+                 embedding_workers=None, vector_backend=None, quantization=None,
+                 shards=None):
         self.pdf_directory = pdf_directory
         self.persist_directory = persist_directory
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        self.vector_backend = vector_backend or DEFAULT_VECTOR_BACKEND
+        self.quantization = quantization or DEFAULT_QUANTIZATION
+        self.shards = shards or DEFAULT_SHARDS
+        self.flat_directory = os.path.join(persist_directory, "flat_index")
+        self.embeddings = BucketedEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            workers=embedding_workers
         )
         self.vectorstore = None
+        self.token_counter = None
         self.is_cloud = self._is_streamlit_cloud()
+        self.metadata_index = MetadataIndex(
+            os.path.join(persist_directory, "metadata_index.json")
+        )
+        self.summary_index = SummaryIndex(persist_directory)
+        self.page_store = PageStore(
+            None if self.is_cloud else os.path.join(persist_directory, "page_store")
+        )
+        self.journal = IngestJournal(
+            None if self.is_cloud else os.path.join(persist_directory, "ingest_journal.jsonl")
+        )
+        self.visual_index = (
+            None if self.is_cloud else VisualIndex(os.path.join(persist_directory, "visual_index"))
+        )
+        # Serialises incremental updates (e.g. from the folder watcher)
+        self._update_lock = threading.Lock()
     
     def _is_streamlit_cloud(self):
         """Check if running on Streamlit Cloud"""
@@ -36,47 +90,157 @@ class PDFProcessor:
             print(f"⚠️ PDF directory '{self.pdf_directory}' not found!")
             return []
         
-        loader = DirectoryLoader(
-            self.pdf_directory,
-            glob="**/*.pdf",
-            loader_cls=PyPDFLoader,
-            show_progress=True
-        )
+        documents = []
+        parsed = 0
+        paths = self._pdf_paths()
+        for path in paths:
+            pages, was_parsed = self._load_pages(path)
+            documents.extend(pages)
+            parsed += was_parsed
         
-        documents = loader.load()
-        print(f"✓ Loaded {len(documents)} pages from PDFs")
+        print(f"✓ Loaded {len(documents)} pages from PDFs "
+              f"({parsed} parsed, {len(paths) - parsed} from the page store)")
         
         return documents
     
+    def _pdf_paths(self):
+        """PDFs in the folder; the page store forgets any that were deleted"""
+        paths = sorted(str(path) for path in Path(self.pdf_directory).rglob("*.pdf"))
+        for source in set(self.page_store.sources()) - set(paths):
+            self.page_store.remove_source(source)
+        return paths
+    
+    def _load_pages(self, path):
+        """Pages of one PDF from the page store if unchanged, else parsed; (pages, parsed)"""
+        if self.page_store.is_current(path, path):
+            return self.page_store.load_pages([path]), False
+        pages = self.load_pdf(path)
+        self.page_store.write_pages(path, path, pages)
+        return pages, True
+    
+    def _page_count(self, path):
+        entry = self.page_store.manifest.get(path)
+        if entry and self.page_store.is_current(path, path):
+            return entry['pages']
+        try:
+            return len(PdfReader(path).pages)
+        except Exception:
+            return 0
+    
     def split_documents(self, documents):
-        """Split documents into smaller chunks"""
+        """Split documents into chunks sized to the embedding model's token window"""
         print("Splitting documents into chunks...")
-        
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        
-        chunks = text_splitter.split_documents(documents)
+        chunks = self._split(documents)
         print(f"✓ Created {len(chunks)} text chunks")
         
         return chunks
     
+    def _split(self, documents):
+        if self.token_counter is None:
+            self.token_counter = TokenCounter.from_embeddings(self.embeddings)
+        
+        if self.token_counter is not None:
+            chunks = split_by_tokens(documents, self.token_counter)
+        else:
+            # No tokenizer available: fall back to character-sized chunks
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200,
+                length_function=len,
+                add_start_index=True
+            )
+            chunks = text_splitter.split_documents(documents)
+        
+        return assign_chunk_ids(chunks, self._chunk_key)
+    
+    def _chunk_key(self, source):
+        """Document part of chunk ids: the path inside the PDF folder"""
+        return source_key(source, self.pdf_directory)
+    
+    def _open_flat_store(self, directory, fresh=False, must_exist=False):
+        if self.is_cloud:
+            return FlatVectorStore(self.embeddings, quantization=self.quantization)
+        if fresh:
+            shutil.rmtree(directory, ignore_errors=True)
+        try:
+            return FlatVectorStore.load(self.embeddings, directory)
+        except FileNotFoundError:
+            if must_exist:
+                raise
+            return FlatVectorStore(self.embeddings, directory, quantization=self.quantization)
+    
+    def _open_chroma_store(self, client, name, fresh=False):
+        if fresh:
+            # Start from an empty collection so a rebuild never duplicates chunks
+            try:
+                client.delete_collection(name)
+            except Exception:
+                pass
+        # Shards share the tuned settings of the logical collection
+        params = load_hnsw_params(self.persist_directory, COLLECTION_NAME)
+        store = Chroma(
+            client=client,
+            collection_name=name,
+            embedding_function=self.embeddings,
+            collection_configuration=collection_configuration(params)
+        )
+        # An existing collection keeps its build settings; search ef can change live
+        if 'ef_search' in params and current_hnsw_params(store).get('ef_search') != params['ef_search']:
+            set_search_ef(store, params['ef_search'])
+        return store
+    
+    def _open_vectorstore(self, fresh=False, must_exist=False):
+        """Open the configured backend; fresh=True empties it first"""
+        if self.vector_backend == "flat":
+            if self.shards > 1:
+                stores = [
+                    self._open_flat_store(
+                        os.path.join(self.flat_directory, f"shard_{i:02d}"), fresh
+                    )
+                    for i in range(self.shards)
+                ]
+            else:
+                return self._open_flat_store(self.flat_directory, fresh, must_exist)
+        else:
+            client = self._get_chroma_client()
+            if self.shards > 1:
+                stores = [
+                    self._open_chroma_store(client, f"{COLLECTION_NAME}_shard_{i:02d}", fresh)
+                    for i in range(self.shards)
+                ]
+            else:
+                return self._open_chroma_store(client, COLLECTION_NAME, fresh)
+        
+        return ShardedVectorStore(stores, self.embeddings)
+    
+    def _add_chunks(self, chunks):
+        """Add chunks to the vector store in batches Chroma can accept"""
+        for start in range(0, len(chunks), INGEST_BATCH_SIZE):
+            batch = chunks[start:start + INGEST_BATCH_SIZE]
+            # Stable chunk ids double as vector ids, so re-adding a chunk upserts it
+            ids = [chunk.metadata.get('chunk_id') for chunk in batch]
+            self.vectorstore.add_documents(batch, ids=ids if all(ids) else None)
+    
     def create_vectorstore(self, chunks):
         """Create vector database from chunks"""
         print("Creating vector database (this may take a few minutes)...")
+        self.embeddings.reset_stats()
         
-        client = self._get_chroma_client()
+        self.vectorstore = self._open_vectorstore(fresh=True)
+        self._add_chunks(chunks)
         
-        self.vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            client=client,
-            collection_name="pdf_collection"
-        )
+        self.metadata_index.build_from_metadatas([chunk.metadata for chunk in chunks])
+        if not self.is_cloud:
+            self.metadata_index.save()
+        self._build_summaries()
         
+        self._report_created()
+    
+    def _report_created(self):
         print(f"✓ Vector database created")
+        if self.shards > 1:
+            print(f"✓ Partitioned into {self.shards} shards by source document")
+        print(f"✓ {self.embeddings.report()}")
         if not self.is_cloud:
             print(f"✓ Saved to {self.persist_directory}")
     
@@ -85,37 +249,405 @@ class PDFProcessor:
         print("Loading existing vector database...")
         
         try:
-            client = self._get_chroma_client()
+            self.vectorstore = self._open_vectorstore(must_exist=True)
             
-            self.vectorstore = Chroma(
-                client=client,
-                collection_name="pdf_collection",
-                embedding_function=self.embeddings
-            )
+            if not self.metadata_index.load():
+                metadatas = self.vectorstore.get(include=["metadatas"])["metadatas"]
+                self.metadata_index.build_from_metadatas(metadatas)
+                if not self.is_cloud:
+                    self.metadata_index.save()
+            if not self.summary_index.load():
+                self._build_summaries()
+            if self.visual_index is not None and self.visual_index.load():
+                print(f"✓ Visual index loaded ({len(self.visual_index)} images)")
             
             print("✓ Vector database loaded")
         except Exception as e:
             print(f"⚠️ Could not load vector database: {e}")
             self.vectorstore = None
     
-    def process_all_pdfs(self):
-        """Complete pipeline: load, split, and store PDFs"""
-        documents = self.load_pdfs()
+    def _build_summaries(self, source=None):
+        """Recompute document/section summary vectors from the stored chunk embeddings"""
+        where = {"source": source} if source else None
+        data = self.vectorstore.get(where=where, include=["embeddings", "metadatas", "documents"])
+        args = (data["ids"], data["embeddings"], data["metadatas"], data["documents"])
+        if source:
+            self.summary_index.update_source(source, *args)
+        else:
+            self.summary_index.build(*args)
+        if not self.is_cloud:
+            self.summary_index.save(source)
+    
+    def load_pdf(self, pdf_path):
+        """Load the pages of a single PDF"""
+        documents = PyPDFLoader(str(pdf_path)).load()
+        source = str(Path(pdf_path))
+        for doc in documents:
+            # Same form the folder scan uses, so re-ingestion replaces old chunks
+            doc.metadata['source'] = source
+            doc.metadata.setdefault('type', 'text')
+        return documents
+    
+    def ingest_pdf(self, pdf_path):
+        """Add or replace one PDF in the index; with sharding only its shard is touched.
+
+        New chunks are upserted before stale ones are deleted, so searches
+        running meanwhile never see the document missing.
+        """
+        source = str(Path(pdf_path))
+        pages = self.load_pdf(pdf_path)
+        chunks = self._split(pages)
         
-        if not documents:
+        with self._update_lock:
+            if self.vectorstore is None:
+                self.vectorstore = self._open_vectorstore()
+            self.page_store.write_pages(source, pdf_path, pages)
+            self.page_store.write_chunks(chunks)
+            
+            old_ids = set(self.vectorstore.get(where={"source": source})["ids"])
+            self._add_chunks(chunks)
+            stale = old_ids - {chunk.metadata['chunk_id'] for chunk in chunks}
+            if stale:
+                self.vectorstore.delete(ids=list(stale))
+            
+            self.metadata_index.replace_source(source, chunks)
+            if not self.is_cloud:
+                self.metadata_index.save()
+            self._build_summaries(source)
+        
+        print(f"✓ Indexed {source} ({len(chunks)} chunks)")
+        # A PDF already in the visual index is kept in sync even when it is built on request
+        if self.visual_index is not None and (VISUAL_INDEX or source in self.visual_index.manifest):
+            try:
+                self.visual_index.index_pdf(source)
+            except Exception as e:
+                print(f"⚠️ Could not index images of {source}: {e}")
+        return len(chunks)
+    
+    def remove_pdf(self, pdf_path):
+        """Remove one PDF's chunks from the index"""
+        with self._update_lock:
+            if self.vectorstore is None:
+                return
+            
+            source = str(Path(pdf_path))
+            self.vectorstore.delete(where={"source": source})
+            self.metadata_index.remove_source(source)
+            self.summary_index.remove_source(source)
+            self.page_store.remove_source(source)
+            if not self.is_cloud:
+                self.metadata_index.save()
+                self.summary_index.save(source)
+        if self.visual_index is not None:
+            self.visual_index.remove_pdf(source)
+        print(f"✓ Removed {source} from the index")
+    
+    def stale_pdfs(self):
+        """PDFs in the folder that are new or changed since they were indexed"""
+        paths = sorted(str(path) for path in Path(self.pdf_directory).rglob("*.pdf"))
+        return [
+            path for path in paths
+            if path not in self.metadata_index.sources or not self.page_store.is_current(path, path)
+        ]
+    
+    def missing_pdfs(self):
+        """Indexed PDFs whose file has since been deleted"""
+        return [source for source in self.metadata_index.sources if not os.path.exists(source)]
+    
+    def _job_settings(self):
+        """A journal only resumes into an index built the same way"""
+        return {
+            'pdf_directory': self.pdf_directory,
+            'backend': self.vector_backend,
+            'shards': self.shards,
+            'quantization': self.quantization,
+            'model': EMBEDDING_MODEL,
+        }
+    
+    def has_interrupted_job(self):
+        return self.journal.interrupted_job() == self._job_settings()
+    
+    def process_all_pdfs(self, on_progress=None, resume=True):
+        """Complete pipeline: load, split, and store PDFs.
+
+        Progress is checkpointed per file and per batch of pages, so a run
+        that was killed resumes where it stopped (unless resume=False).
+        `on_progress` receives IngestProgress snapshots.
+        """
+        print(f"Loading PDFs from {self.pdf_directory}...")
+        if not os.path.exists(self.pdf_directory):
+            print(f"⚠️ PDF directory '{self.pdf_directory}' not found!")
+            return False
+        paths = self._pdf_paths()
+        if not paths:
             print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
             return False
         
-        chunks = self.split_documents(documents)
-        self.create_vectorstore(chunks)
+        settings = self._job_settings()
+        state = self.journal.resume_state(settings) if resume else None
+        if state is None:
+            print("Creating vector database (this may take a few minutes)...")
+            self.vectorstore = self._open_vectorstore(fresh=True)
+            state = self.journal.start(settings)
+        else:
+            print(f"↻ Resuming interrupted run ({len(state.completed_files)} files already done)...")
+            self.vectorstore = self._open_vectorstore()
+            # Files deleted since the interrupted run
+            for source in set(state.fingerprints) - set(paths):
+                self.vectorstore.delete(where={"source": source})
+        
+        self.embeddings.reset_stats()
+        progress = IngestProgress(sum(self._page_count(path) for path in paths), on_progress)
+        
+        for path in paths:
+            fingerprint = file_fingerprint(path)
+            if state.file_complete(path, fingerprint):
+                progress.skip(self._page_count(path))
+                continue
+            if state.file_changed(path, fingerprint):
+                self.vectorstore.delete(where={"source": path})
+                state.forget(path)
+            if path not in state.fingerprints:
+                self.journal.file_started(path, fingerprint)
+            
+            pages, _ = self._load_pages(path)
+            chunks = self._split(pages)
+            self.page_store.write_chunks(chunks)
+            
+            page_numbers = [int(page.metadata.get('page', 0)) for page in pages]
+            for first, last, batch in page_batches(page_numbers):
+                if state.batch_complete(path, first, last):
+                    progress.skip(len(batch))
+                    continue
+                batch_chunks = [c for c in chunks if first <= int(c.metadata.get('page', 0)) <= last]
+                self._add_chunks(batch_chunks)
+                self.journal.batch_done(path, first, last, len(batch_chunks))
+                progress.advance(len(batch), len(batch_chunks), current=path)
+            
+            self.journal.file_done(path)
         
+        metadatas = self.vectorstore.get(include=["metadatas"])["metadatas"]
+        self.metadata_index.build_from_metadatas(metadatas)
+        if not self.is_cloud:
+            self.metadata_index.save()
+        self._build_summaries()
+        self.journal.finish()
+        
+        print(f"✓ Stored {len(metadatas)} chunks from {len(paths)} PDFs")
+        self._report_created()
+        if VISUAL_INDEX:
+            self.index_visuals(paths)
         return True
     
-    def search(self, query, k=4):
-        """Search for relevant documents"""
+    def index_visuals(self, paths=None):
+        """Bring the visual (image) index up to date with the PDF folder"""
+        if self.visual_index is None:
+            return 0
+        print("Indexing PDF images and figures locally...")
+        try:
+            return self.visual_index.index_all(paths if paths is not None else self._pdf_paths())
+        except Exception as e:
+            print(f"⚠️ Visual index not built: {e}")
+            return 0
+    
+    def rebuild_from_store(self, rechunk=False):
+        """Rebuild the vector index from the page store without parsing any PDF.
+
+        rechunk=False re-embeds the stored chunks (e.g. after changing the
+        embedding model); rechunk=True splits the stored pages again first
+        (e.g. after changing chunk sizes).
+        """
+        if rechunk:
+            chunks = self.split_documents(self.page_store.load_pages())
+            self.page_store.write_chunks(chunks)
+        else:
+            chunks = self.page_store.load_chunks()
+        
+        if not chunks:
+            print("Page store is empty! Run a full process of the PDFs first.")
+            return False
+        
+        print(f"✓ Read {len(chunks)} chunks from the page store")
+        self.create_vectorstore(chunks)
+        return True
+    
+    def get_page(self, source, page):
+        """Full text of one page, read from the page store"""
+        sources = self.metadata_index.resolve_sources(source) or [source]
+        return self.page_store.get_page(sources[0], page)
+    
+    def get_context(self, chunk_id, window=1):
+        """A chunk plus `window` neighbours on each side, found by id rather than by search"""
+        chunks = self.page_store.get_chunks_around(chunk_id, window)
+        if chunks or not self.vectorstore:
+            return chunks
+        
+        # No page store (e.g. Streamlit Cloud): follow the prev/next links in the index
+        def fetch(ids):
+            data = self.vectorstore.get(ids=ids, include=["documents", "metadatas"])
+            return [Document(page_content=text, metadata=metadata)
+                    for text, metadata in zip(data["documents"], data["metadatas"])]
+        
+        found = fetch([chunk_id])
+        if not found:
+            return []
+        before, after = [], []
+        for _ in range(window):
+            previous = before[0] if before else found[0]
+            if previous.metadata.get('prev_id'):
+                before = fetch([previous.metadata['prev_id']])[:1] + before
+            following = after[-1] if after else found[0]
+            if following.metadata.get('next_id'):
+                after += fetch([following.metadata['next_id']])[:1]
+        return before + found + after
+    
+    def _content_types(self):
+        return sorted(set(CONTENT_TYPES) | set(self.metadata_index.content_types()))
+    
+    def build_filter(self, source=None, page_from=None, page_to=None, content_type=None):
+        """Turn search filters into a vector store filter.
+
+        Returns (where, estimated_chunks). `where` is None when nothing is
+        filtered; estimated_chunks is 0 when the filter cannot match anything.
+        """
+        sources = None
+        if source:
+            sources = self.metadata_index.resolve_sources(source)
+            if not sources:
+                return None, 0
+        
+        where = build_metadata_filter(sources, page_from, page_to, content_type,
+                                      self._content_types())
+        if where is None:
+            return None, None
+        return where, self.metadata_index.count(sources, page_from, page_to, content_type)
+    
+    def _exact_search(self, vectors, where, k):
+        """Score every chunk matching `where` exactly, for each query vector"""
+        data = self.vectorstore.get(
+            where=where,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if len(data["ids"]) == 0:
+            return [[] for _ in vectors]
+        
+        matrix = np.asarray(data["embeddings"], dtype=np.float32)
+        results = []
+        for vector in vectors:
+            # Same ranking as Chroma's default squared-L2 space
+            distances = ((matrix - np.asarray(vector, dtype=np.float32)) ** 2).sum(axis=1)
+            top = min(k, len(distances))
+            best = np.argpartition(distances, top - 1)[:top]
+            best = best[np.argsort(distances[best])]
+            results.append([
+                Document(page_content=data["documents"][i], metadata=data["metadatas"][i])
+                for i in best
+            ])
+        return results
+    
+    def _search_vectors(self, vectors, k, where=None, estimated=None, ids=None):
+        """Run one or more query vectors through the (optionally filtered) index"""
+        if hasattr(self.vectorstore, 'similarity_search_by_vectors'):
+            # Flat backend: one exact matrix product for all queries
+            return self.vectorstore.similarity_search_by_vectors(vectors, k, filter=where, ids=ids)
+        
+        if ids is None and where is not None and estimated is not None \
+                and estimated <= EXACT_SEARCH_LIMIT:
+            return self._exact_search(vectors, where, k)
+        
+        # Chroma restricts the HNSW search to the given ids
+        extra = {'ids': ids} if ids is not None else {}
+        return [
+            self.vectorstore.similarity_search_by_vector(vector, k=k, filter=where, **extra)
+            for vector in vectors
+        ]
+    
+    def _use_two_stage(self, estimated):
+        total = estimated if estimated is not None else self.metadata_index.count()
+        return len(self.summary_index) > 0 and total > TWO_STAGE_MIN_CHUNKS
+    
+    def _two_stage_search(self, vectors, k, source=None, page_from=None, page_to=None,
+                          content_type=None):
+        """Pick the best documents and sections per query, then score only their chunks"""
+        sources = self.metadata_index.resolve_sources(source) if source else None
+        results = []
+        for vector in vectors:
+            chosen, ids = self.summary_index.select(
+                vector, sources, page_from, page_to,
+                top_documents=TWO_STAGE_DOCUMENTS, top_sections=TWO_STAGE_SECTIONS
+            )
+            if ids is None:
+                where, _ = self.build_filter(source, page_from, page_to, content_type)
+                results += self._search_vectors([vector], k, where)
+                continue
+            # Scoping by source as well lets a sharded store skip unrelated shards
+            where = build_metadata_filter(chosen, page_from, page_to, content_type,
+                                          self._content_types())
+            results += self._search_vectors([vector], k, where, ids=ids)
+        return results
+    
+    def search(self, query, k=4, source=None, page_from=None, page_to=None, content_type=None):
+        """Search for relevant documents, optionally restricted by metadata"""
+        if not self.vectorstore:
+            print("Vector database not loaded!")
+            return []
+        
+        where, estimated = self.build_filter(source, page_from, page_to, content_type)
+        if estimated == 0:
+            return []
+        
+        if self._use_two_stage(estimated):
+            vector = self.embeddings.embed_query(query)
+            return self._two_stage_search([vector], k, source, page_from, page_to, content_type)[0]
+        
+        if where is None:
+            return self.vectorstore.similarity_search(query, k=k)
+        
+        vector = self.embeddings.embed_query(query)
+        return self._search_vectors([vector], k, where, estimated)[0]
+    
+    def search_batch(self, queries, k=4, source=None, page_from=None, page_to=None,
+                     content_type=None):
+        """Search several queries at once, embedding them in one batched pass.
+
+        Returns a single list of documents with duplicates across queries
+        removed, interleaved so every query's best hits come first.
+        """
         if not self.vectorstore:
             print("Vector database not loaded!")
             return []
         
-        results = self.vectorstore.similarity_search(query, k=k)
+        queries = [q for q in queries if q and q.strip()]
+        if not queries:
+            return []
+        
+        where, estimated = self.build_filter(source, page_from, page_to, content_type)
+        if estimated == 0:
+            return []
+        
+        # One forward pass for all queries instead of one per query
+        vectors = self.embeddings.embed_documents(queries)
+        if self._use_two_stage(estimated):
+            per_query = self._two_stage_search(vectors, k, source, page_from, page_to, content_type)
+        else:
+            per_query = self._search_vectors(vectors, k, where, estimated)
+        
+        results = []
+        seen = set()
+        for rank in range(k):
+            for hits in per_query:
+                if rank >= len(hits):
+                    continue
+                doc = hits[rank]
+                key = (
+                    doc.metadata.get('source'),
+                    doc.metadata.get('page'),
+                    doc.metadata.get('start_index'),
+                    doc.page_content if doc.metadata.get('start_index') is None else None
+                )
+                if key in seen:
+                    continue
+                seen.add(key)
+                results.append(doc)
+        
         return results
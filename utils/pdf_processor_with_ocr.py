@@ -1,34 +1,63 @@
 import os
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
-from pdf2image import convert_from_path
 import pytesseract
 from PIL import Image
+from pypdf import PdfReader
+from utils.metadata_index import build_metadata_filter
+from utils.token_chunker import TokenCounter, split_by_tokens
+from utils.embedding_scheduler import BucketedEmbeddings, EMBEDDING_MODEL
+from utils.page_store import assign_chunk_ids, file_fingerprint, source_key
+from utils.ingest_journal import IngestJournal, IngestProgress, page_batches
+from utils.pdf_images import render_pages
 
 class PDFProcessorWithOCR:
-    def __init__(self, pdf_directory="pdfs", persist_directory="data/chroma_db"):
+    def __init__(self, pdf_directory="pdfs", persist_directory="data/chroma_db",
+                 embedding_workers=None):
         self.pdf_directory = pdf_directory
         self.persist_directory = persist_directory
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        self.embeddings = BucketedEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            workers=embedding_workers
         )
         self.vectorstore = None
+        self.token_counter = None
+        self.journal = IngestJournal(os.path.join(persist_directory, "ocr_ingest_journal.jsonl"))
+        # Text layer of the PDF being processed, reused across its page batches
+        self._regular_pages = (None, [])
     
-    def extract_text_from_pdf_with_ocr(self, pdf_path):
-        """Extract text from PDF including images using OCR"""
+    def _load_regular_pages(self, pdf_path):
+        if self._regular_pages[0] != pdf_path:
+            self._regular_pages = (pdf_path, PyPDFLoader(pdf_path).load())
+        return self._regular_pages[1]
+    
+    def _page_count(self, pdf_path):
+        """Pages in a PDF from its page tree, without extracting any text"""
+        try:
+            return len(PdfReader(pdf_path).pages)
+        except Exception:
+            return 0
+    
+    def extract_text_from_pdf_with_ocr(self, pdf_path, first_page=None, last_page=None):
+        """Extract text from PDF including images using OCR.
+
+        first_page/last_page (0-based, inclusive) limit the work to a page range.
+        """
         print(f"Processing {pdf_path} with OCR...")
         
         all_text = []
+        first = first_page or 0
         
         # First, try to extract regular text
         try:
-            loader = PyPDFLoader(pdf_path)
-            regular_docs = loader.load()
+            regular_docs = self._load_regular_pages(pdf_path)
             
             for doc in regular_docs:
+                page = doc.metadata.get('page', 0)
+                if page < first or (last_page is not None and page > last_page):
+                    continue
                 if doc.page_content.strip():
                     all_text.append({
                         'text': doc.page_content,
@@ -41,9 +70,9 @@ class PDFProcessorWithOCR:
         
         # Then, extract text from images using OCR
         try:
-            images = convert_from_path(pdf_path)
+            images = render_pages(pdf_path, first_page, last_page)
             
-            for page_num, image in enumerate(images):
+            for page_num, image in enumerate(images, first):
                 print(f"  OCR scanning page {page_num + 1}...")
                 
                 # Extract text from image
@@ -71,32 +100,46 @@ class PDFProcessorWithOCR:
         for pdf_file in pdf_files:
             pdf_path = os.path.join(self.pdf_directory, pdf_file)
             extracted_data = self.extract_text_from_pdf_with_ocr(pdf_path)
-            
-            for item in extracted_data:
-                doc = Document(
-                    page_content=item['text'],
-                    metadata={
-                        'source': item['source'],
-                        'page': item['page'],
-                        'type': item['type']
-                    }
-                )
-                documents.append(doc)
+            documents.extend(self._extracted_documents(extracted_data))
         
         print(f"✓ Loaded {len(documents)} pages/sections from PDFs")
         return documents
     
+    def _extracted_documents(self, extracted_data):
+        return [
+            Document(
+                page_content=item['text'],
+                metadata={
+                    'source': item['source'],
+                    'page': item['page'],
+                    'type': item['type']
+                }
+            )
+            for item in extracted_data
+        ]
+    
     def split_documents(self, documents):
-        """Split documents into smaller chunks"""
+        """Split documents into chunks sized to the embedding model's token window"""
         print("Splitting documents into chunks...")
         
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
+        if self.token_counter is None:
+            self.token_counter = TokenCounter.from_embeddings(self.embeddings)
         
-        chunks = text_splitter.split_documents(documents)
+        if self.token_counter is not None:
+            chunks = split_by_tokens(documents, self.token_counter)
+        else:
+            # No tokenizer available: fall back to character-sized chunks
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200,
+                length_function=len,
+                add_start_index=True
+            )
+            chunks = text_splitter.split_documents(documents)
+        
+        # Stable ids make re-adding a chunk after a restart an upsert, not a duplicate;
+        # keyed like PDFProcessor so same-named PDFs in subfolders stay apart
+        assign_chunk_ids(chunks, lambda source: source_key(source, self.pdf_directory))
         print(f"✓ Created {len(chunks)} text chunks")
         
         return chunks
@@ -104,6 +147,7 @@ class PDFProcessorWithOCR:
     def create_vectorstore(self, chunks):
         """Create vector database from chunks"""
         print("Creating vector database (this may take a few minutes)...")
+        self.embeddings.reset_stats()
         
         self.vectorstore = Chroma.from_documents(
             documents=chunks,
@@ -112,6 +156,7 @@ class PDFProcessorWithOCR:
         )
         
         print(f"✓ Vector database created and saved to {self.persist_directory}")
+        print(f"✓ {self.embeddings.report()}")
     
     def load_vectorstore(self):
         """Load existing vector database"""
@@ -124,24 +169,95 @@ class PDFProcessorWithOCR:
         
         print("✓ Vector database loaded")
     
-    def process_all_pdfs(self):
-        """Complete pipeline: load, split, and store PDFs"""
-        documents = self.load_pdfs()
-        
-        if not documents:
+    def _job_settings(self):
+        return {'pdf_directory': self.pdf_directory, 'model': EMBEDDING_MODEL, 'ocr': True}
+    
+    def has_interrupted_job(self):
+        return self.journal.interrupted_job() == self._job_settings()
+    
+    def process_all_pdfs(self, on_progress=None, resume=True):
+        """Complete pipeline: load, OCR, split, and store PDFs.
+
+        OCR and embedding are checkpointed per file and per batch of pages,
+        so a killed run resumes where it stopped (unless resume=False).
+        """
+        pdf_files = sorted(f for f in os.listdir(self.pdf_directory) if f.endswith('.pdf'))
+        if not pdf_files:
             print("No PDFs found! Please add PDF files to the 'pdfs' folder.")
             return False
         
-        chunks = self.split_documents(documents)
-        self.create_vectorstore(chunks)
+        settings = self._job_settings()
+        state = self.journal.resume_state(settings) if resume else None
+        if state is None:
+            print("Creating vector database (this may take a few minutes)...")
+            # Start from an empty collection so a rerun never duplicates chunks
+            Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self.embeddings
+            ).delete_collection()
+            state = self.journal.start(settings)
+        else:
+            print(f"↻ Resuming interrupted run ({len(state.completed_files)} files already done)...")
+        self.load_vectorstore()
+        self.embeddings.reset_stats()
         
+        paths = [os.path.join(self.pdf_directory, pdf_file) for pdf_file in pdf_files]
+        page_counts = {path: self._page_count(path) for path in paths}
+        progress = IngestProgress(sum(page_counts.values()), on_progress)
+        
+        for path in paths:
+            fingerprint = file_fingerprint(path)
+            if state.file_complete(path, fingerprint):
+                progress.skip(page_counts[path])
+                continue
+            if state.file_changed(path, fingerprint):
+                self.vectorstore.delete(where={"source": path})
+                state.forget(path)
+            if path not in state.fingerprints:
+                self.journal.file_started(path, fingerprint)
+            
+            # Last chunk stored for this file, so links continue across batches
+            previous_id = ""
+            for first, last, batch in page_batches(range(page_counts[path])):
+                if state.batch_complete(path, first, last):
+                    previous_id = state.last_chunk_id(path, first, last) or previous_id
+                    progress.skip(len(batch))
+                    continue
+                extracted = self.extract_text_from_pdf_with_ocr(path, first, last)
+                chunks = self.split_documents(self._extracted_documents(extracted))
+                if chunks:
+                    if previous_id:
+                        chunks[0].metadata['prev_id'] = previous_id
+                        self._link_next(previous_id, chunks[0].metadata['chunk_id'])
+                    self.vectorstore.add_documents(
+                        chunks, ids=[chunk.metadata['chunk_id'] for chunk in chunks]
+                    )
+                    previous_id = chunks[-1].metadata['chunk_id']
+                self.journal.batch_done(path, first, last, len(chunks), previous_id)
+                progress.advance(len(batch), len(chunks), current=path)
+            
+            self.journal.file_done(path)
+        
+        self.journal.finish()
+        print(f"✓ Vector database saved to {self.persist_directory}")
+        print(f"✓ {self.embeddings.report()}")
         return True
     
-    def search(self, query, k=4):
-        """Search for relevant documents"""
+    def _link_next(self, chunk_id, next_id):
+        """Point an already stored chunk at the first chunk of the next batch"""
+        collection = self.vectorstore._collection
+        stored = collection.get(ids=[chunk_id], include=["metadatas"])["metadatas"]
+        if stored:
+            collection.update(ids=[chunk_id], metadatas=[dict(stored[0], next_id=next_id)])
+    
+    def search(self, query, k=4, source=None, page_from=None, page_to=None, content_type=None):
+        """Search for relevant documents, optionally restricted by metadata"""
         if not self.vectorstore:
             print("Vector database not loaded!")
             return []
         
-        results = self.vectorstore.similarity_search(query, k=k)
+        where = build_metadata_filter(
+            [source] if source else None, page_from, page_to, content_type
+        )
+        results = self.vectorstore.similarity_search(query, k=k, filter=where)
         return results
\ No newline at end of file
@@ -0,0 +1,81 @@
+import numpy as np
+
+# Rows decoded to float32 at a time while scoring int8 codes
+SCORE_BLOCK_ROWS = 8192
+
+
+class Int8Quantizer:
+    """Symmetric per-dimension int8 codes (4x smaller than float32)"""
+
+    method = "int8"
+    rescore_factor = 4
+
+    def __init__(self, scales=None):
+        self.scales = None if scales is None else np.asarray(scales, dtype=np.float32)
+
+    def fit(self, vectors):
+        peak = np.abs(vectors).max(axis=0) if len(vectors) else np.ones(vectors.shape[1])
+        self.scales = (np.maximum(peak, 1e-12) / 127.0).astype(np.float32)
+
+    def encode(self, vectors):
+        codes = np.rint(np.asarray(vectors, dtype=np.float32) / self.scales)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def score(self, codes, queries):
+        """Approximate dot products of float queries against stored codes"""
+        scaled = (queries * self.scales).astype(np.float32)
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = scaled @ block.T
+        return scores
+
+    def to_dict(self):
+        return {'method': self.method, 'scales': self.scales.tolist()}
+
+
+class BinaryQuantizer:
+    """One sign bit per dimension (32x smaller than float32), Hamming scoring"""
+
+    method = "binary"
+    rescore_factor = 20
+
+    def __init__(self, dimension=None):
+        self.dimension = dimension
+
+    def fit(self, vectors):
+        self.dimension = vectors.shape[1]
+
+    def encode(self, vectors):
+        return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+    def score(self, codes, queries):
+        """Similarity as matching bits: dimension - 2 * hamming_distance"""
+        query_codes = self.encode(queries)
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for row, query in enumerate(query_codes):
+            distance = np.bitwise_count(np.bitwise_xor(codes, query)).sum(axis=1)
+            scores[row] = self.dimension - 2.0 * distance
+        return scores
+
+    def to_dict(self):
+        return {'method': self.method, 'dimension': self.dimension}
+
+
+def make_quantizer(method):
+    """Quantizer for "int8" or "binary"; None/"none" means full precision only"""
+    if not method or method == "none":
+        return None
+    if method == "int8":
+        return Int8Quantizer()
+    if method == "binary":
+        return BinaryQuantizer()
+    raise ValueError(f"Unknown quantization method: {method}")
+
+
+def quantizer_from_dict(data):
+    if data['method'] == "int8":
+        return Int8Quantizer(data['scales'])
+    if data['method'] == "binary":
+        return BinaryQuantizer(data['dimension'])
+    raise ValueError(f"Unknown quantization method: {data['method']}")
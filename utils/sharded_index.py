@@ -0,0 +1,169 @@
+import os
+import zlib
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of index partitions; 1 keeps the classic single collection
+DEFAULT_SHARDS = int(os.getenv("VECTOR_SHARDS", "1"))
+# Threads searching shards in parallel, shared by every sharded store in the process
+SEARCH_THREADS = int(os.getenv("SHARD_SEARCH_THREADS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _search_executor():
+    """Process-wide search pool, so reopening a store does not leave idle threads behind"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS,
+                                           thread_name_prefix="shard-search")
+        return _executor
+
+
+def shard_for_source(source, shard_count):
+    """Stable shard number for a source document"""
+    return zlib.crc32(str(source).encode('utf-8')) % shard_count
+
+
+def _sources_in_filter(where):
+    """Sources a filter is restricted to, or None if it may match any source"""
+    if not where:
+        return None
+    if '$and' in where:
+        for part in where['$and']:
+            sources = _sources_in_filter(part)
+            if sources is not None:
+                return sources
+        return None
+
+    condition = where.get('source')
+    if condition is None:
+        return None
+    if isinstance(condition, dict):
+        if '$eq' in condition:
+            return [condition['$eq']]
+        if '$in' in condition:
+            return list(condition['$in'])
+        return None
+    return [condition]
+
+
+class ShardedVectorStore:
+    """Vector store partitioned by source document.
+
+    Every chunk of a PDF lands in the same shard, so re-ingesting one file
+    only rewrites that shard. Searches fan out to the shards in parallel
+    threads (NumPy and Chroma both release the GIL while scoring) and the
+    per-shard top-k lists are merged by relevance score. Filters that name
+    specific sources are routed to the owning shards only.
+    """
+
+    def __init__(self, shards, embedding_function):
+        self.shards = shards
+        self.embedding_function = embedding_function
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def shard_for(self, source):
+        return self.shards[shard_for_source(source, len(self.shards))]
+
+    def _shards_for_filter(self, where):
+        sources = _sources_in_filter(where)
+        if sources is None:
+            return list(self.shards)
+        picked = {shard_for_source(source, len(self.shards)) for source in sources}
+        return [self.shards[i] for i in sorted(picked)]
+
+    def add_documents(self, documents, ids=None):
+        """Route each chunk to its source's shard"""
+        groups = {}
+        for position, doc in enumerate(documents):
+            index = shard_for_source(doc.metadata.get('source', ''), len(self.shards))
+            groups.setdefault(index, []).append(position)
+
+        added = []
+        for index, positions in groups.items():
+            shard_ids = [ids[p] for p in positions] if ids else None
+            added += self.shards[index].add_documents(
+                [documents[p] for p in positions], ids=shard_ids
+            ) or []
+        return added
+
+    def delete(self, ids=None, where=None):
+        """Delete by id and/or filter; source filters only touch the owning shard"""
+        if ids is None and not where:
+            return
+        shards = self.shards if ids is not None else self._shards_for_filter(where)
+        for shard in shards:
+            if where:
+                shard.delete(ids=ids, where=where)
+            else:
+                shard.delete(ids=ids)
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        merged = {}
+        for shard in self._shards_for_filter(where):
+            part = shard.get(ids=ids, where=where, include=include)
+            for key, values in part.items():
+                if values is None or key == 'included':
+                    continue
+                merged.setdefault(key, []).extend(list(values))
+        if limit is not None:
+            merged = {key: values[:limit] for key, values in merged.items()}
+        merged.setdefault('ids', [])
+        return merged
+
+    @staticmethod
+    def _search_shard(shard, vectors, k, where, ids=None):
+        if hasattr(shard, 'similarity_search_by_vectors_with_scores'):
+            return shard.similarity_search_by_vectors_with_scores(vectors, k=k, filter=where,
+                                                                  ids=ids)
+        # Chroma returns distances (lower is better); negate so higher is better
+        extra = {'ids': ids} if ids is not None else {}
+        return [
+            [
+                (doc, -distance)
+                for doc, distance in shard.similarity_search_by_vector_with_relevance_scores(
+                    vector, k=k, filter=where, **extra
+                )
+            ]
+            for vector in vectors
+        ]
+
+    def similarity_search_by_vectors_with_scores(self, embeddings, k=4, filter=None, ids=None):
+        """Scatter the queries to the shards, gather and merge each query's top-k"""
+        shards = self._shards_for_filter(filter)
+        executor = _search_executor()
+        futures = [
+            executor.submit(self._search_shard, shard, embeddings, k, filter, ids)
+            for shard in shards
+        ]
+        per_shard = [future.result() for future in futures]
+
+        results = []
+        for query_index in range(len(embeddings)):
+            candidates = [hit for hits in per_shard for hit in hits[query_index]]
+            results.append(heapq.nlargest(k, candidates, key=lambda hit: hit[1]))
+        return results
+
+    def similarity_search_by_vectors(self, embeddings, k=4, filter=None, ids=None):
+        return [
+            [doc for doc, _ in hits]
+            for hits in self.similarity_search_by_vectors_with_scores(embeddings, k, filter, ids)
+        ]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None, **kwargs):
+        vector = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vectors_with_scores([vector], k, filter)[0]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        vector = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector(vector, k, filter)
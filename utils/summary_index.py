@@ -0,0 +1,262 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+# One file per document, so an update only rewrites that document's summaries
+SUMMARY_DIR = "summaries"
+# Single-file layout of older versions, converted on first load
+SUMMARY_FILE = "summary_index.json"
+SUMMARY_VECTORS_FILE = "summary_vectors.npy"
+# Pages grouped into one section vector
+SECTION_PAGES = int(os.getenv("SUMMARY_SECTION_PAGES", "10"))
+SNIPPET_CHARS = 160
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class SummaryIndex:
+    """Document- and section-level summary vectors for two-stage retrieval.
+
+    Each PDF gets a mean vector of its chunk embeddings, and so does every
+    run of SECTION_PAGES pages. A query first ranks documents, then the
+    sections of the best documents, and only the chunks of the chosen
+    sections are scored. The same per-document entries double as the PDF
+    catalogue (pages, chunks and an opening snippet).
+
+    Updates build new dicts and swap them in as one (documents, sections)
+    pair, so searches running meanwhile see either the old or the new
+    summaries of a document, never a half-updated or missing one. On disk
+    every document has its own file, and `save(source)` rewrites just that.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        # ({source: {'pages', 'chunks', 'snippet', 'vector'}},
+        #  {source: [{'page_from', 'page_to', 'ids', 'vector'}]})
+        self._state = ({}, {})
+
+    @property
+    def documents(self):
+        return self._state[0]
+
+    @property
+    def sections(self):
+        return self._state[1]
+
+    def __len__(self):
+        return len(self.documents)
+
+    def build(self, ids, vectors, metadatas, texts):
+        """Rebuild every summary from a vector store dump"""
+        grouped = {}
+        for position, metadata in enumerate(metadatas):
+            grouped.setdefault(metadata.get('source', 'Unknown'), []).append(position)
+
+        documents, sections = {}, {}
+        for source, positions in grouped.items():
+            documents[source], sections[source] = self._summarize(
+                [ids[p] for p in positions],
+                [vectors[p] for p in positions],
+                [metadatas[p] for p in positions],
+                [texts[p] for p in positions]
+            )
+        with self._lock:
+            self._state = (documents, sections)
+
+    def update_source(self, source, ids, vectors, metadatas, texts):
+        """(Re)compute the summaries of one document from its chunks"""
+        if not ids:
+            self.remove_source(source)
+            return
+        document, sections = self._summarize(ids, vectors, metadatas, texts)
+        with self._lock:
+            self._state = ({**self._state[0], source: document},
+                           {**self._state[1], source: sections})
+
+    def _summarize(self, ids, vectors, metadatas, texts):
+        """(document entry, section entries) for one document's chunks"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        pages = [int(metadata.get('page', 0)) for metadata in metadatas]
+
+        by_section = {}
+        for position, page in enumerate(pages):
+            by_section.setdefault(page // SECTION_PAGES, []).append(position)
+
+        sections = [
+            {
+                'page_from': section * SECTION_PAGES,
+                'page_to': section * SECTION_PAGES + SECTION_PAGES - 1,
+                'ids': [ids[p] for p in positions],
+                'vector': _unit(vectors[positions].mean(axis=0)),
+            }
+            for section, positions in sorted(by_section.items())
+        ]
+
+        first = min(
+            range(len(ids)),
+            key=lambda p: (pages[p], metadatas[p].get('start_index') or 0)
+        )
+        document = {
+            'pages': len(set(pages)),
+            'chunks': len(ids),
+            'snippet': " ".join(texts[first].split())[:SNIPPET_CHARS],
+            'vector': _unit(vectors.mean(axis=0)),
+        }
+        return document, sections
+
+    def remove_source(self, source):
+        with self._lock:
+            documents, sections = self._state
+            if source in documents or source in sections:
+                self._state = (
+                    {key: value for key, value in documents.items() if key != source},
+                    {key: value for key, value in sections.items() if key != source},
+                )
+
+    def _path(self, source):
+        name = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16] + ".npz"
+        return os.path.join(self.directory, SUMMARY_DIR, name)
+
+    def load(self):
+        """Load summaries from disk, returns False if there are none"""
+        if not self.directory:
+            return False
+        directory = os.path.join(self.directory, SUMMARY_DIR)
+        if not os.path.isdir(directory):
+            return self._load_legacy()
+
+        documents, sections = {}, {}
+        for name in os.listdir(directory):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                with np.load(os.path.join(directory, name)) as data:
+                    entry = json.loads(str(data['entry']))
+                    vectors = data['vectors']
+            except (OSError, ValueError, KeyError):
+                continue
+            source = entry.pop('source')
+            section_entries = entry.pop('sections')
+            documents[source] = dict(entry, vector=vectors[0])
+            sections[source] = [dict(section, vector=vectors[i])
+                                for i, section in enumerate(section_entries, 1)]
+        if not documents:
+            return False
+        with self._lock:
+            self._state = (documents, sections)
+        return True
+
+    def _load_legacy(self):
+        path = os.path.join(self.directory, SUMMARY_FILE)
+        vectors_path = os.path.join(self.directory, SUMMARY_VECTORS_FILE)
+        if not os.path.exists(path) or not os.path.exists(vectors_path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            vectors = np.load(vectors_path)
+        except (OSError, ValueError):
+            return False
+
+        documents = {
+            source: dict(entry, vector=vectors[entry['vector']])
+            for source, entry in data['documents'].items()
+        }
+        sections = {
+            source: [dict(section, vector=vectors[section['vector']]) for section in entries]
+            for source, entries in data['sections'].items()
+        }
+        with self._lock:
+            self._state = (documents, sections)
+        self.save()
+        for legacy in (path, vectors_path):
+            os.remove(legacy)
+        return True
+
+    def _write(self, source, document, sections):
+        path = self._path(source)
+        entry = dict({key: value for key, value in document.items() if key != 'vector'},
+                     source=source,
+                     sections=[{key: value for key, value in section.items() if key != 'vector'}
+                               for section in sections])
+        vectors = np.stack([document['vector']] + [section['vector'] for section in sections])
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(f, entry=np.array(json.dumps(entry)), vectors=vectors.astype(np.float32))
+        os.replace(path + ".tmp", path)
+
+    def save(self, source=None):
+        """Persist the summaries of one document, or of all of them"""
+        if not self.directory:
+            return
+        os.makedirs(os.path.join(self.directory, SUMMARY_DIR), exist_ok=True)
+        documents, sections = self._state
+        if source is not None:
+            if source in documents:
+                self._write(source, documents[source], sections.get(source, []))
+            elif os.path.exists(self._path(source)):
+                os.remove(self._path(source))
+            return
+
+        current = set()
+        for name, document in documents.items():
+            self._write(name, document, sections.get(name, []))
+            current.add(os.path.basename(self._path(name)))
+        directory = os.path.join(self.directory, SUMMARY_DIR)
+        for name in os.listdir(directory):
+            if name.endswith(".npz") and name not in current:
+                os.remove(os.path.join(directory, name))
+
+    def select(self, query_vector, sources=None, page_from=None, page_to=None,
+               top_documents=3, top_sections=6):
+        """First stage: pick the most relevant documents, then their best sections.
+
+        Returns (sources, chunk_ids) for the chosen sections, or (None, None)
+        if there is nothing to select from.
+        """
+        documents, all_sections = self._state
+        candidates = [s for s in (sources if sources is not None else documents)
+                      if s in documents]
+        if not candidates:
+            return None, None
+
+        query = _unit(query_vector)
+        if len(candidates) > top_documents:
+            scores = np.stack([documents[s]['vector'] for s in candidates]) @ query
+            best = np.argsort(-scores)[:top_documents]
+            candidates = [candidates[i] for i in best]
+
+        sections = [
+            (source, section)
+            for source in candidates
+            for section in all_sections.get(source, [])
+            if (page_from is None or section['page_to'] >= page_from)
+            and (page_to is None or section['page_from'] <= page_to)
+        ]
+        if not sections:
+            return None, None
+
+        scores = np.stack([section['vector'] for _, section in sections]) @ query
+        chosen = [sections[i] for i in np.argsort(-scores)[:top_sections]]
+        chosen_sources = sorted({source for source, _ in chosen})
+        chunk_ids = [row_id for _, section in chosen for row_id in section['ids']]
+        return chosen_sources, chunk_ids
+
+    def catalogue(self):
+        """{source: {'pages', 'chunks', 'sections', 'snippet'}} for listing documents"""
+        documents, sections = self._state
+        return {
+            source: {
+                'pages': entry['pages'],
+                'chunks': entry['chunks'],
+                'sections': len(sections.get(source, [])),
+                'snippet': entry['snippet'],
+            }
+            for source, entry in documents.items()
+        }
@@ -0,0 +1,321 @@
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+DEFAULT_DB_PATH = os.path.join("data", "meeting_summaries.db")
+PREVIEW_CHARS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    meeting_date TEXT NOT NULL,
+    timestamp TEXT,
+    source TEXT NOT NULL DEFAULT 'manual',
+    filename TEXT UNIQUE,
+    content TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_date ON summaries (meeting_date);
+CREATE INDEX IF NOT EXISTS idx_summaries_source_date ON summaries (source, meeting_date);
+CREATE TABLE IF NOT EXISTS report_digests (
+    input_hash TEXT PRIMARY KEY,
+    label TEXT,
+    digest TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS extractions (
+    summary_id INTEGER PRIMARY KEY REFERENCES summaries (id),
+    meeting_date TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'done',
+    attempts INTEGER NOT NULL DEFAULT 1,
+    error TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    summary_id INTEGER NOT NULL REFERENCES summaries (id),
+    meeting_date TEXT NOT NULL,
+    decision TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_decisions_date ON decisions (meeting_date);
+CREATE TABLE IF NOT EXISTS action_items (
+    id INTEGER PRIMARY KEY,
+    summary_id INTEGER NOT NULL REFERENCES summaries (id),
+    meeting_date TEXT NOT NULL,
+    task TEXT NOT NULL,
+    owner TEXT,
+    due_date TEXT,
+    status TEXT NOT NULL DEFAULT 'open'
+);
+CREATE INDEX IF NOT EXISTS idx_action_items_status_date ON action_items (status, meeting_date);
+CREATE INDEX IF NOT EXISTS idx_action_items_owner ON action_items (owner);
+CREATE TABLE IF NOT EXISTS metrics (
+    id INTEGER PRIMARY KEY,
+    summary_id INTEGER NOT NULL REFERENCES summaries (id),
+    meeting_date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    unit TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_date ON metrics (meeting_date);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added to tables that older databases already have
+ADDED_COLUMNS = {
+    "extractions": (
+        ("status", "TEXT NOT NULL DEFAULT 'done'"),
+        ("attempts", "INTEGER NOT NULL DEFAULT 1"),
+        ("error", "TEXT"),
+    ),
+}
+
+
+class SummaryStore:
+    """Meeting summaries in SQLite, indexed by meeting date and by source.
+
+    Date-range listings are index range scans, so they cost O(log n) plus
+    the rows returned no matter how large the archive grows. Listings only
+    read a preview of each summary; full texts are fetched when a report
+    needs them. The legacy `meeting_*.json` files are imported once, in a
+    single transaction, the first time the store is opened.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, legacy_dir=None):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._add_columns()
+        if legacy_dir:
+            self.migrate_json(legacy_dir)
+
+    def _add_columns(self):
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for name, definition in columns:
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def migrate_json(self, directory):
+        """Import `meeting_*.json` files once; returns the number of summaries imported"""
+        with self._lock:
+            if self._meta("json_migrated") is not None:
+                return 0
+            rows = []
+            for filepath in sorted(Path(directory).glob("meeting_*.json")):
+                try:
+                    with open(filepath, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    rows.append((data['date'], data.get('timestamp'),
+                                 data.get('source', 'manual'), filepath.name,
+                                 data.get('content', ''), data.get('created_at')))
+                except (OSError, json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+                    print(f"⚠️ Skipping unreadable summary {filepath.name}: {e!r}")
+                    continue
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO summaries "
+                    "(meeting_date, timestamp, source, filename, content, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute(
+                    "INSERT INTO store_meta (key, value) VALUES ('json_migrated', ?)",
+                    (str(len(rows)),)
+                )
+        if rows:
+            print(f"✓ Migrated {len(rows)} meeting summaries from {directory} to {self.db_path}")
+        return len(rows)
+
+    def add(self, meeting_date, content, source="manual", timestamp=None, filename=None,
+            created_at=None):
+        """Insert one summary and return its id"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO summaries "
+                "(meeting_date, timestamp, source, filename, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (meeting_date, timestamp, source, filename, content, created_at)
+            )
+            return cursor.lastrowid
+
+    def _where(self, start_date, end_date, source):
+        clauses, params = [], []
+        if start_date:
+            clauses.append("meeting_date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("meeting_date <= ?")
+            params.append(end_date)
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def list_range(self, start_date=None, end_date=None, source=None,
+                   preview_chars=PREVIEW_CHARS):
+        """Summaries in a date range, oldest first, with a content preview only"""
+        where, params = self._where(start_date, end_date, source)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, meeting_date, source, filename, "
+                f"substr(content, 1, ?) AS preview FROM summaries{where} "
+                "ORDER BY meeting_date, id",
+                [preview_chars] + params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_range(self, start_date=None, end_date=None, source=None):
+        """Full summaries in a date range, oldest first"""
+        where, params = self._where(start_date, end_date, source)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, meeting_date, timestamp, source, filename, content, created_at "
+                f"FROM summaries{where} ORDER BY meeting_date, id",
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, start_date=None, end_date=None, source=None):
+        where, params = self._where(start_date, end_date, source)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM summaries{where}", params).fetchone()[0]
+
+    def get_digest(self, input_hash):
+        """Cached partial report digest for this exact set of summaries, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM report_digests WHERE input_hash = ?", (input_hash,)
+            ).fetchone()
+        return row["digest"] if row else None
+
+    def put_digest(self, input_hash, label, digest):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO report_digests (input_hash, label, digest) VALUES (?, ?, ?)",
+                (input_hash, label, digest)
+            )
+
+    def add_extraction(self, summary_id, meeting_date, extraction):
+        """Replace the decisions, action items and metrics extracted from one summary.
+
+        `extraction` is a dict with "decisions" (strings), "action_items"
+        (dicts with task, owner, due_date, status) and "metrics" (dicts with
+        name, value, unit).
+        """
+        with self._lock, self._conn:
+            for table in ("decisions", "action_items", "metrics"):
+                self._conn.execute(f"DELETE FROM {table} WHERE summary_id = ?", (summary_id,))
+            self._conn.executemany(
+                "INSERT INTO decisions (summary_id, meeting_date, decision) VALUES (?, ?, ?)",
+                [(summary_id, meeting_date, d) for d in extraction.get("decisions", [])]
+            )
+            self._conn.executemany(
+                "INSERT INTO action_items (summary_id, meeting_date, task, owner, due_date, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(summary_id, meeting_date, a['task'], a.get('owner'), a.get('due_date'),
+                  a.get('status') or 'open') for a in extraction.get("action_items", [])]
+            )
+            self._conn.executemany(
+                "INSERT INTO metrics (summary_id, meeting_date, name, value, unit) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(summary_id, meeting_date, m['name'], m.get('value'), m.get('unit'))
+                 for m in extraction.get("metrics", [])]
+            )
+            self._record_extraction(summary_id, meeting_date, "done", None)
+
+    def add_extraction_failure(self, summary_id, meeting_date, error):
+        """Remember a failed extraction so queries and backfills do not retry it blindly"""
+        with self._lock, self._conn:
+            self._record_extraction(summary_id, meeting_date, "failed", str(error))
+
+    def _record_extraction(self, summary_id, meeting_date, status, error):
+        self._conn.execute(
+            "INSERT INTO extractions (summary_id, meeting_date, status, error) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (summary_id) DO UPDATE SET "
+            "status = excluded.status, error = excluded.error, attempts = attempts + 1",
+            (summary_id, meeting_date, status, error)
+        )
+
+    def _unextracted_where(self, start_date, end_date, retry_failed):
+        where, params = self._where(start_date, end_date, None)
+        skipped = "SELECT summary_id FROM extractions"
+        if retry_failed:
+            skipped += " WHERE status = 'done'"
+        where += (" AND " if where else " WHERE ") + f"id NOT IN ({skipped})"
+        return where, params
+
+    def unextracted(self, start_date=None, end_date=None, retry_failed=False):
+        """Full summaries in a date range without an extraction; failed ones only on request"""
+        where, params = self._unextracted_where(start_date, end_date, retry_failed)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, meeting_date, content FROM summaries{where} ORDER BY meeting_date, id",
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_unextracted(self, start_date=None, end_date=None):
+        """(never attempted, failed) summaries in a date range"""
+        where, params = self._unextracted_where(start_date, end_date, True)
+        with self._lock:
+            pending = self._conn.execute(
+                f"SELECT COUNT(*) FROM summaries{where}", params
+            ).fetchone()[0]
+            failed_where, failed_params = self._where(start_date, end_date, None)
+            failed_where += (" AND " if failed_where else " WHERE ") + "status = 'failed'"
+            failed = self._conn.execute(
+                f"SELECT COUNT(*) FROM extractions{failed_where}", failed_params
+            ).fetchone()[0]
+        return pending - failed, failed
+
+    def _rows(self, table, start_date, end_date, extra=(), order="meeting_date, id"):
+        where, params = self._where(start_date, end_date, None)
+        for clause, value in extra:
+            where += (" AND " if where else " WHERE ") + clause
+            params.append(value)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM {table}{where} ORDER BY {order}", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def decisions(self, start_date=None, end_date=None):
+        return self._rows("decisions", start_date, end_date)
+
+    def action_items(self, start_date=None, end_date=None, status=None, owner=None):
+        """Action items from meetings in a date range; owner matches case-insensitively"""
+        extra = []
+        if status:
+            extra.append(("status = ?", status))
+        if owner:
+            extra.append(("owner LIKE ?", f"%{owner}%"))
+        return self._rows("action_items", start_date, end_date, extra)
+
+    def metrics(self, start_date=None, end_date=None):
+        return self._rows("metrics", start_date, end_date, order="name, meeting_date, id")
+
+    def set_action_status(self, item_id, status):
+        """Mark an action item (e.g. "done"); returns False if there is no such item"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE action_items SET status = ? WHERE id = ?", (status, item_id)
+            )
+            return cursor.rowcount > 0
+
+    def close(self):
+        self._conn.close()
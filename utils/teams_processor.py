@@ -1,32 +1,85 @@
 import os
 import json
+import uuid
+import sqlite3
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from langchain_anthropic import ChatAnthropic
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings  # Updated
 from langchain_chroma import Chroma  # Updated
 from langchain.schema import Document
 from dotenv import load_dotenv
 import pymsteams
+from utils.llm_gateway import get_chat_model, MAX_CONCURRENT_CALLS
+from utils.summary_store import SummaryStore
+from utils.embedding_scheduler import BucketedEmbeddings, EMBEDDING_MODEL
+from utils.flat_index import FlatVectorStore, DEFAULT_VECTOR_BACKEND, DEFAULT_QUANTIZATION
+from utils.hnsw_config import (
+    load_hnsw_params, collection_configuration, current_hnsw_params, set_search_ef
+)
 
 load_dotenv()
 
+# Months whose summaries add up to more than this are reported map-reduce style
+MAP_REDUCE_MIN_CHARS = int(os.getenv("REPORT_MAP_REDUCE_MIN_CHARS", "60000"))
+# At most this many meetings go into one weekly digest
+DIGEST_MAX_MEETINGS = int(os.getenv("REPORT_DIGEST_MAX_MEETINGS", "15"))
+# Raw text kept per meeting when a digest call fails
+FALLBACK_CHARS = 1500
+# Bump when the digest prompt changes so cached digests are regenerated
+DIGEST_PROMPT_VERSION = "1"
+
+# Extract decisions, action items and metrics from each summary as it is stored
+# (one extra LLM call per summary, so opt-in; older summaries are extracted with
+# backfill_extractions)
+EXTRACT_ON_INGEST = os.getenv("MEETING_EXTRACTION", "false").lower() == "true"
+ACTION_STATUSES = ("open", "done")
+
+EXTRACTION_PROMPT = """Extract structured data from this meeting summary dated {meeting_date}.
+
+{summary}
+
+Reply with JSON only, in exactly this shape:
+{{"decisions": ["<decision>", ...],
+ "action_items": [{{"task": "<task>", "owner": "<person or null>", "due_date": "<YYYY-MM-DD or null>", "status": "open" or "done"}}, ...],
+ "metrics": [{{"name": "<metric>", "value": "<number as written>", "unit": "<unit or null>"}}, ...]}}
+
+Only include what the summary states. Use empty lists when there is nothing to report."""
+
+DIGEST_PROMPT = """You are condensing meeting summaries from {label} for a monthly report.
+
+{summaries}
+
+Write a dense digest of these meetings. Keep, with the meeting date for each item:
+- decisions made
+- tasks and milestones completed
+- project status updates
+- action items, with owners and due dates where given
+- customer feedback, concerns and satisfaction signals
+- team achievements and challenges
+- every number, metric or KPI mentioned
+
+Drop small talk and repetition. Do not add anything that is not in the summaries."""
+
 class TeamsProcessor:
-    def __init__(self):
+    def __init__(self, embedding_workers=None, vector_backend=None, quantization=None):
         self.summaries_dir = Path("data/meeting_summaries")
         self.summaries_dir.mkdir(parents=True, exist_ok=True)
+        # Indexed by date and source; the old per-meeting JSON files are imported once
+        self.store = SummaryStore("data/meeting_summaries.db", legacy_dir=self.summaries_dir)
         
         self.db_path = "data/summaries_db"
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        self.vector_backend = vector_backend or DEFAULT_VECTOR_BACKEND
+        self.quantization = quantization or DEFAULT_QUANTIZATION
+        self.flat_path = os.path.join(self.db_path, "flat_index")
+        # Summaries live in langchain's default collection
+        self.hnsw_params = load_hnsw_params(self.db_path, "langchain")
+        self.embeddings = BucketedEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            workers=embedding_workers
         )
         
-        self.llm = ChatAnthropic(
-            model="claude-sonnet-4-5-20250929",
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            temperature=0.3
-        )
+        self.llm = get_chat_model("claude-sonnet-4-5-20250929", temperature=0.3)
         
         # Teams webhook URL (you'll need to create this in Teams)
         self.teams_webhook = os.getenv("TEAMS_WEBHOOK_URL", "")
@@ -35,16 +88,30 @@ class TeamsProcessor:
     
     def _load_vectorstore(self):
         """Load or create vector store for meeting summaries"""
-        if os.path.exists(self.db_path):
+        if self.vector_backend == "flat":
+            try:
+                self.vectorstore = FlatVectorStore.load(self.embeddings, self.flat_path)
+            except FileNotFoundError:
+                self.vectorstore = None
+        elif os.path.exists(self.db_path):
             self.vectorstore = Chroma(
                 persist_directory=self.db_path,
-                embedding_function=self.embeddings
+                embedding_function=self.embeddings,
+                collection_configuration=collection_configuration(self.hnsw_params)
             )
+            ef_search = self.hnsw_params.get('ef_search')
+            if ef_search and current_hnsw_params(self.vectorstore).get('ef_search') != ef_search:
+                set_search_ef(self.vectorstore, ef_search)
         else:
             self.vectorstore = None
     
-    def store_meeting_summary(self, summary_text: str, meeting_date: str = None):
-        """Store a meeting summary with metadata"""
+    def store_meeting_summary(self, summary_text: str, meeting_date: str = None,
+                              source: str = "manual", extract: bool = None):
+        """Store a meeting summary with metadata (source: "manual", "otter", "email", ...).
+        
+        With extract (default MEETING_EXTRACTION) its decisions, action items
+        and metrics are pulled out once and kept as queryable rows.
+        """
         if not meeting_date:
             meeting_date = datetime.now().strftime("%Y-%m-%d")
         
@@ -53,21 +120,18 @@ class TeamsProcessor:
         except ValueError:
             return "Error: Invalid date format. Use YYYY-MM-DD"
         
-        # Create filename
+        # Named like the JSON files, so vector store entries stay linked; the
+        # random suffix keeps summaries stored within the same second apart
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"meeting_{meeting_date}_{timestamp}.json"
-        filepath = self.summaries_dir / filename
-        
-        # Store summary with metadata
-        summary_data = {
-            "date": meeting_date,
-            "timestamp": timestamp,
-            "content": summary_text,
-            "created_at": datetime.now().isoformat()
-        }
+        filename = f"meeting_{meeting_date}_{timestamp}_{uuid.uuid4().hex[:12]}.json"
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(summary_data, f, indent=2, ensure_ascii=False)
+        try:
+            summary_id = self.store.add(
+                meeting_date, summary_text, source=source, timestamp=timestamp,
+                filename=filename, created_at=datetime.now().isoformat()
+            )
+        except sqlite3.IntegrityError as e:
+            return f"Error: Could not store meeting summary for {meeting_date}: {e}"
         
         # Add to vector store
         doc = Document(
@@ -75,37 +139,166 @@ class TeamsProcessor:
             metadata={
                 "source": filename,
                 "date": meeting_date,
+                "origin": source,
                 "type": "meeting_summary"
             }
         )
         
-        if self.vectorstore is None:
+        if self.vectorstore is None and self.vector_backend == "flat":
+            self.vectorstore = FlatVectorStore.from_documents(
+                documents=[doc],
+                embedding=self.embeddings,
+                persist_directory=self.flat_path,
+                quantization=self.quantization
+            )
+        elif self.vectorstore is None:
             self.vectorstore = Chroma.from_documents(
                 documents=[doc],
                 embedding=self.embeddings,
-                persist_directory=self.db_path
+                persist_directory=self.db_path,
+                collection_configuration=collection_configuration(self.hnsw_params)
             )
         else:
             self.vectorstore.add_documents([doc])
         
+        if extract is None:
+            extract = EXTRACT_ON_INGEST
+        if extract:
+            try:
+                extraction = self.extract_meeting(summary_id, meeting_date, summary_text)
+            except Exception as e:
+                print(f"⚠️ Extraction failed for {meeting_date} (retry with backfill_extractions(retry_failed=True)): {e}")
+                return f"✅ Meeting summary stored successfully for {meeting_date}"
+            return (f"✅ Meeting summary stored successfully for {meeting_date} "
+                    f"({len(extraction['decisions'])} decisions, "
+                    f"{len(extraction['action_items'])} action items, "
+                    f"{len(extraction['metrics'])} metrics)")
+        
         return f"✅ Meeting summary stored successfully for {meeting_date}"
     
-    def list_summaries(self, start_date: str = None, end_date: str = None):
-        """List all meeting summaries within date range"""
+    def _parse_extraction(self, text):
+        """Parse the extraction reply into clean lists, dropping malformed entries"""
+        text = text.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            text = text[text.index("\n") + 1:] if "\n" in text else text
+        try:
+            data = json.loads(text[text.index("{"):text.rindex("}") + 1])
+        except ValueError:
+            raise ValueError("extraction reply was not valid JSON")
+        
+        def clean(value):
+            value = str(value).strip() if value is not None else ""
+            return value if value and value.lower() not in ("null", "none", "n/a") else None
+        
+        decisions = [clean(d) for d in data.get("decisions") or []]
+        action_items = []
+        for item in data.get("action_items") or []:
+            if not isinstance(item, dict) or not clean(item.get("task")):
+                continue
+            status = (clean(item.get("status")) or "open").lower()
+            action_items.append({
+                "task": clean(item["task"]),
+                "owner": clean(item.get("owner")),
+                "due_date": clean(item.get("due_date")),
+                "status": status if status in ACTION_STATUSES else "open",
+            })
+        metrics = [
+            {"name": clean(m["name"]), "value": clean(m.get("value")), "unit": clean(m.get("unit"))}
+            for m in data.get("metrics") or []
+            if isinstance(m, dict) and clean(m.get("name"))
+        ]
+        return {"decisions": [d for d in decisions if d], "action_items": action_items,
+                "metrics": metrics}
+    
+    def extract_meeting(self, summary_id, meeting_date, summary_text):
+        """One LLM pass over a stored summary; the result (or the failure) is saved in the summary store"""
+        try:
+            response = self.llm.invoke(
+                EXTRACTION_PROMPT.format(meeting_date=meeting_date, summary=summary_text)
+            )
+            extraction = self._parse_extraction(response.content)
+        except Exception as e:
+            self.store.add_extraction_failure(summary_id, meeting_date, e)
+            raise
+        self.store.add_extraction(summary_id, meeting_date, extraction)
+        return extraction
+    
+    def backfill_extractions(self, start_date=None, end_date=None, retry_failed=False):
+        """Extract every summary in a date range that has not been extracted yet.
+        
+        Without dates this covers the whole archive, so it is only run on
+        request. Summaries whose extraction failed before are skipped unless
+        `retry_failed`. Returns (extracted, failed).
+        """
+        pending = self.store.unextracted(start_date, end_date, retry_failed)
+        if not pending:
+            return 0, 0
+        
+        def run(row):
+            try:
+                self.extract_meeting(row['id'], row['meeting_date'], row['content'])
+                return True
+            except Exception as e:
+                print(f"⚠️ Extraction failed for meeting {row['id']} ({row['meeting_date']}): {e}")
+                return False
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_CALLS, len(pending)))) as pool:
+            results = list(pool.map(run, pending))
+        extracted = sum(results)
+        print(f"✓ Extracted {extracted} meeting summaries ({len(results) - extracted} failed)")
+        return extracted, len(results) - extracted
+    
+    def list_action_items(self, start_date: str = None, end_date: str = None,
+                          owner: str = None, status: str = "open"):
+        """Action items from meetings in a date range, read from the extracted rows.
+        
+        Nothing is extracted here; meetings that have not been extracted yet
+        are counted in a note instead.
+        """
+        if status and status not in ACTION_STATUSES:
+            return f"Error: Unknown status '{status}'. Use open or done"
+        items = self.store.action_items(start_date, end_date, status=status, owner=owner)
+        pending, failed = self.store.count_unextracted(start_date, end_date)
+        
+        period = f"{start_date or 'the beginning'} to {end_date or 'today'}"
+        if not items:
+            result = f"No {status + ' ' if status else ''}action items found from {period}\n"
+        else:
+            result = f"Action Items ({status or 'all'}, {period}):\n\n"
+        for item in items:
+            result += f"- [{item['status']}] {item['task']}"
+            result += f" — owner: {item['owner'] or 'unassigned'}"
+            if item['due_date']:
+                result += f", due {item['due_date']}"
+            result += f" (meeting {item['meeting_date']}, #{item['id']})\n"
+        if pending:
+            result += (f"\n⚠️ {pending} meetings in this range are not extracted yet; "
+                       f"run extract_meeting_data to include them\n")
+        if failed:
+            result += (f"\n⚠️ Extraction failed for {failed} meetings in this range; "
+                       f"run extract_meeting_data with retry_failed to try again\n")
+        return result
+    
+    def update_action_item(self, item_id: int, status: str):
+        """Mark an extracted action item open or done"""
+        if status not in ACTION_STATUSES:
+            return f"Error: Unknown status '{status}'. Use open or done"
+        if not self.store.set_action_status(item_id, status):
+            return f"Error: No action item #{item_id}"
+        return f"✅ Action item #{item_id} marked {status}"
+    
+    def list_summaries(self, start_date: str = None, end_date: str = None, source: str = None):
+        """List all meeting summaries within date range, optionally from one source"""
         if not start_date:
             start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         if not end_date:
             end_date = datetime.now().strftime("%Y-%m-%d")
         
-        summaries = []
-        for filepath in sorted(self.summaries_dir.glob("meeting_*.json")):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if start_date <= data['date'] <= end_date:
-                    summaries.append({
-                        "date": data['date'],
-                        "preview": data['content'][:200] + "..."
-                    })
+        summaries = [
+            {"date": row['meeting_date'], "preview": row['preview'] + "..."}
+            for row in self.store.list_range(start_date, end_date, source)
+        ]
         
         if not summaries:
             return f"No meeting summaries found between {start_date} and {end_date}"
@@ -133,8 +326,70 @@ class TeamsProcessor:
         
         return response
     
-    def generate_monthly_report(self, month: str = None, year: str = None):
-        """Generate comprehensive monthly report"""
+    def _digest_groups(self, summaries):
+        """Split a month's summaries into ISO weeks of at most DIGEST_MAX_MEETINGS"""
+        weeks = {}
+        for summary in summaries:
+            iso = datetime.strptime(summary['meeting_date'], "%Y-%m-%d").isocalendar()
+            weeks.setdefault((iso[0], iso[1]), []).append(summary)
+        
+        groups = []
+        for (iso_year, week), items in sorted(weeks.items()):
+            for i in range(0, len(items), DIGEST_MAX_MEETINGS):
+                part = items[i:i + DIGEST_MAX_MEETINGS]
+                label = (f"Week {week} of {iso_year} "
+                         f"({part[0]['meeting_date']} to {part[-1]['meeting_date']})")
+                groups.append((label, part))
+        return groups
+    
+    def _digest(self, label, summaries):
+        """Digest one group of meetings, reusing the cached one if its inputs are unchanged"""
+        text = "\n\n---\n\n".join(
+            f"Date: {s['meeting_date']}\n{s['content']}" for s in summaries
+        )
+        input_hash = hashlib.sha256(
+            (DIGEST_PROMPT_VERSION + "\0" + text).encode('utf-8')
+        ).hexdigest()
+        
+        digest = self.store.get_digest(input_hash)
+        if digest is not None:
+            return digest, True
+        
+        response = self.llm.invoke(DIGEST_PROMPT.format(label=label, summaries=text))
+        self.store.put_digest(input_hash, label, response.content)
+        return response.content, False
+    
+    def _weekly_digests(self, summaries):
+        """Digest each week concurrently; a failed week falls back to trimmed raw summaries"""
+        groups = self._digest_groups(summaries)
+        
+        def run(group):
+            label, items = group
+            try:
+                return label, *self._digest(label, items)
+            except Exception as e:
+                print(f"⚠️ Digest for {label} failed, using raw summaries: {e}")
+                raw = "\n\n".join(
+                    f"Date: {s['meeting_date']}\n{s['content'][:FALLBACK_CHARS]}" for s in items
+                )
+                return label, raw, False
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_CALLS, len(groups)))) as pool:
+            results = list(pool.map(run, groups))
+        
+        cached = sum(1 for _, _, hit in results if hit)
+        print(f"✓ {len(results)} weekly digests ({cached} cached, {len(results) - cached} generated)")
+        return [(label, digest) for label, digest, _ in results]
+    
+    def generate_monthly_report(self, month: str = None, year: str = None, mode: str = "auto"):
+        """Generate comprehensive monthly report.
+        
+        mode: "single" sends every summary in one prompt, "map_reduce" digests
+        each week in parallel first and writes the report from the digests,
+        "auto" picks map-reduce for months larger than MAP_REDUCE_MIN_CHARS,
+        and "structured" lists the extracted decisions, action items and
+        metrics without an LLM call (only meetings never extracted cost one).
+        """
         if not month:
             month = datetime.now().month
         if not year:
@@ -142,6 +397,9 @@ class TeamsProcessor:
         
         month = int(month)
         year = int(year)
+        if mode not in ("auto", "single", "map_reduce", "structured"):
+            return (f"Error: Unknown report mode '{mode}'. "
+                    "Use auto, single, map_reduce or structured")
         
         # Get date range for the month
         start_date = datetime(year, month, 1).strftime("%Y-%m-%d")
@@ -150,26 +408,37 @@ class TeamsProcessor:
         else:
             end_date = (datetime(year, month + 1, 1) - timedelta(days=1)).strftime("%Y-%m-%d")
         
-        # Collect all summaries for the month
-        summaries = []
-        for filepath in sorted(self.summaries_dir.glob("meeting_*.json")):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if start_date <= data['date'] <= end_date:
-                    summaries.append(data)
+        if mode == "structured":
+            return self._structured_report(month, year, start_date, end_date)
+        
+        # Collect all summaries for the month (an index range scan)
+        summaries = self.store.get_range(start_date, end_date)
         
         if not summaries:
             return f"No meeting summaries found for {month}/{year}"
         
-        # Combine all summaries
-        combined_text = "\n\n---\n\n".join([
-            f"Date: {s['date']}\n{s['content']}" for s in summaries
-        ])
+        total_chars = sum(len(s['content']) for s in summaries)
+        if mode == "auto":
+            mode = "map_reduce" if total_chars > MAP_REDUCE_MIN_CHARS else "single"
+        
+        if mode == "map_reduce":
+            digests = self._weekly_digests(summaries)
+            combined_text = "\n\n---\n\n".join(
+                f"{label}\n{digest}" for label, digest in digests
+            )
+            intro = ("Below are weekly digests of all the meeting summaries for this month, "
+                     "each condensed from that week's meetings:")
+        else:
+            # Combine all summaries
+            combined_text = "\n\n---\n\n".join([
+                f"Date: {s['meeting_date']}\n{s['content']}" for s in summaries
+            ])
+            intro = "Below are all the meeting summaries for this month:"
         
         # Generate report using Claude
         prompt = f"""You are analyzing meeting summaries for {month}/{year}.
 
-Below are all the meeting summaries for this month:
+{intro}
 
 {combined_text}
 
@@ -215,6 +484,48 @@ Be specific, cite dates where relevant, and provide a clear, actionable summary.
         
         return report_content
     
+    def _structured_report(self, month, year, start_date, end_date):
+        """Monthly report built from the extracted rows"""
+        if not self.store.count(start_date, end_date):
+            return f"No meeting summaries found for {month}/{year}"
+        # Bounded to the report month; earlier failures are not retried here
+        self.backfill_extractions(start_date, end_date)
+        
+        decisions = self.store.decisions(start_date, end_date)
+        action_items = self.store.action_items(start_date, end_date)
+        metrics = self.store.metrics(start_date, end_date)
+        
+        report = f"## 📊 Monthly Summary Report - {month}/{year}\n\n"
+        
+        report += "### 1. Key Decisions Made\n"
+        for d in decisions:
+            report += f"- {d['meeting_date']}: {d['decision']}\n"
+        if not decisions:
+            report += "- None recorded\n"
+        
+        for title, status in (("2. Completed Action Items", "done"),
+                              ("3. Open Action Items", "open")):
+            report += f"\n### {title}\n"
+            rows = [a for a in action_items if a['status'] == status]
+            for a in rows:
+                report += f"- {a['meeting_date']}: {a['task']} — owner: {a['owner'] or 'unassigned'}"
+                report += f", due {a['due_date']}\n" if a['due_date'] else "\n"
+            if not rows:
+                report += "- None recorded\n"
+        
+        report += "\n### 4. Key Metrics\n"
+        for m in metrics:
+            value = " ".join(part for part in (m['value'], m['unit']) if part)
+            report += f"- {m['name']}: {value or 'mentioned'} ({m['meeting_date']})\n"
+        if not metrics:
+            report += "- None recorded\n"
+        
+        report_path = self.summaries_dir / f"monthly_report_{year}_{month:02d}_structured.txt"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(report)
+        
+        return report
+    
     def send_to_teams(self, message: str, channel_name: str = "General"):
         """Send message to Microsoft Teams channel"""
         if not self.teams_webhook:
@@ -0,0 +1,124 @@
+import copy
+from collections import OrderedDict
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Room for [CLS]/[SEP] plus a little slack for word pieces that shift
+# when split pieces are joined back together
+SPECIAL_TOKEN_MARGIN = 16
+DEFAULT_OVERLAP_RATIO = 0.2
+
+
+def get_sentence_transformer(embeddings):
+    """Return the SentenceTransformer behind a LangChain HuggingFaceEmbeddings"""
+    # langchain_huggingface keeps it in `_client`, langchain_community in `client`
+    return getattr(embeddings, '_client', None) or getattr(embeddings, 'client', None)
+
+
+class TokenCounter:
+    """Counts tokens with the embedding model's fast tokenizer.
+
+    Encodings of finished chunks are kept in a bounded cache so the
+    embedding pass can reuse them instead of tokenizing the text again.
+    """
+
+    def __init__(self, tokenizer, max_seq_length, cache_size=50000):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @classmethod
+    def from_embeddings(cls, embeddings):
+        """Build a counter for the model behind `embeddings`, or None if unavailable"""
+        # Share the counter (and its cached encodings) with the embedding scheduler
+        if getattr(embeddings, 'token_counter', None) is not None:
+            return embeddings.token_counter
+        model = get_sentence_transformer(embeddings)
+        tokenizer = getattr(model, 'tokenizer', None)
+        if tokenizer is None:
+            return None
+        return cls(tokenizer, model.get_max_seq_length() or 512)
+
+    def _remember(self, text, ids):
+        self._cache[text] = ids
+        self._cache.move_to_end(text)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def encode(self, text):
+        """Token ids for `text`, without special tokens"""
+        ids = self._cache.get(text)
+        if ids is None:
+            ids = self.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"]
+            self._remember(text, ids)
+        return ids
+
+    def encode_batch(self, texts):
+        """Token ids for many texts at once (the fast tokenizer runs them in parallel)"""
+        unique = list(dict.fromkeys(texts))
+        found = {text: self._cache[text] for text in unique if text in self._cache}
+        missing = [text for text in unique if text not in found]
+        if missing:
+            encoded = self.tokenizer(missing, add_special_tokens=False, verbose=False)["input_ids"]
+            found.update(zip(missing, encoded))
+            # Remembering may evict entries of this very batch, so answer from `found`
+            for text, ids in zip(missing, encoded):
+                self._remember(text, ids)
+        return [found[text] for text in texts]
+
+    def cached(self, text):
+        """Token ids from the cache, or None if the text was never encoded"""
+        return self._cache.get(text)
+
+    def clear(self):
+        self._cache.clear()
+
+    def count(self, text):
+        return len(self.encode(text))
+
+
+def create_token_splitter(counter, chunk_tokens=None, overlap_tokens=None):
+    """Splitter that measures chunk size in model tokens instead of characters"""
+    if chunk_tokens is None:
+        chunk_tokens = counter.max_seq_length - SPECIAL_TOKEN_MARGIN
+    if overlap_tokens is None:
+        overlap_tokens = int(chunk_tokens * DEFAULT_OVERLAP_RATIO)
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=overlap_tokens,
+        length_function=counter.count
+    )
+
+
+def split_by_tokens(documents, counter, chunk_tokens=None, overlap_tokens=None):
+    """Split documents into token-sized chunks and tag each with its token count"""
+    splitter = create_token_splitter(counter, chunk_tokens, overlap_tokens)
+
+    chunks = []
+    for doc in documents:
+        # Track offsets ourselves: the splitter's add_start_index assumes the
+        # overlap is measured in characters and loses chunks when it is not
+        search_from = 0
+        for text in splitter.split_text(doc.page_content):
+            start = doc.page_content.find(text, search_from)
+            if start < 0:
+                start = doc.page_content.find(text)
+            if start < 0:
+                # Joined pieces can differ from the source in whitespace; the
+                # previous chunk's offset is the closest real position we know
+                start = max(search_from - 1, 0)
+            else:
+                search_from = start + 1
+
+            metadata = copy.deepcopy(doc.metadata)
+            metadata['start_index'] = start
+            chunks.append(Document(page_content=text, metadata=metadata))
+
+    # Tokenize the final chunks once, in a batch; the embedding pass reuses these
+    encodings = counter.encode_batch([chunk.page_content for chunk in chunks])
+    for chunk, ids in zip(chunks, encodings):
+        chunk.metadata['token_count'] = len(ids)
+
+    return chunks
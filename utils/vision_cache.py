@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = os.getenv("VISION_CACHE_PATH", os.path.join("data", "vision_cache.jsonl"))
+# The log is rewritten once it holds this many times more lines than live entries
+COMPACT_RATIO = 2
+
+
+def image_hash(image_bytes):
+    """Content hash of an image, so renamed copies share a cache entry"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class VisionCache:
+    """Persistent cache of vision model answers keyed by (image hash, prompt, model).
+
+    The key is built from the image bytes rather than the file name, so a
+    file whose content changes gets a new key and is analysed again, while
+    the same picture under another name is answered from the cache. Only
+    successful answers are stored. A cache without a path keeps entries in
+    memory for the lifetime of the process.
+
+    Entries are appended to a JSON-lines log, so storing an answer costs
+    one short write however large the cache is. Answers stored again under
+    the same key leave stale lines behind; the log is compacted when they
+    outnumber the live entries. A `vision_cache.json` written by older
+    versions is imported on first use.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        # {key: {'text', 'model', 'created'}}
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        # Lines in the log, live or superseded
+        self._log_lines = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        if not os.path.exists(self.path):
+            self._import_legacy()
+            return
+        torn = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final line from a crash mid-write
+                        torn = True
+                        continue
+                    self.entries[record.pop('key')] = record
+                    self._log_lines += 1
+        except OSError:
+            self.entries = {}
+            return
+        if torn:
+            # Rewrite so the next append does not land on the torn line
+            self._compact()
+
+    def _import_legacy(self):
+        legacy = os.path.splitext(self.path)[0] + ".json"
+        if legacy == self.path or not os.path.exists(legacy):
+            return
+        try:
+            with open(legacy, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self._compact()
+
+    def _append(self, key, entry):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(entry, key=key)) + "\n")
+        self._log_lines += 1
+        if self._log_lines > COMPACT_RATIO * len(self.entries):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the log with one line per live entry"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+            for key, entry in self.entries.items():
+                f.write(json.dumps(dict(entry, key=key)) + "\n")
+        os.replace(self.path + ".tmp", self.path)
+        self._log_lines = len(self.entries)
+
+    @staticmethod
+    def key(image, prompt, model):
+        """`image` is the raw bytes or their `image_hash` if already computed"""
+        digest = image if isinstance(image, str) else image_hash(image)
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+        return f"{digest}:{prompt_hash}:{model}"
+
+    def get(self, image, prompt, model):
+        """Cached answer for this image, prompt and model, or None"""
+        with self._lock:
+            entry = self.entries.get(self.key(image, prompt, model))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry['text']
+
+    def put(self, image, prompt, model, text):
+        key = self.key(image, prompt, model)
+        entry = {'text': text, 'model': model, 'created': time.time()}
+        with self._lock:
+            self.entries[key] = entry
+            self._append(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+            self._compact()
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+_shared_cache = None
+
+
+def get_vision_cache():
+    """Process-wide cache shared by the image processor and the image tools"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = VisionCache()
+    return _shared_cache
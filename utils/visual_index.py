@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from utils.flat_index import FlatVectorStore
+from utils.page_store import file_fingerprint
+from utils.pdf_images import extract_pdf_images, load_image
+from utils.image_hash import ImageHashIndex
+
+# Local CLIP model shared by images and text (sentence-transformers)
+VISUAL_MODEL = os.getenv("VISUAL_MODEL", "clip-ViT-B-32")
+VISUAL_BATCH_SIZE = 32
+MANIFEST_FILE = "visual_manifest.json"
+# Matches below this cosine similarity are not worth showing. CLIP puts
+# unrelated document-like images at 0.7-0.8, so only close figures pass;
+# `python benchmark.py visual --pairs ...` measures it on your own figures
+MIN_VISUAL_SCORE = float(os.getenv("VISUAL_MIN_SCORE", "0.85"))
+
+
+class ClipEmbeddings:
+    """CLIP image/text encoder with the LangChain embeddings interface.
+
+    The model is loaded on first use so importing the tools stays fast.
+    Text queries land in the same space as images, so "floor plan with
+    a bay window" can be searched against the figures as well.
+    """
+
+    def __init__(self, model_name=VISUAL_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+            return self._model
+
+    def embed_images(self, images):
+        vectors = self.model.encode(list(images), batch_size=VISUAL_BATCH_SIZE,
+                                    convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self.model.encode(list(texts), convert_to_numpy=True,
+                                 normalize_embeddings=True).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class VisualIndex:
+    """Image-to-image search over the figures and pictures in the PDFs.
+
+    Embedded images and rendered page figures are embedded locally with
+    CLIP and kept in a FlatVectorStore (exact, memory-mapped), with the
+    same `source`/`page` metadata as the text chunks. Every image is also
+    perceptually hashed, so a picture that literally appears in a PDF is
+    found by a Hamming-distance lookup before CLIP is even loaded. A
+    manifest of file fingerprints lets unchanged PDFs be skipped on
+    re-indexing.
+    """
+
+    def __init__(self, directory="data/chroma_db/visual_index", embeddings=None,
+                 render_figures=None):
+        self.directory = directory
+        self.embeddings = embeddings or ClipEmbeddings()
+        self.render_figures = render_figures
+        self.store = FlatVectorStore(self.embeddings, directory)
+        self.hashes = ImageHashIndex(directory)
+        # {source: {'size', 'mtime_ns', 'images'}}
+        self.manifest = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.store)
+
+    def load(self):
+        """Open the saved index, returns False if there is none"""
+        self.hashes.load()
+        try:
+            self.store = FlatVectorStore.load(self.embeddings, self.directory)
+        except FileNotFoundError:
+            return False
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        return True
+
+    def _save_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def is_current(self, pdf_path):
+        entry = self.manifest.get(pdf_path)
+        if entry is None or not os.path.exists(pdf_path):
+            return False
+        # Indexed before perceptual hashes were recorded: reindex once to hash it
+        if not entry.get('hashed'):
+            return False
+        fingerprint = file_fingerprint(pdf_path)
+        return (entry['size'], entry['mtime_ns']) == (fingerprint['size'], fingerprint['mtime_ns'])
+
+    def index_pdf(self, pdf_path):
+        """(Re)index the images of one PDF; returns the number of images stored"""
+        extracted = extract_pdf_images(pdf_path, render_figures=self.render_figures)
+        ids = [
+            f"{pdf_path}#p{metadata['page']}-{metadata['kind']}{metadata['index']}"
+            for _, metadata in extracted
+        ]
+        vectors = self.embeddings.embed_images([image for image, _ in extracted]) if extracted else []
+
+        with self._lock:
+            stale = [row_id for row_id in self.store.get(where={'source': pdf_path})['ids']
+                     if row_id not in set(ids)]
+            if extracted:
+                self.store.add_texts(
+                    [f"{metadata['kind']} image on page {metadata['page'] + 1} of "
+                     f"{os.path.basename(pdf_path)}" for _, metadata in extracted],
+                    metadatas=[metadata for _, metadata in extracted],
+                    ids=ids,
+                    embeddings=vectors
+                )
+            if stale:
+                self.store.delete(ids=stale)
+            self.hashes.replace_source(pdf_path, [
+                (row_id, image, metadata)
+                for row_id, (image, metadata) in zip(ids, extracted)
+            ])
+            self.hashes.save()
+            self.manifest[pdf_path] = dict(file_fingerprint(pdf_path), images=len(extracted),
+                                           hashed=True)
+            self._save_manifest()
+        return len(extracted)
+
+    def remove_pdf(self, pdf_path):
+        with self._lock:
+            self.store.delete(where={'source': pdf_path})
+            self.hashes.remove_source(pdf_path)
+            self.hashes.save()
+            if self.manifest.pop(pdf_path, None) is not None:
+                self._save_manifest()
+
+    def index_all(self, pdf_paths):
+        """Index new and changed PDFs, drop PDFs that are gone; returns images added"""
+        started = time.perf_counter()
+        added = 0
+        for source in set(self.manifest) - set(pdf_paths):
+            self.remove_pdf(source)
+        for path in pdf_paths:
+            if self.is_current(path):
+                continue
+            try:
+                count = self.index_pdf(path)
+                added += count
+                print(f"  🖼️ {os.path.basename(path)}: {count} images")
+            except Exception as e:
+                print(f"⚠️ Could not index images of {path}: {e}")
+        print(f"✓ Visual index: {len(self)} images ({added} new) in "
+              f"{time.perf_counter() - started:.1f}s")
+        return added
+
+    def find_exact(self, image):
+        """Same picture (up to resizing/re-encoding) by perceptual hash: [(metadata, distance)]"""
+        if not len(self.hashes):
+            return []
+        return self.hashes.lookup(load_image(image))
+
+    def search(self, image, k=5, min_score=MIN_VISUAL_SCORE):
+        """Nearest PDF images to a query image (path or PIL image): [(metadata, score)]"""
+        if not len(self.store):
+            return []
+        vector = self.embeddings.embed_images([load_image(image)])
+        hits = self.store.similarity_search_by_vectors_with_scores(vector, k=k)[0]
+        return [(doc.metadata, score) for doc, score in hits if score >= min_score]